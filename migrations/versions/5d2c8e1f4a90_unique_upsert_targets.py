@@ -0,0 +1,68 @@
+"""unique upsert targets for campaigns, players, characters
+
+Revision ID: 5d2c8e1f4a90
+Revises: 47831d6a93c3
+Create Date: 2026-10-18 10:12:44.512311
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c8e1f4a90'
+down_revision: str | Sequence[str] | None = '47831d6a93c3'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # Duplicate campaigns own scenes/characters/transcripts; merging them is a judgement call.
+    dupes = bind.execute(sa.text(
+        "SELECT guild_id FROM campaigns WHERE guild_id IS NOT NULL "
+        "GROUP BY guild_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if dupes:
+        raise RuntimeError(
+            f"merge duplicate campaigns before upgrading; guild_ids: {[r[0] for r in dupes]}"
+        )
+
+    # Duplicate players are safe to fold into the oldest row.
+    bind.execute(sa.text(
+        "UPDATE characters SET player_id = (SELECT MIN(p2.id) FROM players p1 JOIN players p2 "
+        "ON p1.discord_user_id = p2.discord_user_id WHERE p1.id = characters.player_id) "
+        "WHERE player_id IS NOT NULL"
+    ))
+    bind.execute(sa.text(
+        "DELETE FROM players WHERE id NOT IN (SELECT MIN(id) FROM players GROUP BY discord_user_id)"
+    ))
+    # Duplicate characters: the latest write wins, as it did for readers.
+    bind.execute(sa.text(
+        "DELETE FROM characters WHERE id NOT IN "
+        "(SELECT MAX(id) FROM characters GROUP BY campaign_id, name)"
+    ))
+
+    op.drop_index(op.f('ix_campaigns_guild_id'), table_name='campaigns')
+    op.create_index(op.f('ix_campaigns_guild_id'), 'campaigns', ['guild_id'], unique=True)
+    op.drop_index(op.f('ix_players_discord_user_id'), table_name='players')
+    op.create_index(
+        op.f('ix_players_discord_user_id'), 'players', ['discord_user_id'], unique=True
+    )
+    op.create_index(
+        'uq_characters_campaign_name', 'characters', ['campaign_id', 'name'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_characters_campaign_name', table_name='characters')
+    op.drop_index(op.f('ix_players_discord_user_id'), table_name='players')
+    op.create_index(
+        op.f('ix_players_discord_user_id'), 'players', ['discord_user_id'], unique=False
+    )
+    op.drop_index(op.f('ix_campaigns_guild_id'), table_name='campaigns')
+    op.create_index(op.f('ix_campaigns_guild_id'), 'campaigns', ['guild_id'], unique=False)
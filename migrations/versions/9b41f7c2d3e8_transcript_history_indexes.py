@@ -0,0 +1,33 @@
+"""transcript history indexes for keyset pagination
+
+Revision ID: 9b41f7c2d3e8
+Revises: 5d2c8e1f4a90
+Create Date: 2026-10-18 11:03:19.207455
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9b41f7c2d3e8'
+down_revision: str | Sequence[str] | None = '5d2c8e1f4a90'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_transcripts_scene_time', 'transcripts', ['scene_id', 'created_at', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_transcripts_scene_author_time', 'transcripts',
+        ['scene_id', 'author_ref', 'created_at', 'id'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcripts_scene_author_time', table_name='transcripts')
+    op.drop_index('ix_transcripts_scene_time', table_name='transcripts')
@@ -0,0 +1,32 @@
+"""per-scene dice streams: campaign seed and scene roll counter
+
+Revision ID: a3d5f81c9e42
+Revises: e4a8b2c61f07
+Create Date: 2026-10-18 15:20:41.118305
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d5f81c9e42'
+down_revision: str | Sequence[str] | None = 'e4a8b2c61f07'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing campaigns get a seed the next time they're resolved (repos.get_or_create_campaign).
+    op.add_column('campaigns', sa.Column('rng_seed', sa.BigInteger(), nullable=True))
+    op.add_column(
+        'scenes', sa.Column('roll_counter', sa.BigInteger(), server_default='0', nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('scenes', 'roll_counter')
+    op.drop_column('campaigns', 'rng_seed')
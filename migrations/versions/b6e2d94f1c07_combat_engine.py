@@ -0,0 +1,56 @@
+"""combat engine: turn numbering and deadlines, combatants
+
+Revision ID: b6e2d94f1c07
+Revises: a3d5f81c9e42
+Create Date: 2026-10-18 18:02:13.480217
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2d94f1c07'
+down_revision: str | Sequence[str] | None = 'a3d5f81c9e42'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'combatants',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('scene_id', sa.Integer(), nullable=False),
+        sa.Column('actor_ref', sa.String(length=64), nullable=False),
+        sa.Column('initiative', sa.Integer(), nullable=False),
+        sa.Column('dex_mod', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['scene_id'], ['scenes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_combatants_scene_id'), 'combatants', ['scene_id'], unique=False)
+    op.create_index(
+        'uq_combatants_scene_actor', 'combatants', ['scene_id', 'actor_ref'], unique=True
+    )
+
+    # turns.ended_at was already nullable; the engine leaves it NULL while a turn is in progress.
+    op.add_column('turns', sa.Column('turn_no', sa.Integer(), nullable=True))
+    op.add_column('turns', sa.Column('round', sa.Integer(), nullable=True))
+    op.add_column('turns', sa.Column('deadline', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('turns', sa.Column('outcome', sa.String(length=16), nullable=True))
+    op.create_index('uq_turns_scene_turn_no', 'turns', ['scene_id', 'turn_no'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_turns_scene_turn_no', table_name='turns')
+    op.drop_column('turns', 'outcome')
+    op.drop_column('turns', 'deadline')
+    op.drop_column('turns', 'round')
+    op.drop_column('turns', 'turn_no')
+    op.drop_index('uq_combatants_scene_actor', table_name='combatants')
+    op.drop_index(op.f('ix_combatants_scene_id'), table_name='combatants')
+    op.drop_table('combatants')
@@ -0,0 +1,97 @@
+"""range-partition transcripts by created_at (Postgres only)
+
+Revision ID: c7e19a4b6d25
+Revises: 9b41f7c2d3e8
+Create Date: 2026-10-18 12:20:41.118093
+
+"""
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e19a4b6d25'
+down_revision: str | Sequence[str] | None = '9b41f7c2d3e8'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Indexes live on the partitioned parent and cascade to every partition.
+_INDEXES = (
+    ("ix_transcripts_campaign_channel_time", ["campaign_id", "channel_id", "created_at"]),
+    ("ix_transcripts_campaign_id", ["campaign_id"]),
+    ("ix_transcripts_channel_id", ["channel_id"]),
+    ("ix_transcripts_message_id", ["message_id"]),
+    ("ix_transcripts_scene_time", ["scene_id", "created_at", "id"]),
+    ("ix_transcripts_scene_author_time", ["scene_id", "author_ref", "created_at", "id"]),
+)
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return (_month_start(dt) + timedelta(days=32)).replace(day=1)
+
+
+def _swap_in(new_table_sql: str) -> None:
+    """Move transcripts into a freshly created table, keeping its id sequence, FKs and indexes."""
+    op.execute("ALTER TABLE transcripts RENAME TO transcripts_old")
+    for name, _ in _INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_old")
+    op.execute(new_table_sql)
+    op.execute(
+        "ALTER TABLE transcripts ADD FOREIGN KEY (campaign_id) "
+        "REFERENCES campaigns (id) ON DELETE CASCADE"
+    )
+    op.execute(
+        "ALTER TABLE transcripts ADD FOREIGN KEY (scene_id) "
+        "REFERENCES scenes (id) ON DELETE SET NULL"
+    )
+
+
+def _swap_out() -> None:
+    op.execute("INSERT INTO transcripts SELECT * FROM transcripts_old")
+    op.execute("ALTER SEQUENCE transcripts_id_seq OWNED BY transcripts.id")
+    op.execute("DROP TABLE transcripts_old")
+    for name, cols in _INDEXES:
+        op.create_index(name, "transcripts", cols, unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return  # SQLite has no partitioning; archive.py deletes archived rows instead.
+
+    op.execute("UPDATE transcripts SET created_at = now() WHERE created_at IS NULL")
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM transcripts")).scalar()
+    now = datetime.now(timezone.utc)
+
+    _swap_in(
+        "CREATE TABLE transcripts (LIKE transcripts_old INCLUDING DEFAULTS, "
+        "PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"
+    )
+    # Monthly partitions covering existing rows and the next couple of months;
+    # archive.ensure_partitions keeps adding them after that.
+    start = _month_start(oldest or now)
+    while start <= _next_month(_next_month(now)):
+        end = _next_month(start)
+        op.execute(
+            f"CREATE TABLE transcripts_p{start:%Y%m} PARTITION OF transcripts "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+    op.execute("CREATE TABLE transcripts_default PARTITION OF transcripts DEFAULT")
+    _swap_out()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    _swap_in("CREATE TABLE transcripts (LIKE transcripts_old INCLUDING DEFAULTS, PRIMARY KEY (id))")
+    _swap_out()
@@ -0,0 +1,27 @@
+"""lock fencing token sequence (Postgres only)
+
+Revision ID: d1f5a7c3b920
+Revises: b6e2d94f1c07
+Create Date: 2026-10-18 16:05:12.402117
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f5a7c3b920'
+down_revision: str | Sequence[str] | None = 'b6e2d94f1c07'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Fencing tokens for locks.PostgresLocks; other dialects don't use it."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE SEQUENCE IF NOT EXISTS lock_fencing_seq")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP SEQUENCE IF EXISTS lock_fencing_seq")
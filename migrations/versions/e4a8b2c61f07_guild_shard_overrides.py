@@ -0,0 +1,32 @@
+"""guild shard override table
+
+Revision ID: e4a8b2c61f07
+Revises: c7e19a4b6d25
+Create Date: 2026-10-18 13:05:12.640217
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a8b2c61f07'
+down_revision: str | Sequence[str] | None = 'c7e19a4b6d25'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('guild_shards',
+    sa.Column('guild_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.String(length=64), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('guild_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('guild_shards')
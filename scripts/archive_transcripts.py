@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Run one transcript archival pass (see Adventorator/archive.py).
+
+Takes the same lease as the app's archiver and exits without archiving if
+another process holds it. With the local lock backend that lease doesn't reach
+other processes: set [archive] interval_seconds = 0 so the app doesn't archive,
+and run this from cron instead.
+
+Usage:
+  python scripts/archive_transcripts.py [--path ./archive/transcripts] [--after-days 90]
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator import archive, locks  # noqa: E402
+from Adventorator.config import load_settings  # noqa: E402
+from Adventorator.sharding import router  # noqa: E402
+
+
+def main():
+    settings = load_settings()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--path", default=settings.archive_path)
+    ap.add_argument("--after-days", type=float, default=settings.archive_after_days)
+    ap.add_argument("--batch", type=int, default=settings.archive_batch_rows)
+    args = ap.parse_args()
+    if not args.path:
+        ap.error("no archive path: pass --path or set [archive] path in config.toml")
+    store = archive.ArchiveStore(args.path)
+
+    async def run() -> int | None:
+        lease = await archive.take_lease(ttl=3600)
+        if lease is None:
+            return None
+        total = 0
+        try:
+            for shard in sorted(router.shards) or [None]:
+                older_than = timedelta(days=args.after_days)
+                total += await archive.archive_once(store, older_than, args.batch, shard=shard)
+        finally:
+            await locks.get_manager().release(lease)
+            await locks.close_manager()
+        return total
+
+    rows = asyncio.run(run())
+    if rows is None:
+        sys.exit("another process is archiving; try again later")
+    print(f"archived {rows:,} rows to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
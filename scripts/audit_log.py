@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Read the rules audit log (see Adventorator/audit.py): print records as NDJSON,
+or replay them from their seeds with --verify.
+
+Usage:
+  python scripts/audit_log.py [--path ./audit] [--kind roll|check|group|batch] [--scene 3]
+                              [--since 2024-05-01T00:00] [--verify]
+"""
+
+import argparse
+import sys
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator import audit  # noqa: E402
+from Adventorator.config import load_settings  # noqa: E402
+
+
+def main():
+    settings = load_settings()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--path", default=settings.audit_path)
+    ap.add_argument("--kind", choices=sorted(audit.KINDS))
+    ap.add_argument("--scene", type=int)
+    ap.add_argument("--since", type=datetime.fromisoformat, help="ISO time; naive means UTC")
+    ap.add_argument(
+        "--verify", action="store_true", help="replay every record and report mismatches"
+    )
+    args = ap.parse_args()
+    if not args.path:
+        ap.error("no audit path: pass --path or set [audit] path in config.toml")
+    since = args.since
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    records = audit.read_records(args.path, audit.KINDS.get(args.kind), args.scene, since)
+
+    if args.verify:
+        report = audit.verify(records)
+        for rec in report.failed:
+            print(orjson.dumps(asdict(rec)).decode())
+        print(
+            f"verified {report.checked:,} records, {len(report.failed):,} mismatched, "
+            f"{report.skipped:,} unseeded",
+            file=sys.stderr,
+        )
+        sys.exit(0 if report.ok else 1)
+
+    out = sys.stdout.buffer
+    for rec in records:
+        out.write(orjson.dumps(asdict(rec)) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark the audit log's hot path: time per append for each record kind, with
+the background group-commit flusher running, plus read and verify throughput.
+
+Usage:
+  python scripts/bench_audit.py [--n 200000] [--path /tmp/audit-bench]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator import audit  # noqa: E402
+from Adventorator.rules.checks import CheckInput, compute_check  # noqa: E402
+from Adventorator.rules.group import compute_checks  # noqa: E402
+from Adventorator.rules.streams import SceneRNG  # noqa: E402
+
+
+def per_call_ns(fn, n: int) -> float:
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - t0) / n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--path")
+    args = ap.parse_args()
+    root = Path(args.path or tempfile.mkdtemp(prefix="audit-bench-"))
+    log = audit.AuditLog(root, segment_bytes=16 << 20, fsync_interval_ms=50)
+
+    rng = SceneRNG(1234, 7)
+    roll = rng.roll(0, "2d6+3")
+    kh = rng.roll(1, "4d6kh3")
+    ci = CheckInput("DEX", 16, proficient=True, dc=15, advantage=True)
+    out = compute_check(ci, rng.roll(2, "1d20", advantage=True).rolls[:2])
+    party = [CheckInput("WIS", 10 + i, proficient=i % 2 == 0, dc=12) for i in range(4)]
+    res = compute_checks(party, rng.draws(3, 20, 8).reshape(4, 2))
+
+    cases = {
+        "roll 2d6+3": lambda: log.roll(1234, 7, 0, roll),
+        "roll 4d6kh3": lambda: log.roll(1234, 7, 1, kh),
+        "check": lambda: log.check(1234, 7, 2, ci, out),
+        "group x4": lambda: log.group(1234, 7, 3, party, res),
+        "batch": lambda: log.batch(1234, 7, 4, "8d6", 100, 2800),
+    }
+    print(f"{'append':<14} {'ns/call':>10}")
+    for name, fn in cases.items():
+        print(f"{name:<14} {per_call_ns(fn, args.n):10,.0f}")
+    log.close()
+
+    size = sum(p.stat().st_size for p in audit.segments(root))
+    t0 = time.perf_counter()
+    count = sum(1 for _ in audit.read_records(root))
+    read = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    report = audit.verify(audit.read_records(root, kind=audit.CHECK))
+    ver = time.perf_counter() - t0
+    print(f"\n{count:,} records, {size / count:.0f} B/record on disk")
+    print(f"read   {count / read:12,.0f} records/s")
+    print(f"verify {report.checked / ver:12,.0f} checks/s ({len(report.failed)} mismatched)")
+    if not args.path:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark dice rolling: the old per-call regex path vs compiled, cached plans.
+
+Times, per expression:
+  - legacy: _DICE_RE + str.replace + randint on every call (XdY+Z only)
+  - compile: compile_expr with the plan cache cleared each call
+  - roll: DiceRNG.roll with a warm plan cache
+and then bulk rolling: a DiceRNG.roll loop vs one BatchRoller.roll_n call.
+
+Usage:
+  python scripts/bench_dice.py [--n 200000]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator.rules.batch import BatchRoller  # noqa: E402
+from Adventorator.rules.dice import DiceRNG, DiceRoll, compile_expr  # noqa: E402
+
+_DICE_RE = re.compile(r"^\s*(?P<count>\d+)?d(?P<sides>\d+)\s*(?P<mod>[+\-]\s*\d+)?\s*$")
+
+
+def legacy_roll(rnd: random.Random, expr: str) -> DiceRoll:
+    """DiceRNG.roll before plans (minus adv/dis)."""
+    m = _DICE_RE.match(expr.replace(" ", ""))
+    if not m:
+        raise ValueError(expr)
+    count = int(m.group("count") or 1)
+    sides = int(m.group("sides"))
+    mod = int((m.group("mod") or "0").replace(" ", ""))
+    rolls = [rnd.randint(1, sides) for _ in range(count)]
+    crit = (sides == 20 and count == 1 and rolls[0] == 20)
+    return DiceRoll(expr=expr, rolls=rolls, total=sum(rolls) + mod, modifier=mod, sides=sides,
+                    count=count, crit=crit)
+
+
+def rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+
+    print(f"{'expr':<14} {'legacy/s':>12} {'compile/s':>12} {'roll/s':>12}")
+    for expr in ("1d20", "2d6+3", "8d6", "4d6kh3", "2d8+1d6+3", "1d6!", "2d6r<2"):
+        legacy = "-"
+        if _DICE_RE.match(expr):
+            rnd = random.Random(1)
+            legacy = f"{rate(lambda r=rnd, e=expr: legacy_roll(r, e), args.n):12,.0f}"
+
+        def cold(e=expr):
+            compile_expr.cache_clear()
+            compile_expr(e)
+
+        rng = DiceRNG(seed=1)
+        cold_rate = rate(cold, args.n // 4)
+        warm_rate = rate(lambda r=rng, e=expr: r.roll(e), args.n)
+        print(f"{expr:<14} {legacy:>12} {cold_rate:12,.0f} {warm_rate:12,.0f}")
+
+    print(f"\n{'bulk':<22} {'loop ms':>10} {'batch ms':>10}")
+    bulk = (("100d6", 10_000), ("8d6", 100_000), ("4d6kh3", 100_000), ("1d20+5", 1_000_000))
+    for expr, reps in bulk:
+        rng, roller = DiceRNG(seed=1), BatchRoller(seed=1)
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            rng.roll(expr)
+        loop = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        roller.roll_n(expr, reps)
+        batch = (time.perf_counter() - t0) * 1000
+        print(f"{expr + ' x ' + format(reps, ','):<22} {loop:10.1f} {batch:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite under concurrent mixed load: the default engine vs the
+production profile ([sqlite] production = true).
+
+Each worker loops over: write_transcript, upsert_character, then a recent-history
+read, for --seconds. Reports operations/s, read and write p50/p95 latency, and how
+many operations failed with "database is locked".
+
+Usage:
+  python scripts/bench_sqlite.py [--workers 32] [--seconds 10] [--db /tmp/bench.sqlite3]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DISCORD_PUBLIC_KEY", "0" * 64)
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from Adventorator import db as dbmod  # noqa: E402
+from Adventorator import repos  # noqa: E402
+from Adventorator.schemas import CharacterSheet  # noqa: E402
+
+SHEET = {
+    "name": "Bench", "class": "Fighter", "level": 1,
+    "abilities": {"STR": 15, "DEX": 14, "CON": 13, "INT": 10, "WIS": 12, "CHA": 8},
+    "proficiency_bonus": 2, "ac": 16, "hp": {"current": 12, "max": 12, "temp": 0}, "speed": 30,
+}
+
+
+def _pct(samples: list[float], p: float) -> float:
+    return sorted(samples)[max(0, int(len(samples) * p) - 1)] if samples else 0.0
+
+
+async def run(profile: str, path: Path, workers: int, seconds: float) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    url = f"sqlite+aiosqlite:///{path}"
+    if profile == "production":
+        writer, reader = dbmod.create_sqlite_engines(url, readers=4)
+    else:
+        writer = reader = create_async_engine(url, connect_args={"timeout": 30})
+    async with writer.begin() as conn:
+        await conn.run_sync(dbmod.Base.metadata.create_all)
+
+    dbmod._engine, dbmod._sessionmaker = writer, async_sessionmaker(writer, expire_on_commit=False)
+    production = profile == "production"
+    dbmod._read_engine = reader if production else None
+    dbmod._read_sessionmaker = (
+        async_sessionmaker(reader, expire_on_commit=False) if production else None
+    )
+    dbmod._write_lock = None
+
+    async with dbmod.session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1, name="bench")
+        scene = await repos.ensure_scene(s, camp.id, 1)
+        player = await repos.get_or_create_player(s, 1, "bench")
+
+    writes: list[float] = []
+    reads: list[float] = []
+    locked = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(w: int):
+        nonlocal locked
+        sheet = CharacterSheet.model_validate({**SHEET, "name": f"Bench {w}"})
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            try:
+                t0 = time.perf_counter()
+                async with dbmod.session_scope() as s:
+                    await repos.write_transcript(
+                        s, camp.id, scene.id, 1, "player", f"w{w} m{i}", str(w)
+                    )
+                async with dbmod.session_scope() as s:
+                    await repos.upsert_character(s, camp.id, player.id, sheet)
+                writes.append((time.perf_counter() - t0) * 1000)
+                t0 = time.perf_counter()
+                async with dbmod.session_scope(readonly=True) as s:
+                    await repos.get_recent_transcripts(s, scene.id, limit=15, user_id=str(w))
+                reads.append((time.perf_counter() - t0) * 1000)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(workers)))
+    elapsed = time.perf_counter() - started
+    await writer.dispose()
+    if reader is not writer:
+        await reader.dispose()
+
+    ops = len(writes) * 2 + len(reads)
+    w50 = statistics.median(writes) if writes else 0
+    r50 = statistics.median(reads) if reads else 0
+    print(
+        f"{profile:<11} {ops / elapsed:9.0f} ops/s   "
+        f"write p50 {w50:7.1f} ms  p95 {_pct(writes, 0.95):7.1f} ms   "
+        f"read p50 {r50:6.1f} ms  p95 {_pct(reads, 0.95):6.1f} ms   "
+        f"locked errors {locked}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--db", type=Path, default=Path("/tmp/adventorator_bench_sqlite.sqlite3"))
+    args = ap.parse_args()
+    for profile in ("default", "production"):
+        asyncio.run(run(profile, args.db, args.workers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
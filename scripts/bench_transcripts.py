@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark transcript history reads on a seeded table.
+
+Seeds N rows (default 1,000,000) into a scratch SQLite file, then times:
+  - the old read path: full ORM rows, old indexes only, OFFSET paging
+  - repos.get_recent_transcripts / get_transcript_page with the new indexes
+
+Usage:
+  python scripts/bench_transcripts.py [--rows 1000000] [--db /tmp/bench.sqlite3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DISCORD_PUBLIC_KEY", "0" * 64)
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from Adventorator import models, repos  # noqa: E402
+from Adventorator.db import Base  # noqa: E402
+
+NEW_INDEXES = ("ix_transcripts_scene_time", "ix_transcripts_scene_author_time")
+INSERT_TRANSCRIPT = (
+    "INSERT INTO transcripts "
+    "(campaign_id, scene_id, channel_id, author, author_ref, content, meta, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def seed(path: Path, rows: int, scenes: int, authors: int) -> None:
+    if path.exists():
+        path.unlink()
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    con = sqlite3.connect(path)
+    for name in NEW_INDEXES:
+        con.execute(f"DROP INDEX IF EXISTS {name}")
+    con.execute(
+        "INSERT INTO campaigns (id, guild_id, name, system, created_at) "
+        "VALUES (1, 1, 'bench', '5e-srd', '2025-01-01')"
+    )
+    con.executemany(
+        "INSERT INTO scenes (id, campaign_id, channel_id, mode, is_active, created_at) "
+        "VALUES (?, 1, ?, 'exploration', 1, '2025-01-01')",
+        [(i, 10_000 + i) for i in range(1, scenes + 1)],
+    )
+    rnd = random.Random(1)
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(rows):
+        scene = rnd.randint(1, scenes)
+        batch.append((
+            1, scene, 10_000 + scene, "player" if i % 2 else "bot", str(rnd.randint(1, authors)),
+            f"message {i} " + "lorem ipsum " * 4, "{}",
+            (start + timedelta(seconds=i)).isoformat(" "),
+        ))
+        if len(batch) == 50_000:
+            con.executemany(INSERT_TRANSCRIPT, batch)
+            batch.clear()
+    if batch:
+        con.executemany(INSERT_TRANSCRIPT, batch)
+    con.commit()
+    con.close()
+
+
+def create_new_indexes(path: Path) -> None:
+    con = sqlite3.connect(path)
+    con.execute("CREATE INDEX ix_transcripts_scene_time ON transcripts (scene_id, created_at, id)")
+    con.execute(
+        "CREATE INDEX ix_transcripts_scene_author_time "
+        "ON transcripts (scene_id, author_ref, created_at, id)"
+    )
+    con.execute("ANALYZE")
+    con.commit()
+    con.close()
+
+
+async def timed(label: str, fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    med = statistics.median(samples)
+    p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+    print(f"  {label:<48} median {med:8.2f} ms   p95 {p95:8.2f} ms")
+    return med
+
+
+async def run(path: Path, scenes: int, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    sm = async_sessionmaker(engine, expire_on_commit=False)
+    rnd = random.Random(2)
+    tr = models.Transcript
+
+    async def old_recent():
+        async with sm() as s:
+            author = str(rnd.randint(1, 20))
+            stmt = (
+                select(tr).where(tr.scene_id == rnd.randint(1, scenes), tr.author_ref == author)
+                .order_by(tr.created_at.desc()).limit(15)
+            )
+            (await s.execute(stmt)).scalars().all()
+
+    async def old_deep_page():
+        async with sm() as s:
+            stmt = (
+                select(tr).where(tr.scene_id == rnd.randint(1, scenes))
+                .order_by(tr.created_at.desc()).offset(2000).limit(50)
+            )
+            (await s.execute(stmt)).scalars().all()
+
+    async def new_recent():
+        async with sm() as s:
+            await repos.get_recent_transcripts(
+                s, rnd.randint(1, scenes), limit=15, user_id=str(rnd.randint(1, 20))
+            )
+
+    cursors: dict[int, tuple] = {}
+
+    async def new_deep_page():
+        async with sm() as s:
+            scene = rnd.choice(list(cursors))
+            await repos.get_transcript_page(s, scene, limit=50, before=cursors[scene])
+
+    print("before (old indexes, ORM rows):")
+    await timed("recent 15 for scene+user", old_recent, repeat)
+    await timed("page of 50 at depth 2000 (OFFSET)", old_deep_page, repeat)
+    await engine.dispose()
+
+    create_new_indexes(path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    sm = async_sessionmaker(engine, expire_on_commit=False)
+    # Cursor at depth 2000, as a client paging back would hold it (not timed).
+    async with sm() as s:
+        for scene in range(1, min(scenes, 20) + 1):
+            page = await repos.get_transcript_page(s, scene, limit=2001)
+            cursors[scene] = page[0].cursor
+    print("after (new indexes, projected rows):")
+    await timed("get_recent_transcripts scene+user", new_recent, repeat)
+    await timed("get_transcript_page at depth 2000 (keyset)", new_deep_page, repeat)
+    await engine.dispose()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--scenes", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--db", type=Path, default=Path("/tmp/adventorator_bench_transcripts.sqlite3"))
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.db, args.rows, args.scenes, authors=20)
+    elapsed = time.perf_counter() - t0
+    print(f"seeded {args.rows:,} rows across {args.scenes} scenes in {elapsed:.1f}s")
+    asyncio.run(run(args.db, args.scenes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Export a campaign's transcripts as NDJSON, straight from the database.
+
+Same streaming path as GET /campaigns/{id}/transcripts/export, for operators with
+DB access. Memory stays flat regardless of campaign size.
+
+Usage:
+  python scripts/export_transcripts.py --campaign 1 [--scene 3] [--guild 123]
+                                       [--compression gzip|zstd] [--out file]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator import export, repos  # noqa: E402
+from Adventorator.db import session_scope  # noqa: E402
+
+
+async def run(args) -> int:
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    written = 0
+    try:
+        async with session_scope(readonly=True, guild_id=args.guild) as s:
+            rows = repos.stream_transcripts(s, args.campaign, args.scene, batch_size=args.batch)
+            async for chunk in export.export_stream(rows, args.compression):
+                out.write(chunk)
+                written += len(chunk)
+    finally:
+        if args.out:
+            out.close()
+    return written
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--campaign", type=int, required=True)
+    ap.add_argument("--scene", type=int)
+    ap.add_argument("--guild", type=int, help="the campaign's guild; required when sharded")
+    ap.add_argument("--compression", choices=["gzip", "zstd"])
+    ap.add_argument("--batch", type=int, default=1000, help="rows per cursor fetch")
+    ap.add_argument("--out", help="output file (default: stdout)")
+    args = ap.parse_args()
+    try:
+        export.check_compression(args.compression)
+    except ValueError as e:
+        ap.error(str(e))
+    written = asyncio.run(run(args))
+    print(f"wrote {written:,} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,9 @@ if not env_path.exists():
     sys.exit(1)
 load_dotenv(dotenv_path=env_path)
 
+sys.path.insert(0, str(project_root / "src"))
+from Adventorator.rules.character import SKILLS  # noqa: E402
+
 # Fetch required environment variables with error handling
 try:
     APP_ID = os.environ["DISCORD_APP_ID"]
@@ -33,6 +36,8 @@ commands = [
       "description": "Roll dice, e.g., 2d6+3",
       "options": [
         {"name": "expr", "description": "Dice expression", "type": 3, "required": False},
+        {"name": "times", "description": "Roll it this many times (up to 1000)", "type": 4,
+         "required": False},
         {"name": "advantage", "description": "Advantage", "type": 5, "required": False},
         {"name": "disadvantage", "description": "Disadvantage", "type": 5, "required": False},
       ]
@@ -41,12 +46,45 @@ commands = [
       "name": "check",
       "description": "Ability check vs DC",
       "options": [
+        {"name": "group", "description":"Whole party: comma-separated names, or \"all\"",
+         "type":3, "required":False},
+        {"name": "passive", "description":"Group only: passive scores (10 + mod), no roll",
+         "type":5, "required":False},
+        {"name": "character", "description":"Use this character's sheet (score, proficiency)",
+         "type":3, "required":False},
+        {"name": "skill", "description":"Skill check (needs character)", "type":3, "required":False,
+         "choices": [{"name": k.replace("_", " ").title(), "value": k} for k in SKILLS]},
         {"name": "ability", "description":"STR/DEX/CON/INT/WIS/CHA", "type":3, "required":False},
-        {"name": "score", "description":"Ability score (10 default)", "type":4, "required":False},
+        {"name": "score", "description":"Ability score (10 default)", "type":4, "required":False,
+         "min_value":1, "max_value":30},
         {"name": "proficient", "description":"Proficient?", "type":5, "required":False},
         {"name": "expertise", "description":"Expertise?", "type":5, "required":False},
-        {"name": "prof_bonus", "description":"Proficiency bonus", "type":4, "required":False},
-        {"name": "dc", "description":"Difficulty Class", "type":4, "required":False},
+        {"name": "prof_bonus", "description":"Proficiency bonus", "type":4, "required":False,
+         "min_value":0, "max_value":10},
+        {"name": "dc", "description":"Difficulty Class", "type":4, "required":False,
+         "min_value":1, "max_value":99},
+        {"name": "advantage", "description":"Advantage", "type":5, "required":False},
+        {"name": "disadvantage", "description":"Disadvantage", "type":5, "required":False},
+      ]
+    },
+    {
+      "name": "odds",
+      "description": "Exact odds for a dice expression or a check (no roll)",
+      "options": [
+        {"name": "expr", "description":"Dice expression, e.g. 4d6kh3 (omit for a check)",
+         "type":3, "required":False},
+        {"name": "dc", "description":"Difficulty Class / target", "type":4, "required":False},
+        {"name": "character", "description":"Use this character's sheet", "type":3,
+         "required":False},
+        {"name": "skill", "description":"Skill check (needs character)", "type":3, "required":False,
+         "choices": [{"name": k.replace("_", " ").title(), "value": k} for k in SKILLS]},
+        {"name": "ability", "description":"STR/DEX/CON/INT/WIS/CHA", "type":3, "required":False},
+        {"name": "score", "description":"Ability score (10 default)", "type":4, "required":False,
+         "min_value":1, "max_value":30},
+        {"name": "proficient", "description":"Proficient?", "type":5, "required":False},
+        {"name": "expertise", "description":"Expertise?", "type":5, "required":False},
+        {"name": "prof_bonus", "description":"Proficiency bonus", "type":4, "required":False,
+         "min_value":0, "max_value":10},
         {"name": "advantage", "description":"Advantage", "type":5, "required":False},
         {"name": "disadvantage", "description":"Disadvantage", "type":5, "required":False},
       ]
@@ -63,6 +101,19 @@ commands = [
             {"name":"json","description":"JSON sheet payload","type":3,"required":True}
           ]
         },
+        {
+          "name": "update",
+          "description": "Change part of a sheet (HP, conditions, or a JSON Patch)",
+          "type": 1,
+          "options": [
+            {"name":"name","description":"Character name","type":3,"required":True},
+            {"name":"hp","description":"Set current HP","type":4,"required":False},
+            {"name":"conditions","description":"Comma-separated conditions (\"none\" clears)",
+             "type":3,"required":False},
+            {"name":"patch","description":"RFC 6902 ops array, or {\"hp.current\": 11} setters",
+             "type":3,"required":False}
+          ]
+        },
         {
           "name": "show",
           "description": "Show a sheet by name",
@@ -73,6 +124,41 @@ commands = [
         }
       ]
     },
+    {
+      "name": "combat",
+      "description": "Initiative and turns for this scene",
+      "options": [
+        {
+          "name": "start",
+          "description": "Roll initiative for the party (and NPCs) and start round 1",
+          "type": 1,
+          "options": [
+            {"name":"npcs",
+             "description":"Comma-separated NPCs with initiative mods, e.g. Goblin+2, Orc",
+             "type":3,"required":False}
+          ]
+        },
+        {
+          "name": "next",
+          "description": "End the current turn",
+          "type": 1,
+          "options": [
+            {"name":"actor","description":"Only if it's this actor's turn","type":3,
+             "required":False}
+          ]
+        },
+        {"name": "status", "description": "Initiative order and whose turn it is", "type": 1},
+        {
+          "name": "remove",
+          "description": "Take a combatant out of the fight",
+          "type": 1,
+          "options": [
+            {"name":"name","description":"Combatant name","type":3,"required":True}
+          ]
+        },
+        {"name": "end", "description": "End combat; back to exploration", "type": 1}
+      ]
+    },
     {
         "name": "ooc",
         "description": "Speak with the narrator or say something out of character.",
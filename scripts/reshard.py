@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Inspect guild placement or move one guild to another shard (see Adventorator/sharding.py).
+
+The move is online: the guild keeps working while its rows are copied, the
+override flips, and stragglers are caught up. Run it while the app is up.
+
+Adding a shard re-routes ~1/N of the guilds on the hash ring to the new, empty
+shard as soon as the config changes. To keep them where their data is:
+
+  1. with the current shard list, run --pin-all (writes an override per guild);
+  2. add the shard to [sharding] shards and restart;
+  3. move guilds onto it one at a time with --guild/--to.
+
+Usage:
+  python scripts/reshard.py --show 123456789
+  python scripts/reshard.py --pin-all
+  python scripts/reshard.py --guild 123456789 --to b [--settle 31] [--batch 1000]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from Adventorator import sharding  # noqa: E402
+from Adventorator.db import dispose_engines  # noqa: E402
+
+
+async def show(guild_id: int) -> None:
+    ring = sharding.router.ring.lookup(guild_id)
+    current = await sharding.router.shard_for(guild_id)
+    note = "" if current == ring else f" (override; hash ring says {ring})"
+    print(f"guild {guild_id} -> {current}{note}")
+
+
+async def move(args) -> None:
+    rep = await sharding.move_guild(
+        args.guild, args.to, settle_seconds=args.settle, batch_rows=args.batch
+    )
+    if rep.source == rep.target:
+        print(f"guild {args.guild} is already on {args.to}")
+        return
+    print(
+        f"moved guild {rep.guild_id} {rep.source} -> {rep.target}: {rep.campaigns} campaign(s), "
+        f"{rep.scenes} scene(s), {rep.characters} character write(s), {rep.turns} turn(s), "
+        f"{rep.transcripts} transcript row(s)"
+    )
+
+
+async def pin_all() -> None:
+    pins = await sharding.pin_placements()
+    for name in sorted(sharding.router.shards):
+        print(f"{name}: pinned {sum(1 for s in pins.values() if s == name)} guild(s)")
+
+
+async def main_async(args) -> None:
+    try:
+        if args.show is not None:
+            await show(args.show)
+        elif args.pin_all:
+            await pin_all()
+        else:
+            await move(args)
+    finally:
+        await dispose_engines()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--show", type=int, metavar="GUILD", help="print which shard a guild is on")
+    ap.add_argument("--pin-all", action="store_true", help="pin every guild to its current shard")
+    ap.add_argument("--guild", type=int)
+    ap.add_argument("--to", help="target shard name")
+    ap.add_argument("--settle", type=float, help="seconds to wait for workers to see the override")
+    ap.add_argument("--batch", type=int, default=1000)
+    args = ap.parse_args()
+    if not sharding.router.enabled:
+        ap.error("no shards configured ([sharding] shards in config.toml)")
+    if args.show is None and not args.pin_all and (args.guild is None or not args.to):
+        ap.error("pass --show GUILD, --pin-all, or --guild and --to")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,49 @@
 # app.py
 
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from Adventorator.logging import setup_logging
 from Adventorator.config import load_settings
 from Adventorator.crypto import verify_ed25519
 from Adventorator.discord_schemas import Interaction
-from Adventorator.responder import respond_pong, respond_deferred, followup_message
-from Adventorator.rules.dice import DiceRNG
+from Adventorator.responder import (
+    respond_pong, respond_deferred, respond_message, followup_message, edit_followup_message,
+    close_discord_client,
+)
+from Adventorator.rules.dice import DiceRNG, DiceRoll, compile_expr
+from Adventorator.rules.batch import BatchRoller
+from Adventorator.rules.streams import SceneRNG
 from Adventorator.rules.checks import CheckInput, compute_check
-from Adventorator.db import session_scope
+from Adventorator.rules.group import compute_checks
+from Adventorator.rules import odds
+from Adventorator.db import dispose_engines, session_scope
 from Adventorator.schemas import CharacterSheet
+from Adventorator.sheet_patch import PatchError, setters_to_patch
 from Adventorator import repos
+from Adventorator.transcripts import sink as transcript_sink
+from Adventorator import metrics
+from Adventorator.executor import DispatchExecutor
+from Adventorator import archive, audit, combat, export, locks
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from collections.abc import AsyncIterator
 import structlog
 import asyncio
+import hmac
+import inspect
 import json
+import re
+import time
+import numpy as np
 from Adventorator.llm import LLMClient
 
-rng = DiceRNG()  # TODO: Seed per-scene later
+MAX_GROUP = 25  # characters per /check group (one Discord message)
+# Commands that read-modify-write scene state; one at a time per scene (locks.py).
+# /ooc stays unlocked: it only appends, and holding a scene for a whole LLM call would stall it.
+SCENE_LOCKED = {"combat"}
+# Bounds for /check and /odds integer options (also declared in scripts/register_commands.py).
+OPTION_RANGES = {"score": (1, 30), "prof_bonus": (0, 10), "dc": (1, 99)}
+rng = DiceRNG()  # fallback when there's no campaign seed; scenes roll on their own streams
 
 log = structlog.get_logger()
 settings = load_settings()
@@ -27,17 +54,65 @@ llm_client = None
 if settings.features_llm:
     llm_client = LLMClient(settings)
 
+executor = DispatchExecutor(
+    workers=settings.dispatch_workers,
+    queue_size=settings.dispatch_queue_size,
+    limits=settings.dispatch_command_limits,
+)
+
+_archiver: asyncio.Task | None = None
+
+
+@app.on_event("startup")
+async def startup_event():
+    global _archiver
+    store = archive.get_store()
+    if store is not None and settings.archive_interval_seconds > 0:
+        _archiver = asyncio.create_task(archive.run_forever(
+            store, timedelta(days=settings.archive_after_days),
+            settings.archive_interval_seconds, settings.archive_batch_rows,
+        ))
+    if settings.features_combat:
+        combat.engine.on_timeout = _on_turn_timeout
+        await combat.engine.restore()
+        combat.engine.start_ticker()
+
+
+async def _shutdown_step(name: str, step) -> None:
+    # One failed step (say, a turn flush against a dead database) mustn't skip the
+    # rest: buffered transcripts, held leases and the WAL checkpoint still need them.
+    try:
+        result = step()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        log.exception("shutdown step failed", step=name)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if _archiver is not None:
+        _archiver.cancel()
+    # Let in-flight follow-ups finish before tearing down their clients.
+    await _shutdown_step(
+        "executor", lambda: executor.drain(settings.dispatch_drain_timeout_seconds)
+    )
+    # flushes written-behind turns; timeouts may still add transcripts
+    await _shutdown_step("combat", combat.engine.close)
+    await _shutdown_step("transcripts", transcript_sink.close)
     if llm_client:
-        await llm_client.close()
+        await _shutdown_step("llm", llm_client.close)
+    await _shutdown_step("discord", close_discord_client)
+    await _shutdown_step("audit", audit.close_log)
+    await _shutdown_step("locks", locks.close_manager)
+    # lets SQLite checkpoint the WAL on the way out
+    await _shutdown_step("db", dispose_engines)
 
 DISCORD_SIG_HEADER = "X-Signature-Ed25519"
 DISCORD_TS_HEADER = "X-Signature-Timestamp"
 
 @app.post("/interactions")
 async def interactions(request: Request):
+    started = time.perf_counter()
     raw = await request.body()
     sig = request.headers.get(DISCORD_SIG_HEADER)
     ts  = request.headers.get(DISCORD_TS_HEADER)
@@ -49,25 +124,95 @@ async def interactions(request: Request):
 
     inter = Interaction.model_validate_json(raw)
 
-    async with session_scope() as s:
-        guild_id, channel_id, user_id, username = _infer_ids_from_interaction(inter)
-        campaign = await repos.get_or_create_campaign(s, guild_id)
-        scene = await repos.ensure_scene(s, campaign.id, channel_id)
-        # Content can be reconstructed from command name/options; store a compact form:
-        # msg = f"/{inter.data.name}" if inter.data and inter.data.name else "<interaction>"
-        # await repos.write_transcript(s, campaign.id, scene.id, channel_id, "player", msg, str(user_id), meta=inter.model_dump())
+    # Fast-ack: nothing below may touch the DB or the network. Context resolution
+    # and transcript writes happen in the deferred worker (_dispatch_command).
 
     # Ping = 1
     if inter.type == 1:
-        return respond_pong()
-
-    # Anything else: immediately DEFER (type 5) to satisfy the 3s budget.
+        resp = respond_pong()
+    else:
+        # Anything else: immediately DEFER (type 5) to satisfy the 3s budget.
+        resp = respond_deferred()
+        if inter.type == 2 and inter.data and inter.data.name:
+            if not executor.submit(inter.data.name, lambda: _dispatch_command(inter)):
+                resp = respond_message(
+                    "⏳ The table is busy right now, try again in a moment.", ephemeral=True
+                )
+
+    metrics.observe_ms("interactions.ack_ms", (time.perf_counter() - started) * 1000)
+    return resp
+
+@app.get("/campaigns/{campaign_id}/transcripts/export")
+async def export_transcripts(
+    campaign_id: int,
+    request: Request,
+    scene_id: int | None = None,
+    compression: str | None = None,
+    guild_id: int | None = None,
+):
+    # Disabled unless EXPORT_TOKEN is set; 404 rather than advertise the route.
+    if not settings.export_token:
+        raise HTTPException(status_code=404)
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth, f"Bearer {settings.export_token}"):
+        raise HTTPException(status_code=401, detail="bad export token")
+    try:
+        export.check_compression(compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    async def body():
+        # The session (and its server-side cursor) lives exactly as long as the response.
+        # Campaign ids are per shard: sharded deployments must say which guild's campaign.
+        async with session_scope(readonly=True, guild_id=guild_id) as s:
+            rows = repos.stream_transcripts(
+                s, campaign_id, scene_id, batch_size=settings.transcript_export_batch_rows
+            )
+            async for chunk in export.export_stream(rows, compression):
+                yield chunk
+        metrics.inc("export.completed")
+
+    filename = f"campaign-{campaign_id}" + (f"-scene-{scene_id}" if scene_id else "") + ".ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compression:
+        headers["Content-Encoding"] = compression
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
+
+@dataclass(frozen=True)
+class _Context:
+    guild_id: int
+    channel_id: int
+    user_id: int
+    username: str
+    campaign_id: int
+    scene_id: int
+    rng_seed: int | None = None  # campaign's dice stream seed
 
-    if inter.type == 2 and inter.data and inter.data.name:
-        asyncio.create_task(_dispatch_command(inter))
-    return respond_deferred()
 
 async def _dispatch_command(inter: Interaction):
+    started = time.perf_counter()
+    try:
+        ctx = await _resolve_context(inter)
+        lease = None
+        if inter.data.name in SCENE_LOCKED:
+            try:
+                lease = await locks.get_manager().acquire(f"scene:{ctx.channel_id}")
+            except locks.LockTimeoutError:
+                msg = "⏳ Someone else is acting in this scene; try again in a moment."
+                await followup_message(inter.application_id, inter.token, msg, ephemeral=True)
+                return
+        try:
+            await _handle_command(inter, ctx)
+        finally:
+            if lease is not None:
+                await locks.get_manager().release(lease)
+    except Exception:
+        metrics.inc("interactions.dispatch_errors")
+        log.exception("command dispatch failed", command=inter.data.name if inter.data else None)
+    finally:
+        metrics.observe_ms("interactions.dispatch_ms", (time.perf_counter() - started) * 1000)
+
+async def _handle_command(inter: Interaction, ctx: _Context):
     name = inter.data.name
 
     if name == "sheet":
@@ -84,39 +229,87 @@ async def _dispatch_command(inter: Interaction):
                 await followup_message(inter.application_id, inter.token, f"❌ Invalid JSON or schema: {e}", ephemeral=True)
                 return
 
-            # Resolve context (guild/channel/user)
-            guild_id, channel_id, user_id, username = _infer_ids_from_interaction(inter)  # implement this helper
-            async with session_scope() as s:
-                campaign = await repos.get_or_create_campaign(s, guild_id, name="Default")
-                player = await repos.get_or_create_player(s, user_id, username)
-                await repos.ensure_scene(s, campaign.id, channel_id)
-
-                ch = await repos.upsert_character(s, campaign.id, player.id, sheet)
-                await repos.write_transcript(s, campaign.id, None, channel_id, "system", "sheet.create", str(user_id), meta={"name": sheet.name})
+            async with session_scope(guild_id=ctx.guild_id) as s:
+                player = await repos.resolve_player(s, ctx.user_id, ctx.username)
+                ch = await repos.upsert_character(s, ctx.campaign_id, player.id, sheet)
+            await transcript_sink.write(
+                ctx.campaign_id, None, ctx.channel_id, "system", "sheet.create", str(ctx.user_id),
+                meta={"name": sheet.name}, guild_id=ctx.guild_id,
+            )
 
             await followup_message(inter.application_id, inter.token, f"✅ Sheet saved for **{sheet.name}**")
             return
 
+        elif sub == "update":
+            who = _option(inter, "name")
+            raw = _option(inter, "patch")
+            try:
+                # patch: an RFC 6902 op array, or {"hp.current": 11, ...} field setters
+                payload = json.loads(raw) if raw else []
+                if not isinstance(payload, list | dict):
+                    raise ValueError("expected an array of ops or an object of field setters")
+                ops = setters_to_patch(payload) if isinstance(payload, dict) else payload
+            except ValueError as e:
+                await followup_message(
+                    inter.application_id, inter.token, f"❌ Invalid JSON: {e}", ephemeral=True
+                )
+                return
+            setters = {}
+            if _option(inter, "hp") is not None:
+                setters["hp.current"] = int(_option(inter, "hp"))
+            conditions = _option(inter, "conditions")
+            if conditions is not None:
+                setters["conditions"] = [] if conditions.strip().lower() in ("", "-", "none") else [
+                    c.strip() for c in conditions.split(",") if c.strip()
+                ]
+            ops = [*ops, *setters_to_patch(setters)]
+            if not ops:
+                await followup_message(
+                    inter.application_id, inter.token, "❌ Nothing to update.", ephemeral=True
+                )
+                return
+            try:
+                async with session_scope(guild_id=ctx.guild_id) as s:
+                    ch = await repos.patch_character(s, ctx.campaign_id, who, ops)
+            except (PatchError, repos.StaleSheetError) as e:
+                await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+                return
+            if ch is None:
+                await followup_message(
+                    inter.application_id, inter.token, f"❌ No character named **{who}**",
+                    ephemeral=True,
+                )
+                return
+            paths = [op.get("path") for op in ops if isinstance(op, dict)]
+            await transcript_sink.write(
+                ctx.campaign_id, None, ctx.channel_id, "system", "sheet.update", str(ctx.user_id),
+                meta={"name": who, "paths": paths}, guild_id=ctx.guild_id,
+            )
+
+            hp = ch.sheet.get("hp", {})
+            await followup_message(
+                inter.application_id, inter.token,
+                f"✅ Updated **{who}** — HP {hp.get('current')}/{hp.get('max')}",
+            )
+            return
+
         elif sub == "show":
             who = _option(inter, "name")
-            guild_id, channel_id, user_id, username = _infer_ids_from_interaction(inter)
-            async with session_scope() as s:
-                campaign = await repos.get_or_create_campaign(s, guild_id)
-                ch = await repos.get_character(s, campaign.id, who)
-                if not ch:
-                    await followup_message(inter.application_id, inter.token, f"❌ No character named **{who}**", ephemeral=True)
-                    return
-                await repos.write_transcript(s, campaign.id, None, channel_id, "system", "sheet.show", str(user_id), meta={"name": who})
-
-            # present a compact summary
-            sheet = ch.sheet
-            summary = (
-                f"**{sheet['name']}** — {sheet['class']} {sheet['level']}\n"
-                f"AC {sheet['ac']} | HP {sheet['hp']['current']}/{sheet['hp']['max']} | "
-                f"STR {sheet['abilities']['STR']} DEX {sheet['abilities']['DEX']} CON {sheet['abilities']['CON']} "
-                f"INT {sheet['abilities']['INT']} WIS {sheet['abilities']['WIS']} CHA {sheet['abilities']['CHA']}"
+            async with session_scope(readonly=True, guild_id=ctx.guild_id) as s:
+                view = await repos.get_character_view(s, ctx.campaign_id, who)
+            if not view:
+                await followup_message(
+                    inter.application_id, inter.token, f"❌ No character named **{who}**",
+                    ephemeral=True,
+                )
+                return
+            await transcript_sink.write(
+                ctx.campaign_id, None, ctx.channel_id, "system", "sheet.show", str(ctx.user_id),
+                meta={"name": who}, guild_id=ctx.guild_id,
             )
-            await followup_message(inter.application_id, inter.token, summary, ephemeral=True)
+
+            # compact summary, pre-rendered when the view was built
+            await followup_message(inter.application_id, inter.token, view.summary, ephemeral=True)
             return
 
     if name == "roll":
@@ -124,33 +317,100 @@ async def _dispatch_command(inter: Interaction):
         expr = _option(inter, "expr", default="1d20")
         adv = bool(_option(inter, "advantage", default=False))
         dis = bool(_option(inter, "disadvantage", default=False))
-        res = rng.roll(expr, advantage=adv, disadvantage=dis)
-        text = f"🎲 `{expr}` → rolls {res.rolls} {'(adv)' if adv else '(dis)' if dis else ''} = **{res.total}**"
+        times = int(_option(inter, "times", default=1))
+        if times > 1:
+            # Repeated rolls (mass damage, NPC volleys): one vectorized batch.
+            try:
+                compile_expr(expr)
+                roller, index = await _scene_batch(ctx)
+                # Off the event loop: a large batch is tens of milliseconds of NumPy.
+                batch = await asyncio.to_thread(roller.roll_n, expr, min(times, 1000))
+            except ValueError as e:
+                await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+                return
+            if (audit_log := audit.get_log()) is not None:
+                audit_log.batch(
+                    ctx.rng_seed, ctx.scene_id, index, expr,
+                    len(batch.totals), int(batch.totals.sum()),
+                )
+            st = batch.stats()
+            totals = batch.totals.tolist()
+            shown = ", ".join(map(str, totals[:25])) + (" …" if len(totals) > 25 else "")
+            text = (
+                f"🎲 `{expr}` × {st['n']} → {shown}\n"
+                f"Σ **{int(batch.totals.sum())}** | mean {st['mean']:.1f} | "
+                f"min {st['min']} | max {st['max']}"
+            )
+            await followup_message(inter.application_id, inter.token, text)
+            return
+        try:
+            res, index = await _scene_roll(ctx, expr, advantage=adv, disadvantage=dis)
+        except ValueError as e:
+            await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+            return
+        if (audit_log := audit.get_log()) is not None:
+            audit_log.roll(ctx.rng_seed, ctx.scene_id, index, res, adv, dis)
+        dropped = f" (dropped {_fmt_dice(res.dropped)})" if res.dropped else ""
+        mode = "(adv)" if adv else "(dis)" if dis else ""
+        text = f"🎲 `{expr}` → rolls {_fmt_dice(res.rolls)}{dropped} {mode} = **{res.total}**"
         await followup_message(inter.application_id, inter.token, text)
     elif name == "check":
-        # options: ability, score, proficient, expertise, prof_bonus, dc, advantage, disadvantage
-        ability = _option(inter, "ability", default="DEX").upper()
-        score = int(_option(inter, "score", default=10))
-        prof = bool(_option(inter, "proficient", default=False))
-        exp  = bool(_option(inter, "expertise", default=False))
-        pb   = int(_option(inter, "prof_bonus", default=2))
-        dc   = int(_option(inter, "dc", default=15))
-        adv  = bool(_option(inter, "advantage", default=False))
-        dis  = bool(_option(inter, "disadvantage", default=False))
+        # options: character, skill, ability, score, proficient, expertise, prof_bonus, dc,
+        # advantage, disadvantage (or group + passive: the whole party at once)
+        if _option(inter, "group"):
+            await _group_check(inter, ctx)
+            return
+        checked = await _check_from_options(inter, ctx)
+        if checked is None:
+            return
+        ci, label = checked
+        adv, dis, dc = ci.advantage, ci.disadvantage, ci.dc
 
         # d20 (1 or 2 rolls depending on adv/dis)
-        res_roll = rng.roll("1d20", advantage=adv, disadvantage=dis)
-        ci = CheckInput(ability=ability, score=score, proficient=prof, expertise=exp,
-                        proficiency_bonus=pb, dc=dc, advantage=adv, disadvantage=dis)
+        res_roll, index = await _scene_roll(ctx, "1d20", advantage=adv, disadvantage=dis)
         out = compute_check(ci, res_roll.rolls[:2] if len(res_roll.rolls) >= 2 else [res_roll.rolls[0]])
+        if (audit_log := audit.get_log()) is not None:
+            audit_log.check(ctx.rng_seed, ctx.scene_id, index, ci, out)
         verdict = "✅ success" if out.success else "❌ fail"
         text = (
-            f"🧪 **{ability}** check vs DC {dc}\n"
+            f"🧪 **{label}** check vs DC {dc}\n"
             f"• d20: {out.d20} → pick {out.pick}\n"
             f"• mod: {out.mod:+}\n"
             f"= **{out.total}** → {verdict}"
         )
         await followup_message(inter.application_id, inter.token, text)
+    elif name == "odds":
+        # Exact odds, no rolling: a dice expression (optionally vs a DC), or a /check-style check.
+        expr = _option(inter, "expr")
+        if expr:
+            adv = bool(_option(inter, "advantage", default=False))
+            dis = bool(_option(inter, "disadvantage", default=False))
+            try:
+                # Bounded (odds.MAX_SUPPORT), but still up to a few hundred ms of NumPy:
+                # off the loop.
+                dist = await asyncio.to_thread(odds.distribution, expr, adv, dis)
+            except ValueError as e:
+                await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+                return
+            text = f"🎯 `{expr}`: mean {dist.mean:.2f}, range {dist.min}–{dist.max}"
+            dc = _option(inter, "dc")
+            if dc is not None:
+                text += f" | P(≥ {int(dc)}) = **{dist.prob_at_least(int(dc)):.1%}**"
+        else:
+            checked = await _check_from_options(inter, ctx)
+            if checked is None:
+                return
+            ci, label = checked
+            mode = " (adv)" if ci.advantage else " (dis)" if ci.disadvantage else ""
+            chance = odds.check_odds(ci)
+            text = f"🎯 **{label}** check vs DC {ci.dc}{mode}: **{chance:.1%}** to succeed"
+        await followup_message(inter.application_id, inter.token, text, ephemeral=True)
+    elif name == "combat":
+        if not settings.features_combat:
+            msg = "❌ Combat is currently disabled; scenes stay in exploration mode."
+            await followup_message(inter.application_id, inter.token, msg, ephemeral=True)
+            return
+        await _combat_command(inter, ctx, _subcommand(inter))
     elif name == "ooc":
         if not settings.features_llm or not llm_client:
             await followup_message(inter.application_id, inter.token, "❌ The LLM narrator is currently disabled.", ephemeral=True)
@@ -161,18 +421,22 @@ async def _dispatch_command(inter: Interaction):
             await followup_message(inter.application_id, inter.token, "❌ You need to provide a message.", ephemeral=True)
             return
 
-        guild_id, channel_id, user_id, username = _infer_ids_from_interaction(inter)
+        # Keep DB work in short phases around the LLM call: a narration can take
+        # seconds and must not pin a pooled connection (or SQLite's write lock).
 
-        async with session_scope() as s:
-            campaign = await repos.get_or_create_campaign(s, guild_id)
-            scene = await repos.ensure_scene(s, campaign.id, channel_id)
-
-            # 1. Write the player's message to the transcript immediately
-            await repos.write_transcript(s, campaign.id, scene.id, channel_id, "player", message, str(user_id))
+        # 1. Write the player's message to the transcript (buffered; reads below still see it)
+        await transcript_sink.write(
+            ctx.campaign_id, ctx.scene_id, ctx.channel_id, "player", message, str(ctx.user_id),
+            guild_id=ctx.guild_id,
+        )
 
+        # Not from a replica: the player's last turns may be flushed but not replicated yet.
+        async with session_scope(readonly=True, guild_id=ctx.guild_id, replica=False) as s:
             # 2. Fetch recent history for context, only from this user
-            history = await repos.get_recent_transcripts(s, scene.id, limit=15, user_id=str(user_id))
-            
+            history = await transcript_sink.recent(
+                s, ctx.scene_id, limit=15, user_id=str(ctx.user_id)
+            )
+
             # 3. Format history for the LLM prompt
             prompt_messages = []
             for entry in history:
@@ -180,25 +444,317 @@ async def _dispatch_command(inter: Interaction):
                 role = "user" if entry.author == "player" else "assistant" if entry.author == "bot" else None
                 if role:
                     prompt_messages.append({"role": role, "content": entry.content})
-            
-            # 4. Call the LLM to get a narrative response
-            log.info("Generating LLM response", scene_id=scene.id, history_len=len(prompt_messages))
+
+        # 4. Call the LLM to get a narrative response (no session held)
+        log.info("Generating LLM response", scene_id=ctx.scene_id, history_len=len(prompt_messages))
+        prefix = f"**{ctx.username}:** {message}\n**Response:** "
+        if settings.llm_stream:
+            # 4+5. Stream it: first sentence goes out as the follow-up, the rest as edits
+            llm_response = await _stream_to_followup(
+                inter, prefix, llm_client.stream_response(prompt_messages),
+                settings.llm_stream_edit_interval_seconds,
+            )
+        else:
             llm_response = await llm_client.generate_response(prompt_messages)
 
-            if not llm_response:
-                # The LLM client already logs errors, just inform the user.
-                await followup_message(inter.application_id, inter.token, "The narrator is silent. (No response from LLM)", ephemeral=True)
-                return
-            
-            # 5. Send the LLM's response to the Discord channel
-            formatted_response = f"**{username}:** {message}\n**Response:** {llm_response}"
-            await followup_message(inter.application_id, inter.token, formatted_response)
+        if not llm_response:
+            # The LLM client already logs errors, just inform the user.
+            await followup_message(
+                inter.application_id, inter.token,
+                "The narrator is silent. (No response from LLM)", ephemeral=True,
+            )
+            return
 
-            # 6. Write the LLM's response to the transcript to complete the loop
-            await repos.write_transcript(s, campaign.id, scene.id, channel_id, "bot", llm_response, str(user_id))
+        # 5. Send the LLM's response to the Discord channel
+        if not settings.llm_stream:
+            await followup_message(inter.application_id, inter.token, prefix + llm_response)
+
+        # 6. Write the LLM's response to the transcript to complete the loop
+        await transcript_sink.write(
+            ctx.campaign_id, ctx.scene_id, ctx.channel_id, "bot", llm_response, str(ctx.user_id),
+            guild_id=ctx.guild_id,
+        )
     else:
         await followup_message(inter.application_id, inter.token, f"Unknown command: {name}", ephemeral=True)
 
+_SENTENCE_END = re.compile(r"[.!?…](\s|$)|\n")
+
+async def _stream_to_followup(
+    inter: Interaction, prefix: str, chunks: AsyncIterator[str], interval: float
+) -> str:
+    """
+    Post the follow-up as soon as the first sentence is complete, then PATCH the same
+    message at most every `interval` seconds while tokens arrive. Returns the final text.
+    """
+    text = ""
+    shown = ""
+    message_id = None
+    last_edit = 0.0
+    async for delta in chunks:
+        text += delta
+        if message_id is None:
+            if not _SENTENCE_END.search(text):
+                continue
+            msg = await followup_message(
+                inter.application_id, inter.token, prefix + text + " …", wait=True
+            )
+            message_id, shown, last_edit = msg["id"], text, time.monotonic()
+        elif time.monotonic() - last_edit >= interval and text != shown:
+            await edit_followup_message(
+                inter.application_id, inter.token, message_id, prefix + text + " …"
+            )
+            shown, last_edit = text, time.monotonic()
+
+    final = text.strip()
+    if not final:
+        return final
+    if message_id is None:
+        await followup_message(inter.application_id, inter.token, prefix + final)
+    else:
+        await edit_followup_message(inter.application_id, inter.token, message_id, prefix + final)
+    return final
+
+async def _scene_roll(
+    ctx: _Context, expr: str, advantage: bool = False, disadvantage: bool = False
+) -> tuple[DiceRoll, int | None]:
+    """
+    Next roll on the scene's dice stream and its index; replayable from (seed,
+    scene, index). Index is None without a campaign seed. Raises ValueError on a bad expr.
+    """
+    compile_expr(expr)  # reject bad input before spending a stream index
+    if ctx.rng_seed is None:
+        return rng.roll(expr, advantage=advantage, disadvantage=disadvantage), None
+    async with session_scope(guild_id=ctx.guild_id) as s:
+        index = await repos.next_roll_index(s, ctx.scene_id)
+    return SceneRNG(ctx.rng_seed, ctx.scene_id).roll(index, expr, advantage, disadvantage), index
+
+async def _scene_batch(ctx: _Context) -> tuple[BatchRoller, int | None]:
+    if ctx.rng_seed is None:
+        return BatchRoller(), None
+    async with session_scope(guild_id=ctx.guild_id) as s:
+        index = await repos.next_roll_index(s, ctx.scene_id)
+    return SceneRNG(ctx.rng_seed, ctx.scene_id).batch(index), index
+
+async def _scene_d20s(ctx: _Context, n: int) -> tuple[np.ndarray, int | None]:
+    """(n, 2) d20s in one draw: a single stream index covers the whole party."""
+    if ctx.rng_seed is None:
+        return np.random.default_rng().integers(1, 21, size=(n, 2)), None
+    async with session_scope(guild_id=ctx.guild_id) as s:
+        index = await repos.next_roll_index(s, ctx.scene_id)
+    return SceneRNG(ctx.rng_seed, ctx.scene_id).draws(index, 20, 2 * n).reshape(n, 2), index
+
+async def _group_check(inter: Interaction, ctx: _Context) -> None:
+    """/check group:<names|all>: every character's check in one draw and one message."""
+    group = _option(inter, "group").strip()
+    names = None
+    if group.lower() not in ("all", "party", "everyone"):
+        names = [n.strip() for n in group.split(",") if n.strip()]
+    skill = _option(inter, "skill")
+    dc    = int(_option(inter, "dc", default=15))
+    adv   = bool(_option(inter, "advantage", default=False))
+    dis   = bool(_option(inter, "disadvantage", default=False))
+    exp   = bool(_option(inter, "expertise", default=False))
+    passive = bool(_option(inter, "passive", default=False))
+    if (err := _out_of_range(dc=dc)) is not None:
+        await followup_message(inter.application_id, inter.token, err, ephemeral=True)
+        return
+
+    async with session_scope(readonly=True, guild_id=ctx.guild_id) as s:
+        views = await repos.get_character_views(s, ctx.campaign_id, names)
+    missing = sorted(set(names or ()) - {v.name for v in views})
+    if missing or not views:
+        msg = (
+            f"❌ No character named **{missing[0]}**" if missing
+            else "❌ No characters in this campaign yet."
+        )
+        await followup_message(inter.application_id, inter.token, msg, ephemeral=True)
+        return
+    if len(views) > MAX_GROUP:
+        msg = f"❌ Group checks take up to {MAX_GROUP} characters."
+        await followup_message(inter.application_id, inter.token, msg, ephemeral=True)
+        return
+    try:
+        ability = _option(inter, "ability")
+        inputs = [
+            v.check_input(ability, skill, dc=dc, advantage=adv, disadvantage=dis, expertise=exp)
+            for v in views
+        ]
+    except ValueError as e:
+        await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+        return
+
+    d20, index = (None, None) if passive else await _scene_d20s(ctx, len(inputs))
+    res = compute_checks(inputs, d20)
+    if (audit_log := audit.get_log()) is not None:
+        audit_log.group(ctx.rng_seed, ctx.scene_id, index, inputs, res, passive=passive)
+    what = inputs[0].ability
+    if skill:
+        what = f"{skill.replace('_', ' ').title()} ({what})"
+    lines = [f"🧪 **Group {'passive ' if passive else ''}{what}** check vs DC {dc}"]
+    rows = zip(
+        views, res.d20.tolist(), res.pick.tolist(), res.mod.tolist(),
+        res.total.tolist(), res.success.tolist(), strict=True,
+    )
+    for v, d20, pick, mod, total, ok in rows:
+        roll = f"{d20} → {pick}" if (adv or dis) and not passive else f"{pick}"
+        lines.append(f"• {v.name}: {roll} {mod:+} = **{total}** {'✅' if ok else '❌'}")
+    verdict = "✅ group success" if res.group_success else "❌ group fail"
+    lines.append(f"= {res.successes}/{len(views)} succeeded → {verdict}")
+    await followup_message(inter.application_id, inter.token, "\n".join(lines))
+
+def _fmt_dice(values: list[int], shown: int = 60) -> str:
+    # Keeps a /roll of a few thousand dice inside Discord's 2000-character message limit.
+    if len(values) <= shown:
+        return str(values)
+    return f"[{', '.join(map(str, values[:shown]))}, … +{len(values) - shown} more]"
+
+def _fmt_turn(turn: combat.TurnInfo) -> str:
+    left = ""
+    if turn.deadline is not None:
+        secs = max(0, int((turn.deadline - datetime.now(timezone.utc)).total_seconds()))
+        left = f" ({secs // 60}:{secs % 60:02d} left)"
+    return f"Round {turn.round} — **{turn.actor_ref}**'s turn{left}"
+
+def _fmt_order(enc: combat.Encounter) -> str:
+    cur = enc.current.actor_ref if enc.current else None
+    return "\n".join(
+        f"{'▶' if c.actor_ref == cur else '•'} {c.initiative:>2} {c.actor_ref}"
+        + (" (dodging)" if c.actor_ref in enc.dodging else "")
+        for c in enc.order()
+    )
+
+async def _combat_command(inter: Interaction, ctx: _Context, sub: str | None) -> None:
+    """/combat start|next|status|remove|end on the scene's turn engine (combat.py)."""
+    engine = combat.engine
+    try:
+        if sub == "start":
+            if engine.get(ctx.scene_id) is not None:
+                raise combat.TurnError("combat is already running here; /combat end first")
+            async with session_scope(readonly=True, guild_id=ctx.guild_id) as s:
+                views = await repos.get_character_views(s, ctx.campaign_id)
+            entries = [(v.name, v.mod("DEX"), 0) for v in views]
+            # npcs: "Goblin+2, Orc, Wolf-1" (initiative modifier after the name)
+            for raw in (_option(inter, "npcs") or "").split(","):
+                m = re.fullmatch(r"\s*(.+?)\s*([+-]\d+)?\s*", raw)
+                if m and m.group(1):
+                    entries.append((m.group(1), int(m.group(2) or 0), 0))
+            if not entries:
+                raise combat.TurnError("nobody to fight: create a sheet or pass npcs")
+            if len(entries) > MAX_GROUP:
+                raise combat.TurnError(f"combat takes up to {MAX_GROUP} combatants")
+            d20, _ = await _scene_d20s(ctx, len(entries))
+            order = combat.initiative_order(entries, d20[:, 0].tolist())
+            await engine.writer.flush()  # turn numbers run on from this scene's last combat
+            async with session_scope(guild_id=ctx.guild_id) as s:
+                first = await repos.last_turn_no(s, ctx.scene_id) + 1
+                await repos.set_combatants(s, ctx.scene_id, [c.row() for c in order])
+                await repos.set_scene_mode(s, ctx.channel_id, "combat")
+            turn = engine.start(
+                ctx.scene_id, order, ctx.guild_id, ctx.campaign_id, ctx.channel_id,
+                first_turn_no=first,
+            )
+            order_text = _fmt_order(engine.get(ctx.scene_id))
+            text = f"⚔️ **Combat!** Initiative:\n{order_text}\n{_fmt_turn(turn)}"
+        elif sub == "next":
+            turn = engine.end_turn(ctx.scene_id, _option(inter, "actor"))
+            text = f"⏭️ {_fmt_turn(turn)}"
+        elif sub == "status":
+            enc = engine.get(ctx.scene_id)
+            if enc is None:
+                raise combat.TurnError("no combat in this scene")
+            text = _fmt_order(enc)
+            if enc.current:
+                text = f"⚔️ Initiative:\n{text}\n{_fmt_turn(enc.current)}"
+        elif sub == "remove":
+            who = _option(inter, "name")
+            turn = engine.remove(ctx.scene_id, who)
+            async with session_scope(guild_id=ctx.guild_id) as s:
+                await repos.remove_combatant(s, ctx.scene_id, who)
+            text = f"🚪 **{who}** leaves the fight." + (f"\n{_fmt_turn(turn)}" if turn else "")
+        elif sub == "end":
+            enc = engine.end(ctx.scene_id)
+            async with session_scope(guild_id=ctx.guild_id) as s:
+                await repos.set_combatants(s, ctx.scene_id, [])
+                await repos.set_scene_mode(s, ctx.channel_id, "exploration")
+            text = f"🏳️ Combat over after {enc.round} round{'s' if enc.round != 1 else ''}."
+        else:
+            raise combat.TurnError(f"unknown subcommand {sub!r}")
+    except combat.TurnError as e:
+        await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+        return
+    await transcript_sink.write(
+        ctx.campaign_id, ctx.scene_id, ctx.channel_id, "system", f"combat.{sub}",
+        str(ctx.user_id), guild_id=ctx.guild_id,
+    )
+    await followup_message(inter.application_id, inter.token, text)
+
+async def _on_turn_timeout(enc: combat.Encounter, ended: combat.TurnEnded) -> None:
+    # No interaction token to answer on: the timeout goes to the scene's transcript.
+    if enc.campaign_id is None:
+        return
+    await transcript_sink.write(
+        enc.campaign_id, enc.scene_id, enc.channel_id, "system", f"turn.timeout ({ended.outcome})",
+        meta={
+            "actor": ended.turn.actor_ref, "turn_no": ended.turn.turn_no,
+            "next": ended.next.actor_ref,
+        },
+        guild_id=enc.guild_id,
+    )
+
+async def _check_from_options(inter: Interaction, ctx: _Context) -> tuple[CheckInput, str] | None:
+    """CheckInput and header label from /check-style options; None once an error has been sent."""
+    who  = _option(inter, "character")
+    skill = _option(inter, "skill")
+    exp  = bool(_option(inter, "expertise", default=False))
+    dc   = int(_option(inter, "dc", default=15))
+    adv  = bool(_option(inter, "advantage", default=False))
+    dis  = bool(_option(inter, "disadvantage", default=False))
+    if (err := _out_of_range(dc=dc)) is not None:
+        await followup_message(inter.application_id, inter.token, err, ephemeral=True)
+        return None
+
+    if who:
+        # Everything else comes from the sheet (cached CharacterView).
+        async with session_scope(readonly=True, guild_id=ctx.guild_id) as s:
+            view = await repos.get_character_view(s, ctx.campaign_id, who)
+        if not view:
+            msg = f"❌ No character named **{who}**"
+            await followup_message(inter.application_id, inter.token, msg, ephemeral=True)
+            return None
+        try:
+            ci = view.check_input(
+                _option(inter, "ability"), skill, dc=dc, advantage=adv, disadvantage=dis,
+                expertise=exp,
+            )
+        except ValueError as e:
+            await followup_message(inter.application_id, inter.token, f"❌ {e}", ephemeral=True)
+            return None
+        if _option(inter, "proficient"):
+            ci = replace(ci, proficient=True)
+    else:
+        ability = _option(inter, "ability", default="DEX").upper()
+        score = int(_option(inter, "score", default=10))
+        prof = int(_option(inter, "prof_bonus", default=2))
+        if (err := _out_of_range(score=score, prof_bonus=prof)) is not None:
+            await followup_message(inter.application_id, inter.token, err, ephemeral=True)
+            return None
+        ci = CheckInput(ability=ability, score=score,
+                        proficient=bool(_option(inter, "proficient", default=False)), expertise=exp,
+                        proficiency_bonus=prof, dc=dc, advantage=adv, disadvantage=dis)
+    ability = ci.ability
+    if who and skill:
+        label = f"{who} — {skill.replace('_', ' ').title()} ({ability})"
+    else:
+        label = f"{who} — {ability}" if who else ability
+    return ci, label
+
+def _out_of_range(**values: int) -> str | None:
+    for name, v in values.items():
+        lo, hi = OPTION_RANGES[name]
+        if not lo <= v <= hi:
+            return f"❌ {name} must be between {lo} and {hi}."
+    return None
+
 def _subcommand(inter: Interaction) -> str | None:
     # options[0].name for SUB_COMMAND
     if inter.data and inter.data.options:
@@ -225,23 +781,15 @@ def _infer_ids_from_interaction(inter):
     username = user.username if user else "Unknown"
     return guild_id, channel_id, user_id, username
 
-async def _resolve_context(inter: Interaction):
-    guild_id = int(inter.guild.id) if inter.guild else 0
-    channel_id = int(inter.channel.id) if inter.channel else 0
-    user = inter.member.user if inter.member and inter.member.user else None
-    user_id = int(user.id) if user else 0
-    username = user.username if user else "Unknown"
-
-    # Discord Interaction payloads carry these in different places depending on type.
-    # For slash commands: guild_id & channel_id are in "guild_id"/"channel" fields (add to schemas if needed).
-    # For simplicity here, we assume you extended Interaction to include guild_id/channel.id/user.id
-    # If not, adapt based on your actual payload.
-
-    # TODO: parse from raw JSON fields in your Interaction model if missing.
-
-    async with session_scope() as s:
-        campaign = await repos.get_or_create_campaign(s, guild_id, name="Default")
-        player = await repos.get_or_create_player(s, user_id, username)
-        scene = await repos.ensure_scene(s, campaign.id, channel_id)
-        await repos.write_transcript(s, campaign.id, scene.id, channel_id, "player", "<user message>", str(user_id))
-        return campaign, player, scene
+async def _resolve_context(inter: Interaction) -> _Context:
+    """
+    Map the interaction onto campaign/scene rows. Runs in the deferred worker,
+    never on the ack path.
+    """
+    guild_id, channel_id, user_id, username = _infer_ids_from_interaction(inter)
+    async with session_scope(guild_id=guild_id) as s:
+        campaign = await repos.resolve_campaign(s, guild_id, name="Default")
+        scene = await repos.resolve_scene(s, campaign.id, channel_id)
+    return _Context(
+        guild_id, channel_id, user_id, username, campaign.id, scene.id, campaign.rng_seed
+    )
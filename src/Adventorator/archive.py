@@ -0,0 +1,376 @@
+# archive.py
+
+"""
+Cold archival for transcripts.
+
+Rows older than `archive_after_days` are moved out of the database into gzip'd
+JSONL files under `archive_path`, described by a `manifest.json` (file, row count,
+campaign/scene ids, created_at and id ranges) so reads can skip files that can't
+match. Files are immutable once written.
+
+- Postgres with a partitioned `transcripts` table (migration c7e19a4b6d25):
+  whole monthly partitions past the cutoff are exported, then detached and dropped.
+  Future partitions are created ahead of time by the same job.
+- Everything else (SQLite, or an unpartitioned Postgres table): rows past the cutoff
+  are exported in batches and deleted by id.
+
+A file is always in the manifest before its rows are deleted. If we die in between,
+the next run archives those rows again and readers dedupe by id.
+
+Passes take the `archive:transcripts` lease (locks.py), so with several workers
+(and the cron script) only one archives at a time and manifest.json has a single
+writer. That needs a shared lock backend (postgres or redis); with the local one,
+run a single archiving process.
+
+`repos.get_transcript_history` merges archived rows back in behind hot ones.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+import structlog
+from sqlalchemy import MetaData, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Adventorator import locks, metrics, models
+from Adventorator.config import load_settings
+from Adventorator.db import session_scope, utc
+from Adventorator.locks import Lease
+
+log = structlog.get_logger()
+settings = load_settings()
+
+MANIFEST = "manifest.json"
+LEASE_KEY = "archive:transcripts"
+_COLUMNS = (
+    models.Transcript.id, models.Transcript.campaign_id, models.Transcript.scene_id,
+    models.Transcript.channel_id, models.Transcript.message_id, models.Transcript.author,
+    models.Transcript.author_ref, models.Transcript.content, models.Transcript.meta,
+    models.Transcript.created_at,
+)
+
+
+def _key(row: dict) -> tuple[datetime, int]:
+    return (row["created_at"], row["id"])
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    file: str
+    rows: int
+    campaign_ids: tuple[int, ...]
+    scene_ids: tuple[int, ...]
+    min_created_at: datetime
+    max_created_at: datetime
+    min_id: int
+    max_id: int
+    shard: str | None = None  # ids are per shard when sharded
+
+    def to_json(self) -> dict:
+        return {
+            "file": self.file, "rows": self.rows,
+            "campaign_ids": list(self.campaign_ids), "scene_ids": list(self.scene_ids),
+            "min_created_at": self.min_created_at.isoformat(),
+            "max_created_at": self.max_created_at.isoformat(),
+            "min_id": self.min_id, "max_id": self.max_id, "shard": self.shard,
+        }
+
+    @classmethod
+    def from_json(cls, d: dict) -> ManifestEntry:
+        return cls(
+            d["file"], d["rows"], tuple(d["campaign_ids"]), tuple(d["scene_ids"]),
+            datetime.fromisoformat(d["min_created_at"]),
+            datetime.fromisoformat(d["max_created_at"]),
+            d["min_id"], d["max_id"], d.get("shard"),
+        )
+
+
+@lru_cache(maxsize=16)
+def _load_file(path: Path) -> tuple[dict, ...]:
+    # Archive files never change after they're written, so parsed contents can be cached.
+    with gzip.open(path, "rb") as f:
+        rows = [orjson.loads(line) for line in f]
+    for r in rows:
+        r["created_at"] = datetime.fromisoformat(r["created_at"])
+    return tuple(rows)
+
+
+class ArchiveStore:
+    """Archive files plus manifest under one directory."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._entries: list[ManifestEntry] = []
+        self._mtime: int | None = None
+
+    def entries(self) -> list[ManifestEntry]:
+        path = self.root / MANIFEST
+        with self._lock:
+            # Re-read when another process (the archiving worker) replaced the manifest.
+            mtime = path.stat().st_mtime_ns if path.exists() else None
+            if mtime != self._mtime:
+                data = orjson.loads(path.read_bytes()) if mtime is not None else {"files": []}
+                self._entries = [ManifestEntry.from_json(d) for d in data["files"]]
+                self._mtime = mtime
+            return list(self._entries)
+
+    def write_file(self, rel: str, rows: list[dict], shard: str | None = None) -> ManifestEntry:
+        """Write one archive file and add it to the manifest. Blocking; call via to_thread."""
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with gzip.open(tmp, "wb") as f:
+            for r in rows:
+                row = {**r, "created_at": utc(r["created_at"])}
+                f.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        entry = ManifestEntry(
+            file=rel,
+            rows=len(rows),
+            campaign_ids=tuple(sorted({r["campaign_id"] for r in rows})),
+            scene_ids=tuple(sorted({r["scene_id"] for r in rows if r["scene_id"] is not None})),
+            min_created_at=utc(min(r["created_at"] for r in rows)),
+            max_created_at=utc(max(r["created_at"] for r in rows)),
+            min_id=min(r["id"] for r in rows),
+            max_id=max(r["id"] for r in rows),
+            shard=shard,
+        )
+        entries = [e for e in self.entries() if e.file != rel] + [entry]
+        self._write_manifest(entries)
+        return entry
+
+    def _write_manifest(self, entries: list[ManifestEntry]) -> None:
+        path = self.root / MANIFEST
+        tmp = path.with_suffix(".json.tmp")
+        manifest = {"version": 1, "files": [e.to_json() for e in entries]}
+        tmp.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, path)
+        with self._lock:
+            self._entries = entries
+            self._mtime = path.stat().st_mtime_ns
+
+    def scan(
+        self,
+        scene_id: int,
+        limit: int,
+        user_id: str | None = None,
+        before: tuple[datetime, int] | None = None,
+        shard: str | None = None,
+    ) -> list[dict]:
+        """
+        The newest `limit` archived rows of a scene strictly older than `before`,
+        in chronological order. Reads newest files first and stops once older files
+        can't beat what we already have.
+        """
+        if before is not None:
+            before = (utc(before[0]), before[1])
+        candidates = sorted(
+            (
+                e for e in self.entries()
+                if e.shard == shard and scene_id in e.scene_ids
+                and (before is None or e.min_created_at <= before[0])
+            ),
+            key=lambda e: (e.max_created_at, e.max_id),
+            reverse=True,
+        )
+        found: dict[int, dict] = {}
+        for e in candidates:
+            if len(found) >= limit:
+                oldest_kept = sorted(found.values(), key=_key, reverse=True)[limit - 1]
+                if e.max_created_at < oldest_kept["created_at"]:
+                    break
+            for r in _load_file(self.root / e.file):
+                if r["scene_id"] != scene_id:
+                    continue
+                if user_id is not None and r["author_ref"] != user_id:
+                    continue
+                if before is not None and _key(r) >= before:
+                    continue
+                found[r["id"]] = r  # dedupes rows archived twice after a crash
+        rows = sorted(found.values(), key=_key)
+        return rows[-limit:] if limit else []
+
+
+_store: ArchiveStore | None = None
+
+
+def get_store() -> ArchiveStore | None:
+    """The configured archive, or None when archival is off."""
+    global _store
+    if settings.archive_path is None:
+        return None
+    if _store is None:
+        _store = ArchiveStore(settings.archive_path)
+    return _store
+
+
+async def _is_partitioned(s: AsyncSession) -> bool:
+    if s.get_bind().dialect.name != "postgresql":
+        return False
+    res = await s.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'transcripts'"
+    ))
+    return res.first() is not None
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return (_month_start(dt) + timedelta(days=32)).replace(day=1)
+
+
+async def ensure_partitions(s: AsyncSession, now: datetime, months_ahead: int = 2) -> None:
+    """Create monthly partitions from this month through `months_ahead` (Postgres only)."""
+    start = _month_start(now)
+    for _ in range(months_ahead + 1):
+        end = _next_month(start)
+        name = f"transcripts_p{start:%Y%m}"
+        await s.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF transcripts "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        start = end
+
+
+async def _expired_partitions(s: AsyncSession, cutoff: datetime) -> list[str]:
+    res = await s.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'transcripts' AND c.relname LIKE 'transcripts_p%' ORDER BY c.relname"
+    ))
+    expired = []
+    for name, _bound in res.all():
+        # transcripts_pYYYYMM covers that calendar month; expired once the whole month
+        # is past the cutoff.
+        month = datetime.strptime(name[len("transcripts_p"):], "%Y%m").replace(tzinfo=timezone.utc)
+        if _next_month(month) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+async def _export_batches(
+    store: ArchiveStore, stmt, prefix: str, batch_rows: int, shard: str | None
+) -> list[int]:
+    """Stream `stmt` into archive files of up to `batch_rows` rows; returns the archived ids."""
+    ids: list[int] = []
+    # Primary, not a replica: whatever we archive gets deleted from the primary next.
+    async with session_scope(shard=shard) as s:
+        result = await s.stream(stmt.execution_options(yield_per=batch_rows))
+        async for part in result.mappings().partitions(batch_rows):
+            rows = [dict(r) for r in part]
+            first = utc(rows[0]["created_at"])
+            rel = f"{first:%Y/%m}/{prefix}-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+            if shard is not None:
+                rel = f"{shard}/{rel}"
+            await asyncio.to_thread(store.write_file, rel, rows, shard)
+            ids.extend(r["id"] for r in rows)
+    return ids
+
+
+async def archive_once(
+    store: ArchiveStore,
+    older_than: timedelta,
+    batch_rows: int = 5000,
+    now: datetime | None = None,
+    shard: str | None = None,
+) -> int:
+    """
+    Archive everything older than `now - older_than` (on one shard, if sharded).
+    Returns rows archived.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - older_than
+    tr = models.Transcript
+    archived = 0
+
+    async with session_scope(shard=shard) as s:
+        partitioned = await _is_partitioned(s)
+        if partitioned:
+            await ensure_partitions(s, now)
+            expired = await _expired_partitions(s, cutoff)
+
+    if partitioned:
+        for name in expired:
+            part = models.Transcript.__table__.to_metadata(MetaData(), name=name)
+            stmt = select(*(part.c[c.key] for c in _COLUMNS)).order_by(part.c.created_at, part.c.id)
+            ids = await _export_batches(store, stmt, name, batch_rows, shard)
+            async with session_scope(shard=shard) as s:
+                await s.execute(text(f"ALTER TABLE transcripts DETACH PARTITION {name}"))
+                await s.execute(text(f"DROP TABLE {name}"))
+            archived += len(ids)
+            log.info("archived transcript partition", partition=name, shard=shard, rows=len(ids))
+        # Stragglers in the default partition fall through to the row path below.
+
+    while True:
+        stmt = (
+            select(*_COLUMNS).where(tr.created_at < cutoff)
+            .order_by(tr.created_at, tr.id).limit(batch_rows)
+        )
+        ids = await _export_batches(store, stmt, "rows", batch_rows, shard)
+        if not ids:
+            break
+        async with session_scope(shard=shard) as s:
+            await s.execute(delete(tr).where(tr.created_at < cutoff, tr.id.in_(ids)))
+        archived += len(ids)
+
+    if archived:
+        metrics.inc("archive.rows", archived)
+        log.info("archived transcripts", rows=archived, shard=shard, cutoff=cutoff.isoformat())
+    return archived
+
+
+async def take_lease(ttl: float) -> Lease | None:
+    """The archive lease, or None if another worker (or the cron script) holds it."""
+    try:
+        return await locks.get_manager().acquire(LEASE_KEY, ttl=ttl, wait=0)
+    except locks.LockTimeoutError:
+        metrics.inc("archive.skipped")
+        return None
+
+
+async def run_forever(
+    store: ArchiveStore, older_than: timedelta, interval: float, batch_rows: int
+) -> None:
+    """
+    Background archival loop started by the app when archive_path is set. The lease
+    is renewed per shard and left to lapse after `interval` rather than released, so
+    across workers there is one pass per interval, not one per worker.
+    """
+    while True:
+        lease = await take_lease(interval)
+        if lease is not None:
+            await _leased_pass(store, older_than, batch_rows, lease, interval)
+        await asyncio.sleep(interval)
+
+
+async def _leased_pass(
+    store: ArchiveStore, older_than: timedelta, batch_rows: int, lease: Lease, ttl: float
+) -> None:
+    from Adventorator.sharding import router
+    for shard in sorted(router.shards) or [None]:
+        try:
+            lease = await locks.get_manager().renew(lease, ttl)
+        except locks.LeaseLostError:
+            log.warning("archive lease lost mid-pass", shard=shard)
+            return
+        try:
+            await archive_once(store, older_than, batch_rows, shard=shard)
+        except Exception:
+            metrics.inc("archive.errors")
+            log.exception("transcript archival failed", shard=shard)
+
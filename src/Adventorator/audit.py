@@ -0,0 +1,460 @@
+# audit.py
+
+"""
+Append-only audit log of rules results: every roll and check, with enough of
+its inputs (seed, scene, stream index, expression, check parameters) to
+re-derive it from the seed later.
+
+Records are compact binary frames appended to memory-mapped segment files under
+`audit_path`. A segment is preallocated to `audit_segment_mb`, filled front to
+back, and replaced by a fresh one when full. Appends are a struct pack and a
+copy into the map under a lock; nothing on the hot path touches the disk. A
+background thread msyncs dirty segments every `audit_fsync_interval_ms` (group
+commit: a crash loses at most that window), or after every append when it's 0.
+
+Frame: <u32 payload length><u32 crc32(payload)><payload>. A zero length ends a
+segment (preallocated space is zero-filled); a frame whose CRC doesn't match is
+a torn write from a crash and also ends it.
+
+Payload: a fixed header (kind, flags, count, ts, seed, scene, index, total),
+then the expression (u16 length + UTF-8), kept and dropped dice (u32 count +
+int16 each), then for checks the ability, score, proficiency bonus, DC,
+modifier, picked d20 and position in the group. Each record shape packs with one
+cached Struct.
+
+`read_records` streams records back with filters; `verify` replays them
+through SceneRNG and the check rules. scripts/audit_log.py wraps both.
+"""
+
+from __future__ import annotations
+
+import functools
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import structlog
+
+from Adventorator import metrics
+from Adventorator.config import load_settings
+from Adventorator.rules.checks import ABILS, CheckInput, CheckResult, compute_check
+from Adventorator.rules.dice import DiceRoll
+from Adventorator.rules.group import GroupResult, compute_checks
+from Adventorator.rules.streams import SceneRNG
+
+log = structlog.get_logger()
+settings = load_settings()
+
+ROLL, CHECK, GROUP, BATCH = 1, 2, 3, 4
+KINDS = {"roll": ROLL, "check": CHECK, "group": GROUP, "batch": BATCH}
+
+ADV, DIS, PROFICIENT, EXPERTISE, SUCCESS, HAS_DC, UNSEEDED, PASSIVE = (1 << i for i in range(8))
+
+SUFFIX = ".alog"
+_FRAME = struct.Struct("<II")
+# kind, flags, count, ts_us, seed, scene_id, index, total
+_HEADER = struct.Struct("<BBIqqqQq")
+# ability, score, prof_bonus, dc, mod, pick, group position
+_CHECK = struct.Struct("<Bhhhhhh")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_MAX_EXPR = 0xFFFF
+
+
+@dataclass(frozen=True, slots=True)
+class AuditRecord:
+    kind: int
+    flags: int
+    count: int       # repetitions for BATCH, group size for GROUP, else 1
+    ts_us: int
+    seed: int        # 0 when UNSEEDED
+    scene_id: int
+    index: int       # stream index in the scene
+    total: int       # summed over the batch for BATCH
+    expr: str
+    rolls: list[int]
+    dropped: list[int]
+    ability: str | None = None
+    score: int | None = None
+    proficiency_bonus: int | None = None
+    dc: int | None = None
+    mod: int | None = None
+    pick: int | None = None
+    position: int | None = None  # place in the group (GROUP)
+
+    @property
+    def ts(self) -> datetime:
+        return datetime.fromtimestamp(self.ts_us / 1e6, tz=timezone.utc)
+
+    @property
+    def advantage(self) -> bool:
+        return bool(self.flags & ADV)
+
+    @property
+    def disadvantage(self) -> bool:
+        return bool(self.flags & DIS)
+
+    @property
+    def seeded(self) -> bool:
+        return not self.flags & UNSEEDED
+
+    @property
+    def success(self) -> bool | None:
+        return bool(self.flags & SUCCESS) if self.flags & HAS_DC else None
+
+    def check_input(self) -> CheckInput:
+        return CheckInput(
+            ability=self.ability or "", score=self.score or 0,
+            proficient=bool(self.flags & PROFICIENT), expertise=bool(self.flags & EXPERTISE),
+            proficiency_bonus=self.proficiency_bonus or 0, dc=self.dc,
+            advantage=self.advantage, disadvantage=self.disadvantage,
+        )
+
+
+@functools.lru_cache(maxsize=1024)
+def _layout(check: bool, n_expr: int, n_rolls: int, n_dropped: int) -> struct.Struct:
+    """The whole payload as one Struct: a single pack() per record on the hot path."""
+    tail = _CHECK.format[1:] if check else ""
+    return struct.Struct(f"{_HEADER.format}H{n_expr}sI{n_rolls}hI{n_dropped}h{tail}")
+
+
+@functools.lru_cache(maxsize=256)
+def _encode(expr: str) -> bytes:
+    return expr.encode()[:_MAX_EXPR]
+
+
+def _check_flags(inp: CheckInput, success: bool | None) -> int:
+    flags = ADV if inp.advantage else DIS if inp.disadvantage else 0
+    if inp.proficient:
+        flags |= PROFICIENT
+    if inp.expertise:
+        flags |= EXPERTISE
+    if success is not None:
+        flags |= HAS_DC | (SUCCESS if success else 0)
+    return flags
+
+
+def _check_fields(inp: CheckInput, mod: int, pick: int, position: int) -> tuple[int, ...]:
+    dc = inp.dc if inp.dc is not None else 0
+    ability = ABILS.index(inp.ability.upper())
+    return (ability, inp.score, inp.proficiency_bonus, dc, mod, pick, position)
+
+
+class AuditLog:
+    """Writer for one directory of segments. Thread-safe; one per process."""
+
+    def __init__(
+        self, path: str | os.PathLike, segment_bytes: int = 64 << 20,
+        fsync_interval_ms: float = 50.0,
+    ):
+        self.root = Path(path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._retired: list[tuple[mmap.mmap, int]] = []  # full segments: (map, fd)
+        self._dirty = False
+        self._closed = False
+        self._open_segment()
+        self._stop = threading.Event()
+        self._flusher = None
+        if self.fsync_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="audit-flush", daemon=True
+            )
+            self._flusher.start()
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        name = f"{time.time_ns() // 1000:016d}-{os.getpid()}-{self._seq:06d}{SUFFIX}"
+        fd = os.open(self.root / name, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, self.segment_bytes)
+        else:
+            os.ftruncate(fd, self.segment_bytes)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.segment_bytes)
+        self._pos = 0
+        metrics.inc("audit.segments")
+
+    # --- writes ---
+
+    def _append(self, payload: bytes) -> None:
+        size = len(payload)
+        n = _FRAME.size + size
+        if n + _FRAME.size > self.segment_bytes:
+            raise ValueError("audit record larger than a segment")
+        crc = zlib.crc32(payload)
+        with self._lock:
+            if self._closed:
+                return
+            # keep room for the zero length that ends the segment
+            if self._pos + n + _FRAME.size > self.segment_bytes:
+                self._retired.append((self._mm, self._fd))
+                self._open_segment()
+            pos = self._pos
+            mm = self._mm
+            # payload first, so a reader never sees a length without its bytes
+            mm[pos + _FRAME.size:pos + n] = payload
+            _FRAME.pack_into(mm, pos, size, crc)
+            self._pos = pos + n
+            self._dirty = True
+        if self._flusher is None:
+            self.flush()
+
+    def _record(
+        self, kind: int, flags: int, count: int, seed: int | None, scene_id: int,
+        index: int | None, total: int, expr: str, rolls: list[int], dropped: list[int],
+        check: tuple[int, ...] = (),
+    ) -> None:
+        if seed is None:
+            flags |= UNSEEDED
+        try:
+            e = _encode(expr)
+            self._append(_layout(bool(check), len(e), len(rolls), len(dropped)).pack(
+                kind, flags, count, time.time_ns() // 1000, seed or 0, scene_id, index or 0, total,
+                len(e), e, len(rolls), *rolls, len(dropped), *dropped, *check,
+            ))
+        except Exception:
+            # e.g. a value outside its int16 field, or a full disk: the command still answers
+            metrics.inc("audit.errors")
+            log.exception("audit.append_failed", kind=kind, scene_id=scene_id, index=index)
+
+    def roll(self, seed: int | None, scene_id: int, index: int | None, res: DiceRoll,
+             advantage: bool = False, disadvantage: bool = False) -> None:
+        flags = ADV if advantage else DIS if disadvantage else 0
+        self._record(
+            ROLL, flags, 1, seed, scene_id, index, res.total, res.expr, res.rolls, res.dropped
+        )
+
+    def check(self, seed: int | None, scene_id: int, index: int | None, inp: CheckInput,
+              out: CheckResult) -> None:
+        self._record(
+            CHECK, _check_flags(inp, out.success), 1, seed, scene_id, index, out.total, "1d20",
+            out.d20, [], _check_fields(inp, out.mod, out.pick, 0),
+        )
+
+    def group(self, seed: int | None, scene_id: int, index: int | None, inputs: list[CheckInput],
+              res: GroupResult, passive: bool = False) -> None:
+        """One record per member of the group."""
+        n = len(inputs)
+        base = PASSIVE if passive else 0
+        d20s, picks, mods, totals, oks = (
+            a.tolist() for a in (res.d20, res.pick, res.mod, res.total, res.success)
+        )
+        for i, inp in enumerate(inputs):
+            ok = oks[i] if inp.dc is not None else None
+            self._record(
+                GROUP, base | _check_flags(inp, ok), n, seed, scene_id, index, totals[i], "1d20",
+                [] if passive else d20s[i], [], _check_fields(inp, mods[i], picks[i], i),
+            )
+
+    def batch(self, seed: int | None, scene_id: int, index: int | None, expr: str, n: int,
+              total: int) -> None:
+        self._record(BATCH, 0, n, seed, scene_id, index, total, expr, [], [])
+
+    # --- durability ---
+
+    def flush(self) -> None:
+        """msync everything appended so far (and release full segments)."""
+        with self._lock:
+            retired, self._retired = self._retired, []
+            dirty, self._dirty = self._dirty, False
+            mm = None if self._closed else self._mm
+        for old, fd in retired:
+            old.flush()
+            old.close()
+            os.close(fd)
+            metrics.inc("audit.segments_retired")
+        if dirty and mm is not None:
+            mm.flush()
+            metrics.inc("audit.fsyncs")
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("audit.flush_failed")
+
+    def close(self) -> None:
+        """Stop the flusher, sync, and trim the open segment to what was written."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._mm.close()
+            os.ftruncate(self._fd, self._pos)
+            os.fsync(self._fd)
+            os.close(self._fd)
+
+
+_log: AuditLog | None = None
+
+
+def get_log() -> AuditLog | None:
+    """The process's audit log, or None when auditing is off."""
+    global _log
+    if settings.audit_path is None:
+        return None
+    if _log is None:
+        _log = AuditLog(
+            settings.audit_path, int(settings.audit_segment_mb * (1 << 20)),
+            settings.audit_fsync_interval_ms,
+        )
+    return _log
+
+
+def close_log() -> None:
+    global _log
+    if _log is not None:
+        _log.close()
+        _log = None
+
+
+# --- reading ---
+
+def segments(root: str | os.PathLike) -> list[Path]:
+    """Segment files, oldest first (names start with the creation time)."""
+    return sorted(Path(root).glob(f"*{SUFFIX}"))
+
+
+def _read_ints(buf, pos: int) -> tuple[list[int], int]:
+    (n,) = _U32.unpack_from(buf, pos)
+    pos += 4
+    return list(struct.unpack_from(f"<{n}h", buf, pos)), pos + 2 * n
+
+
+def _decode(buf, pos: int, end: int) -> AuditRecord:
+    kind, flags, count, ts_us, seed, scene_id, index, total = _HEADER.unpack_from(buf, pos)
+    pos += _HEADER.size
+    (n,) = _U16.unpack_from(buf, pos)
+    expr = bytes(buf[pos + 2:pos + 2 + n]).decode()
+    rolls, pos = _read_ints(buf, pos + 2 + n)
+    dropped, pos = _read_ints(buf, pos)
+    rec = AuditRecord(kind, flags, count, ts_us, seed, scene_id, index, total, expr, rolls, dropped)
+    if kind in (CHECK, GROUP) and pos + _CHECK.size <= end:
+        ab, score, prof, dc, mod, pick, position = _CHECK.unpack_from(buf, pos)
+        rec = AuditRecord(
+            kind, flags, count, ts_us, seed, scene_id, index, total, expr, rolls, dropped,
+            ABILS[ab], score, prof, dc if flags & HAS_DC else None, mod, pick, position,
+        )
+    return rec
+
+
+def _scan(path: Path) -> Iterator[tuple[memoryview, int, int]]:
+    """(buffer, payload start, payload end) for each intact frame of a segment."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        buf = memoryview(mm)
+        try:
+            pos = 0
+            while pos + _FRAME.size <= size:
+                length, crc = _FRAME.unpack_from(buf, pos)
+                if length == 0:
+                    return
+                start, end = pos + _FRAME.size, pos + _FRAME.size + length
+                if end > size or zlib.crc32(buf[start:end]) != crc:
+                    log.warning("audit.torn_record", segment=path.name, offset=pos)
+                    return
+                yield buf, start, end
+                pos = end
+        finally:
+            buf.release()
+    finally:
+        mm.close()
+
+
+def read_records(
+    root: str | os.PathLike,
+    kind: int | None = None,
+    scene_id: int | None = None,
+    since: datetime | None = None,
+) -> Iterator[AuditRecord]:
+    """Stream records in append order, optionally filtered. Stops at each segment's torn tail."""
+    since_us = int(since.timestamp() * 1e6) if since is not None else None
+    for path in segments(root):
+        for buf, start, end in _scan(path):
+            k, _, _, ts_us, _, scene, _, _ = _HEADER.unpack_from(buf, start)
+            if kind is not None and k != kind:
+                continue
+            if scene_id is not None and scene != scene_id:
+                continue
+            if since_us is not None and ts_us < since_us:
+                continue
+            yield _decode(buf, start, end)
+
+
+# --- replay ---
+
+@dataclass
+class VerifyReport:
+    checked: int = 0
+    skipped: int = 0   # unseeded: nothing to replay from
+    failed: list[AuditRecord] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def replay(rec: AuditRecord) -> bool | None:
+    """
+    Whether re-deriving `rec` from its seed gives the logged result; None if it
+    can't be replayed.
+    """
+    passive = bool(rec.flags & PASSIVE)
+    if not rec.seeded and not passive:
+        return None
+    rng = SceneRNG(rec.seed, rec.scene_id)
+    if rec.kind == ROLL:
+        r = rng.roll(rec.index, rec.expr, rec.advantage, rec.disadvantage)
+        return (r.rolls, r.dropped, r.total) == (rec.rolls, rec.dropped, rec.total)
+    if rec.kind == CHECK:
+        r = rng.roll(rec.index, "1d20", rec.advantage, rec.disadvantage)
+        out = compute_check(rec.check_input(), r.rolls[:2] if len(r.rolls) >= 2 else [r.rolls[0]])
+        return (out.d20, out.pick, out.mod, out.total, out.success) == (
+            rec.rolls, rec.pick, rec.mod, rec.total, rec.success)
+    if rec.kind == GROUP:
+        i = rec.position or 0
+        d20 = None if passive else rng.draws(rec.index, 20, 2 * rec.count)[2 * i:2 * i + 2]
+        res = compute_checks([rec.check_input()], d20)
+        rolls = [] if passive else res.d20[0].tolist()
+        success = bool(res.success[0]) if rec.dc is not None else None
+        return (rolls, int(res.pick[0]), int(res.mod[0]), int(res.total[0]), success) == (
+            rec.rolls, rec.pick, rec.mod, rec.total, rec.success)
+    if rec.kind == BATCH:
+        return int(rng.batch(rec.index).roll_n(rec.expr, rec.count).totals.sum()) == rec.total
+    return None
+
+
+def verify(records: Iterable[AuditRecord]) -> VerifyReport:
+    report = VerifyReport()
+    for rec in records:
+        try:
+            ok = replay(rec)
+        except ValueError:
+            ok = False
+        if ok is None:
+            report.skipped += 1
+            continue
+        report.checked += 1
+        if not ok:
+            report.failed.append(rec)
+    return report
@@ -0,0 +1,226 @@
+# cache.py
+
+"""
+Small caching primitives shared across the app:
+
+- TTLCache: in-process LRU with per-entry TTL and hit/miss counters.
+- SingleFlight: coalesce concurrent calls for the same key into one upstream call.
+- StreamFlight: the same for streams; one upstream stream fans out to every reader.
+- DiskCache: optional sqlite3-backed tier that survives restarts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from pathlib import Path
+from typing import Any, Generic, TypeVar
+
+from Adventorator import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[K, V]):
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, name: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, what: str) -> None:
+        if self.name:
+            metrics.inc(f"cache.{self.name}.{what}")
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                self._count("hit")
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+        self._count("miss")
+        return default
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._count("evict")
+
+    def pop(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Concurrent `do(key, fn)` calls for one key share a single in-flight `fn()`.
+    It runs in its own task, so a caller that gets cancelled (the first one
+    included) doesn't cancel it for the others.
+    """
+
+    def __init__(self, name: str | None = None):
+        self.name = name
+        self.coalesced = 0
+        self._inflight: dict[K, asyncio.Future] = {}
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            if self.name:
+                metrics.inc(f"cache.{self.name}.coalesced")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: K, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved even if every caller went away
+
+
+class _Broadcast(Generic[V]):
+    def __init__(self, source: AsyncIterator[V]):
+        self.items: list[V] = []
+        self.done = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[V]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._wake()
+        finally:
+            self.done = True
+            self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def read(self) -> AsyncIterator[V]:
+        i = 0
+        while True:
+            while i < len(self.items):
+                yield self.items[i]
+                i += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class StreamFlight(Generic[K, V]):
+    """
+    Concurrent `stream(key, fn)` readers for one key share a single `fn()` stream,
+    pumped by its own task. Late joiners replay what was already received, then
+    follow live; a reader that stops early doesn't stop it for the others.
+    """
+
+    def __init__(self, name: str | None = None):
+        self.name = name
+        self.coalesced = 0
+        self._inflight: dict[K, _Broadcast[V]] = {}
+
+    async def stream(self, key: K, fn: Callable[[], AsyncIterator[V]]) -> AsyncIterator[V]:
+        b = self._inflight.get(key)
+        if b is not None:
+            self.coalesced += 1
+            if self.name:
+                metrics.inc(f"cache.{self.name}.coalesced")
+        else:
+            b = self._inflight[key] = _Broadcast(fn())
+            b.task.add_done_callback(lambda t, k=key, b=b: self._done(k, b))
+        async for item in b.read():
+            yield item
+
+    def _done(self, key: K, b: _Broadcast[V]) -> None:
+        if self._inflight.get(key) is b:
+            del self._inflight[key]
+        if not b.task.cancelled():
+            b.task.exception()
+
+
+class DiskCache:
+    """
+    String-keyed sqlite3 cache with wall-clock expiry. Calls run in a worker thread,
+    so it is safe to use from the event loop.
+    """
+
+    def __init__(self, path: str | Path, ttl: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache"
+            " (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + self.ttl),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,469 @@
+# combat.py
+
+"""
+Turn engine for scenes in combat: strict initiative order and turn timeouts,
+held in memory so "whose turn is it" and "has it expired" never hit the DB.
+
+- Initiative: each encounter keeps the actors still to act this round in a heap
+  ordered by (initiative, DEX mod, join order), all descending but the last.
+  When it runs dry a new round starts. Actors who join mid-round act this round
+  if their slot is still ahead; removed actors are skipped when they surface.
+- Timeouts: one hierarchical timer wheel (timerwheel.py) for every encounter,
+  driven by a single task ticking every `tick_ms`. Scheduling and cancelling a
+  deadline is O(1), so thousands of encounters cost one cheap tick each period.
+  An expired turn ends with the configured fallback (auto-Dodge by default) and
+  the next actor is up.
+- Persistence: `Combatant` rows are written when the order changes (rare).
+  `Turn` rows are write-behind: TurnWriter coalesces each turn's start/end into
+  one upsert per flush, keyed on (scene_id, turn_no). `restore` rebuilds every
+  encounter from those rows after a restart.
+
+An engine owns the scenes it was started for, and their state lives only in that
+process. With several workers, every combat command for a scene must reach the
+process that started it: the scene lease (locks.py) serializes commands across
+workers but shares no engine state.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import structlog
+
+from Adventorator import metrics, repos
+from Adventorator.config import load_settings
+from Adventorator.db import session_scope, utc
+from Adventorator.timerwheel import Timer, TimerWheel
+
+log = structlog.get_logger()
+settings = load_settings()
+
+FALLBACKS = ("dodge", "skip")
+
+
+class TurnError(ValueError):
+    """No combat, not this actor's turn, unknown or duplicate actor."""
+
+
+@dataclass(frozen=True, slots=True)
+class Combatant:
+    actor_ref: str
+    initiative: int
+    dex_mod: int = 0
+    seq: int = 0  # join order, the last tiebreak
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return (-self.initiative, -self.dex_mod, self.seq)
+
+    def row(self) -> dict:
+        return {
+            "actor_ref": self.actor_ref, "initiative": self.initiative,
+            "dex_mod": self.dex_mod, "seq": self.seq,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class TurnInfo:
+    scene_id: int
+    turn_no: int
+    round: int
+    actor_ref: str
+    started_at: datetime
+    deadline: datetime | None
+
+
+@dataclass(frozen=True, slots=True)
+class TurnEnded:
+    """A turn the engine closed by itself (timeout), and who's up next."""
+    turn: TurnInfo
+    outcome: str
+    next: TurnInfo
+
+
+@dataclass(eq=False)
+class Encounter:
+    scene_id: int
+    guild_id: int | None = None
+    campaign_id: int | None = None
+    channel_id: int | None = None
+    combatants: dict[str, Combatant] = field(default_factory=dict)
+    round: int = 0
+    turn_no: int = 0
+    current: TurnInfo | None = None
+    dodging: set[str] = field(default_factory=set)  # auto-Dodged until their next turn starts
+    _queue: list[tuple[tuple[int, int, int], str]] = field(default_factory=list)
+    _timer: Timer | None = None
+
+    def order(self) -> list[Combatant]:
+        return sorted(self.combatants.values(), key=lambda c: c.key)
+
+    def _next_actor(self) -> str:
+        while True:
+            if not self._queue:
+                self.round += 1
+                self._queue = [(c.key, c.actor_ref) for c in self.combatants.values()]
+                heapq.heapify(self._queue)
+            key, ref = heapq.heappop(self._queue)
+            c = self.combatants.get(ref)
+            if c is not None and c.key == key:  # else removed or re-rolled since it was queued
+                return ref
+
+
+class TurnWriter:
+    """
+    Write-behind for Turn rows, flushed every `flush_interval` seconds (as
+    transcripts.TranscriptSink).
+    """
+
+    def __init__(self, flush_interval: float = 0.5, scope: Callable | None = None):
+        self.flush_interval = flush_interval
+        self._scope = scope
+        self._pending: dict[tuple[int | None, int, int], dict] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._timer: asyncio.Task | None = None
+
+    def _ensure_loop(self) -> asyncio.Lock | None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None  # driven synchronously (tests, scripts): flush() picks the rows up
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._timer = None
+        if self._timer is None or self._timer.done():
+            self._timer = loop.create_task(self._tick())
+        return self._lock
+
+    def put(
+        self, guild_id: int | None, turn: TurnInfo, ended_at: datetime | None = None,
+        outcome: str | None = None,
+    ) -> None:
+        # Same key: a turn that started and ended within one flush window is one row.
+        self._pending[(guild_id, turn.scene_id, turn.turn_no)] = {
+            "scene_id": turn.scene_id, "turn_no": turn.turn_no, "round": turn.round,
+            "actor_ref": turn.actor_ref, "started_at": turn.started_at, "deadline": turn.deadline,
+            "ended_at": ended_at, "outcome": outcome,
+        }
+        metrics.set_gauge("combat.turns_buffered", len(self._pending))
+        self._ensure_loop()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        lock = self._ensure_loop()
+        async with lock:  # type: ignore[union-attr]
+            return await self._flush_locked()
+
+    async def _flush_locked(self) -> int:
+        if not self._pending:
+            return 0
+        rows, self._pending = self._pending, {}
+        by_guild: dict[int | None, dict] = {}
+        for key, row in rows.items():
+            by_guild.setdefault(key[0], {})[key] = row
+        scope = self._scope or session_scope
+        failed = 0
+        for guild_id, group in by_guild.items():
+            try:
+                async with scope(guild_id=guild_id) as s:
+                    await repos.upsert_turns(s, list(group.values()))
+            except Exception:
+                failed += len(group)
+                metrics.inc("combat.turn_flush_errors")
+                log.exception("turn flush failed", rows=len(group), guild_id=guild_id)
+                for key, row in group.items():
+                    self._pending.setdefault(key, row)  # newer state written meanwhile wins
+        if failed:
+            raise RuntimeError(f"{failed} turn rows not flushed")
+        metrics.inc("combat.turns_flushed", len(rows))
+        metrics.set_gauge("combat.turns_buffered", len(self._pending))
+        return len(rows)
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                try:
+                    await self.flush()
+                except Exception:
+                    pass  # already logged; retried next tick
+
+    async def close(self) -> None:
+        """Flush everything and stop the timer (shutdown hook)."""
+        if self._loop is not None and self._loop is not asyncio.get_running_loop():
+            if self._pending:
+                log.warning("dropping turns buffered on a closed loop", rows=len(self._pending))
+            return
+        lock = self._ensure_loop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with lock:  # type: ignore[union-attr]
+            await self._flush_locked()
+
+
+class CombatEngine:
+    def __init__(
+        self,
+        turn_timeout: float = 120.0,
+        tick_ms: int = 100,
+        fallback: str = "dodge",
+        writer: TurnWriter | None = None,
+        on_timeout: Callable[[Encounter, TurnEnded], Awaitable[None]] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if fallback not in FALLBACKS:
+            raise ValueError(f"fallback must be one of {FALLBACKS}")
+        self.turn_timeout = turn_timeout
+        self.tick_ms = tick_ms
+        self.fallback = fallback
+        self.writer = writer if writer is not None else TurnWriter()
+        self.on_timeout = on_timeout
+        self._clock = clock
+        self._t0 = clock()
+        self.wheel = TimerWheel(slots=64, levels=4, now=self._now_tick())
+        self.encounters: dict[int, Encounter] = {}
+        self._ticker: asyncio.Task | None = None
+
+    def _now_tick(self) -> int:
+        return int((self._clock() - self._t0) * 1000) // self.tick_ms
+
+    def get(self, scene_id: int) -> Encounter | None:
+        return self.encounters.get(scene_id)
+
+    def current(self, scene_id: int) -> TurnInfo | None:
+        enc = self.encounters.get(scene_id)
+        return enc.current if enc else None
+
+    def _encounter(self, scene_id: int) -> Encounter:
+        enc = self.encounters.get(scene_id)
+        if enc is None:
+            raise TurnError("no combat in this scene")
+        return enc
+
+    # --- turns ---
+
+    def _begin_turn(
+        self, enc: Encounter, actor_ref: str | None = None,
+        started_at: datetime | None = None, deadline: datetime | None = None,
+    ) -> TurnInfo:
+        if actor_ref is None:
+            actor_ref = enc._next_actor()
+        enc.turn_no += 1
+        enc.dodging.discard(actor_ref)  # Dodge lasts until the start of your next turn
+        now = datetime.now(timezone.utc)
+        started_at = started_at or now
+        if deadline is None and self.turn_timeout > 0:
+            deadline = started_at + timedelta(seconds=self.turn_timeout)
+        turn = TurnInfo(enc.scene_id, enc.turn_no, enc.round, actor_ref, started_at, deadline)
+        enc.current = turn
+        if deadline is not None:
+            ticks = math.ceil((deadline - now).total_seconds() * 1000 / self.tick_ms)
+            enc._timer = self.wheel.schedule(self._now_tick() + ticks, (enc.scene_id, turn.turn_no))
+        self.writer.put(enc.guild_id, turn)
+        metrics.inc("combat.turns_started")
+        return turn
+
+    def _close_turn(self, enc: Encounter, outcome: str) -> TurnInfo:
+        turn = enc.current
+        assert turn is not None
+        if enc._timer is not None:
+            self.wheel.cancel(enc._timer)
+            enc._timer = None
+        enc.current = None
+        self.writer.put(enc.guild_id, turn, datetime.now(timezone.utc), outcome)
+        return turn
+
+    def start(
+        self,
+        scene_id: int,
+        combatants: list[Combatant],
+        guild_id: int | None = None,
+        campaign_id: int | None = None,
+        channel_id: int | None = None,
+        first_turn_no: int = 1,
+    ) -> TurnInfo:
+        """Begin combat: round 1, first turn to the top of the order."""
+        if scene_id in self.encounters:
+            raise TurnError("combat already running in this scene")
+        if not combatants:
+            raise TurnError("combat needs at least one combatant")
+        refs = [c.actor_ref for c in combatants]
+        if len(set(refs)) != len(refs):
+            raise TurnError("duplicate combatant")
+        enc = Encounter(
+            scene_id, guild_id, campaign_id, channel_id, {c.actor_ref: c for c in combatants}
+        )
+        enc.turn_no = first_turn_no - 1
+        self.encounters[scene_id] = enc
+        metrics.set_gauge("combat.encounters", len(self.encounters))
+        return self._begin_turn(enc)
+
+    def end_turn(
+        self, scene_id: int, actor_ref: str | None = None, outcome: str = "acted"
+    ) -> TurnInfo:
+        """
+        End the current turn (only the acting actor's, if actor_ref is given);
+        returns the next one.
+        """
+        enc = self._encounter(scene_id)
+        cur = enc.current
+        if cur is None:
+            raise TurnError("no turn in progress")
+        if actor_ref is not None and actor_ref != cur.actor_ref:
+            metrics.inc("combat.out_of_turn")
+            raise TurnError(f"it's {cur.actor_ref}'s turn")
+        self._close_turn(enc, outcome)
+        return self._begin_turn(enc)
+
+    def add(self, scene_id: int, c: Combatant) -> None:
+        enc = self._encounter(scene_id)
+        if c.actor_ref in enc.combatants:
+            raise TurnError(f"{c.actor_ref} is already in the fight")
+        enc.combatants[c.actor_ref] = c
+        cur = enc.current
+        if cur is not None and enc.combatants.get(cur.actor_ref) is not None \
+                and c.key > enc.combatants[cur.actor_ref].key:
+            heapq.heappush(enc._queue, (c.key, c.actor_ref))  # their slot is still ahead this round
+
+    def remove(self, scene_id: int, actor_ref: str) -> TurnInfo | None:
+        """Drop an actor; if it was their turn, the next one starts and is returned."""
+        enc = self._encounter(scene_id)
+        if actor_ref not in enc.combatants:
+            raise TurnError(f"{actor_ref} isn't in the fight")
+        if len(enc.combatants) == 1:
+            raise TurnError("that's the last combatant; end the combat instead")
+        del enc.combatants[actor_ref]
+        enc.dodging.discard(actor_ref)
+        if enc.current is not None and enc.current.actor_ref == actor_ref:
+            self._close_turn(enc, "removed")
+            return self._begin_turn(enc)
+        return None
+
+    def end(self, scene_id: int) -> Encounter:
+        enc = self._encounter(scene_id)
+        if enc.current is not None:
+            self._close_turn(enc, "ended")
+        del self.encounters[scene_id]
+        metrics.set_gauge("combat.encounters", len(self.encounters))
+        return enc
+
+    # --- timeouts ---
+
+    def tick(self) -> list[tuple[Encounter, TurnEnded]]:
+        """Advance the wheel to now and resolve expired turns with the fallback."""
+        out = []
+        for scene_id, turn_no in self.wheel.advance(self._now_tick()):
+            enc = self.encounters.get(scene_id)
+            if enc is None or enc.current is None or enc.current.turn_no != turn_no:
+                continue  # ended or moved on in the meantime
+            enc._timer = None
+            turn = self._close_turn(enc, self.fallback)
+            if self.fallback == "dodge":
+                enc.dodging.add(turn.actor_ref)
+            nxt = self._begin_turn(enc)
+            out.append((enc, TurnEnded(turn, self.fallback, nxt)))
+        if out:
+            metrics.inc("combat.turn_timeouts", len(out))
+            log.info("turns timed out", count=len(out), fallback=self.fallback)
+        return out
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_ms / 1000)
+            for enc, ended in self.tick():
+                if self.on_timeout is not None:
+                    try:
+                        await self.on_timeout(enc, ended)
+                    except Exception:
+                        log.exception("turn timeout hook failed", scene_id=enc.scene_id)
+
+    def start_ticker(self) -> None:
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        await self.writer.close()
+
+    # --- recovery ---
+
+    def restore_one(self, row: repos.CombatRow) -> Encounter | None:
+        """Rebuild one encounter from its stored combatants and latest turn."""
+        if not row.combatants or row.scene_id in self.encounters:
+            return None
+        enc = Encounter(
+            row.scene_id, row.guild_id, row.campaign_id, row.channel_id,
+            {
+                c.actor_ref: Combatant(c.actor_ref, c.initiative, c.dex_mod, c.seq)
+                for c in row.combatants
+            },
+        )
+        self.encounters[row.scene_id] = enc
+        last = row.last_turn
+        if last is None:
+            self._begin_turn(enc)
+            return enc
+        # Rebuild the round up to the last turn: everyone at or ahead of its slot has acted.
+        enc.round = last.round or 1
+        enc.turn_no = last.turn_no or 0
+        acted = enc.combatants.get(last.actor_ref)
+        enc._queue = [
+            (c.key, c.actor_ref) for c in enc.combatants.values()
+            if acted is None or c.key > acted.key
+        ]
+        heapq.heapify(enc._queue)
+        if last.ended_at is None and acted is not None:
+            # Mid-turn: resume it with its original deadline (if that has passed, it fires
+            # on the next tick).
+            enc.turn_no -= 1
+            self._begin_turn(
+                enc, last.actor_ref, utc(last.started_at),
+                utc(last.deadline) if last.deadline is not None else None,
+            )
+        else:
+            self._begin_turn(enc)
+        return enc
+
+    async def restore(self, scope: Callable | None = None) -> int:
+        """Load every active combat from the database(s); returns how many were restored."""
+        from Adventorator.sharding import router
+
+        scope = scope or session_scope
+        n = 0
+        for shard in sorted(router.shards) or [None]:
+            async with scope(readonly=True, shard=shard) as s:
+                rows = await repos.get_active_combats(s)
+            for row in rows:
+                n += self.restore_one(row) is not None
+        metrics.set_gauge("combat.encounters", len(self.encounters))
+        log.info("combat restored", encounters=n)
+        return n
+
+
+def initiative_order(entries: list[tuple[str, int, int]], d20: list[int]) -> list[Combatant]:
+    """Combatants from (actor_ref, dex_mod, initiative bonus) and one d20 each, in join order."""
+    return [
+        Combatant(ref, roll + dex_mod + bonus, dex_mod, i)
+        for i, ((ref, dex_mod, bonus), roll) in enumerate(zip(entries, d20, strict=True))
+    ]
+
+
+engine = CombatEngine(
+    settings.combat_turn_timeout_seconds,
+    settings.combat_tick_ms,
+    settings.combat_timeout_fallback,
+    TurnWriter(settings.combat_flush_interval_seconds),
+)
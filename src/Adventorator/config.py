@@ -8,6 +8,20 @@ from pathlib import Path
 class Settings(BaseSettings):
     env: str = Field(default="dev")
     database_url: str = Field(default="sqlite+aiosqlite:///./adventorator.sqlite3")
+    # Read replicas for session_scope(readonly=True); lagging/unreachable ones are skipped
+    database_replica_urls: list[str] = Field(default_factory=list)
+    replica_max_lag_seconds: float = 5.0
+    replica_lag_check_seconds: float = 2.0
+    # Guild sharding (see sharding.py): shard name -> URL; empty = everything on database_url
+    database_shards: dict[str, str] = Field(default_factory=dict)
+    shard_vnodes: int = 64
+    shard_override_ttl_seconds: float = 30.0
+    # Opt-in SQLite profile: WAL + tuned pragmas, one queued writer, read-only reader pool
+    sqlite_production: bool = False
+    sqlite_readers: int = 4
+    sqlite_mmap_bytes: int = 256 * 1024 * 1024
+    sqlite_cache_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
     discord_public_key: str
     discord_bot_token: str | None = None
     features_llm: bool = False
@@ -19,6 +33,56 @@ class Settings(BaseSettings):
     #llm_api_url: str = "http://localhost:11434/api/chat"
     llm_model_name: str = "llama3:8b"
     llm_default_system_prompt: str = "You are a helpful assistant."
+    llm_stream: bool = False
+    llm_stream_edit_interval_seconds: float = 1.0
+    llm_cache_ttl_seconds: float = 30.0  # 0 disables the response cache
+    llm_cache_max_entries: int = 256
+    llm_cache_path: str | None = None  # optional on-disk tier (sqlite file)
+
+    # guild/channel/user -> campaign/scene/player lookups (see context_cache.py)
+    context_cache_ttl_seconds: float = 300.0
+    context_cache_scene_ttl_seconds: float = 10.0
+    context_cache_max_entries: int = 10_000
+
+    # Buffered transcript writer (see transcripts.py)
+    transcript_flush_rows: int = 100
+    transcript_flush_interval_seconds: float = 0.5
+    transcript_max_attempts: int = 20
+    transcript_max_buffered: int = 10_000
+    transcript_export_batch_rows: int = 1000
+
+    # Cold transcript archival (see archive.py); unset archive_path disables it
+    archive_path: str | None = None
+    archive_after_days: float = 90.0
+    archive_interval_seconds: float = 3600.0
+    archive_batch_rows: int = 5000
+
+    # Combat turn engine (see combat.py); enabled by features_combat
+    combat_turn_timeout_seconds: float = 120.0
+    combat_timeout_fallback: str = "dodge"  # dodge|skip
+    combat_tick_ms: int = 100
+    combat_flush_interval_seconds: float = 0.5
+
+    # Binary audit log of rolls and checks (see audit.py); unset audit_path disables it
+    audit_path: str | None = None
+    audit_segment_mb: float = 64.0
+    audit_fsync_interval_ms: float = 50.0
+
+    # Per-scene lease locks around scene-mutating commands (see locks.py)
+    locks_backend: str = "local"  # local|postgres|redis
+    locks_redis_url: str = "redis://localhost:6379/0"
+    locks_ttl_seconds: float = 30.0
+    locks_wait_seconds: float = 10.0
+    locks_shards: int = 64
+
+    # Bearer token for /campaigns/{id}/transcripts/export; unset disables the route
+    export_token: str | None = None
+
+    # Deferred command dispatch (see executor.py)
+    dispatch_workers: int = 8
+    dispatch_queue_size: int = 100
+    dispatch_command_limits: dict[str, int] = Field(default_factory=lambda: {"ooc": 4})
+    dispatch_drain_timeout_seconds: float = 10.0
 
     model_config = SettingsConfigDict(env_prefix="", case_sensitive=False, env_file=".env", extra="ignore")
 
@@ -37,5 +101,69 @@ def load_settings() -> Settings:
                 "llm_api_url": t.get("llm", {}).get("api_url"),
                 "llm_model_name": t.get("llm", {}).get("model_name"),
                 "llm_default_system_prompt": t.get("llm", {}).get("default_system_prompt"),
+                "llm_stream": t.get("llm", {}).get("stream", False),
+                "llm_stream_edit_interval_seconds": t.get("llm", {}).get(
+                    "stream_edit_interval_seconds", 1.0
+                ),
+                "llm_cache_ttl_seconds": t.get("llm", {}).get("cache_ttl_seconds", 30.0),
+                "llm_cache_max_entries": t.get("llm", {}).get("cache_max_entries", 256),
+                "llm_cache_path": t.get("llm", {}).get("cache_path"),
+                "context_cache_ttl_seconds": t.get("cache", {}).get("context_ttl_seconds", 300.0),
+                "context_cache_scene_ttl_seconds": t.get("cache", {}).get(
+                    "scene_ttl_seconds", 10.0
+                ),
+                "context_cache_max_entries": t.get("cache", {}).get("context_max_entries", 10_000),
+                "transcript_flush_rows": t.get("transcripts", {}).get("flush_rows", 100),
+                "transcript_flush_interval_seconds": t.get("transcripts", {}).get(
+                    "flush_interval_seconds", 0.5
+                ),
+                "transcript_max_attempts": t.get("transcripts", {}).get("max_attempts", 20),
+                "transcript_max_buffered": t.get("transcripts", {}).get("max_buffered", 10_000),
+                "transcript_export_batch_rows": t.get("transcripts", {}).get(
+                    "export_batch_rows", 1000
+                ),
+                "database_replica_urls": t.get("database", {}).get("replica_urls", []),
+                "replica_max_lag_seconds": t.get("database", {}).get(
+                    "replica_max_lag_seconds", 5.0
+                ),
+                "replica_lag_check_seconds": t.get("database", {}).get(
+                    "replica_lag_check_seconds", 2.0
+                ),
+                "database_shards": t.get("sharding", {}).get("shards", {}),
+                "shard_vnodes": t.get("sharding", {}).get("vnodes", 64),
+                "shard_override_ttl_seconds": t.get("sharding", {}).get(
+                    "override_ttl_seconds", 30.0
+                ),
+                "sqlite_production": t.get("sqlite", {}).get("production", False),
+                "sqlite_readers": t.get("sqlite", {}).get("readers", 4),
+                "sqlite_mmap_bytes": t.get("sqlite", {}).get("mmap_bytes", 256 * 1024 * 1024),
+                "sqlite_cache_kib": t.get("sqlite", {}).get("cache_kib", 64 * 1024),
+                "sqlite_busy_timeout_ms": t.get("sqlite", {}).get("busy_timeout_ms", 5000),
+                "archive_path": t.get("archive", {}).get("path"),
+                "archive_after_days": t.get("archive", {}).get("after_days", 90.0),
+                "archive_interval_seconds": t.get("archive", {}).get("interval_seconds", 3600.0),
+                "archive_batch_rows": t.get("archive", {}).get("batch_rows", 5000),
+                "combat_turn_timeout_seconds": t.get("combat", {}).get(
+                    "turn_timeout_seconds", 120.0
+                ),
+                "combat_timeout_fallback": t.get("combat", {}).get("timeout_fallback", "dodge"),
+                "combat_tick_ms": t.get("combat", {}).get("tick_ms", 100),
+                "combat_flush_interval_seconds": t.get("combat", {}).get(
+                    "flush_interval_seconds", 0.5
+                ),
+                "audit_path": t.get("audit", {}).get("path"),
+                "audit_segment_mb": t.get("audit", {}).get("segment_mb", 64.0),
+                "audit_fsync_interval_ms": t.get("audit", {}).get("fsync_interval_ms", 50.0),
+                "locks_backend": t.get("locks", {}).get("backend", "local"),
+                "locks_redis_url": t.get("locks", {}).get("redis_url", "redis://localhost:6379/0"),
+                "locks_ttl_seconds": t.get("locks", {}).get("ttl_seconds", 30.0),
+                "locks_wait_seconds": t.get("locks", {}).get("wait_seconds", 10.0),
+                "locks_shards": t.get("locks", {}).get("shards", 64),
+                "dispatch_workers": t.get("dispatch", {}).get("workers", 8),
+                "dispatch_queue_size": t.get("dispatch", {}).get("queue_size", 100),
+                "dispatch_command_limits": t.get("dispatch", {}).get("limits", {"ooc": 4}),
+                "dispatch_drain_timeout_seconds": t.get("dispatch", {}).get(
+                    "drain_timeout_seconds", 10.0
+                ),
             })
     return Settings(**data)  # .env overrides TOML
@@ -0,0 +1,103 @@
+# context_cache.py
+
+"""
+Bounded read-through cache for the interaction context mappings:
+guild -> campaign, channel -> scene, Discord user -> player.
+
+The id mappings never change once a row exists, so they are safe to cache across
+uvicorn workers. Scene state (mode, is_active) can change; it gets a short TTL so
+other workers converge quickly, and the local worker invalidates explicitly
+(see repos.set_scene_mode / repos.deactivate_scene).
+
+Entries are only populated after the session that produced them commits, so a
+rolled-back insert can never leave a dangling id in the cache.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Adventorator.cache import TTLCache
+from Adventorator.config import load_settings
+
+settings = load_settings()
+
+
+@dataclass(frozen=True)
+class CampaignRef:
+    id: int
+    guild_id: int | None
+    rng_seed: int | None
+
+
+@dataclass(frozen=True)
+class SceneRef:
+    id: int
+    campaign_id: int
+    channel_id: int
+    mode: str
+    is_active: bool
+
+
+@dataclass(frozen=True)
+class PlayerRef:
+    id: int
+    discord_user_id: int
+    display_name: str
+
+
+campaigns: TTLCache[Any, CampaignRef] = TTLCache(
+    settings.context_cache_max_entries, settings.context_cache_ttl_seconds, name="campaign"
+)
+scenes: TTLCache[Any, SceneRef] = TTLCache(
+    settings.context_cache_max_entries, settings.context_cache_scene_ttl_seconds, name="scene"
+)
+players: TTLCache[Any, PlayerRef] = TTLCache(
+    settings.context_cache_max_entries, settings.context_cache_ttl_seconds, name="player"
+)
+
+# (shard, campaign_id, name) -> rules.character.CharacterView; validated against
+# Character.updated_at on every read (repos.get_character_view), so the TTL only bounds memory.
+character_views: TTLCache[Any, Any] = TTLCache(
+    settings.context_cache_max_entries, settings.context_cache_ttl_seconds, name="character_view"
+)
+
+
+def remember_on_commit(s: AsyncSession, cache: TTLCache, key: Any, value: Any) -> None:
+    pending = s.info.get("context_cache_pending")
+    if pending is None:
+        pending = s.info["context_cache_pending"] = []
+
+        def _flush(session):
+            for c, k, v in session.info.pop("context_cache_pending", []):
+                c.set(k, v)
+
+        def _drop(session):
+            session.info.pop("context_cache_pending", None)
+
+        event.listen(s.sync_session, "after_commit", _flush, once=True)
+        event.listen(s.sync_session, "after_rollback", _drop, once=True)
+    pending.append((cache, key, value))
+
+
+def invalidate_scene(key: Any) -> None:
+    """`key` is the channel id, or (shard, channel id) when sharded (repos._cache_key)."""
+    scenes.pop(key)
+
+
+def stats() -> dict:
+    return {
+        "campaign": campaigns.stats(), "scene": scenes.stats(), "player": players.stats(),
+        "character_view": character_views.stats(),
+    }
+
+
+def clear() -> None:
+    campaigns.clear()
+    scenes.clear()
+    players.clear()
+    character_views.clear()
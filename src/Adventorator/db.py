@@ -1,11 +1,20 @@
 # src/Adventorator/db.py
 from __future__ import annotations
+import asyncio
 import contextlib
-from typing import AsyncIterator
+import itertools
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from collections.abc import AsyncIterator
+import structlog
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, ORMExecuteState, Session
 from Adventorator.config import load_settings
+from Adventorator import metrics
 
+log = structlog.get_logger()
 settings = load_settings()
 
 def _normalize_url(url: str) -> str:
@@ -18,24 +27,152 @@ def _normalize_url(url: str) -> str:
 
 DATABASE_URL = _normalize_url(settings.database_url)
 
+def utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we write is UTC.
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
 class Base(DeclarativeBase):
     pass
 
 _engine: AsyncEngine | None = None
 _sessionmaker: async_sessionmaker[AsyncSession] | None = None
+# SQLite production profile only: read-only pool, and the queue in front of the writer.
+_read_engine: AsyncEngine | None = None
+_read_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+_write_lock: asyncio.Lock | None = None
+_write_lock_loop: asyncio.AbstractEventLoop | None = None
+
+class ReadOnlySessionError(RuntimeError):
+    """A write was attempted through session_scope(readonly=True)."""
+
+@event.listens_for(Session, "do_orm_execute")
+def _guard_readonly_execute(state: ORMExecuteState) -> None:
+    writing = state.is_insert or state.is_update or state.is_delete
+    if state.session.info.get("readonly") and writing:
+        raise ReadOnlySessionError("write statement in a read-only session")
+
+@event.listens_for(Session, "before_flush")
+def _guard_readonly_flush(session: Session, _ctx, _instances) -> None:
+    if session.info.get("readonly") and (session.new or session.dirty or session.deleted):
+        raise ReadOnlySessionError("flush in a read-only session")
+
+def _engine_kwargs(url: str) -> dict:
+    # Safer defaults per backend
+    if url.startswith("sqlite+aiosqlite://"):
+        # SQLite ignores pool_size; keep it minimal and avoid pre_ping
+        return {"connect_args": {"timeout": 30}}
+    return {"pool_pre_ping": True, "pool_size": 5, "max_overflow": 10}
+
+@dataclass
+class Replica:
+    url: str
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker[AsyncSession]
+    lag: float | None = None  # seconds behind the primary; None = unknown or unreachable
+    checked_at: float = float("-inf")
+
+def create_replica(url: str) -> Replica:
+    url = _normalize_url(url)
+    engine = create_async_engine(url, **_engine_kwargs(url))
+    return Replica(url, engine, async_sessionmaker(engine, expire_on_commit=False))
+
+_replicas: list[Replica] | None = None
+_replica_rr = itertools.count()
+
+def get_replicas() -> list[Replica]:
+    global _replicas
+    if _replicas is None:
+        _replicas = [create_replica(u) for u in settings.database_replica_urls]
+    return _replicas
+
+async def replica_lag(engine: AsyncEngine) -> float:
+    """Seconds of replay lag. 0 when caught up; stand-ins that aren't Postgres replicas report 0."""
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    async with engine.connect() as conn:
+        lag = (await conn.execute(text(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        ))).scalar()
+    return float(lag or 0.0)
+
+async def choose_replica() -> Replica | None:
+    """
+    Next replica in round-robin order whose lag is within replica_max_lag_seconds.
+    Lag is probed at most every replica_lag_check_seconds per replica. None means
+    fall back to the primary.
+    """
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    start = next(_replica_rr)
+    for i in range(len(replicas)):
+        r = replicas[(start + i) % len(replicas)]
+        now = time.monotonic()
+        if now - r.checked_at >= settings.replica_lag_check_seconds:
+            r.checked_at = now
+            try:
+                r.lag = await replica_lag(r.engine)
+            except Exception as e:
+                r.lag = None
+                url = r.engine.url.render_as_string(hide_password=True)
+                log.warning("replica unreachable", url=url, error=str(e))
+            lag = -1 if r.lag is None else r.lag
+            metrics.set_gauge(f"db.replica_lag_s.{(start + i) % len(replicas)}", lag)
+        if r.lag is not None and r.lag <= settings.replica_max_lag_seconds:
+            return r
+    metrics.inc("db.replica_fallback")
+    return None
+
+def sqlite_pragmas(readonly: bool = False) -> list[str]:
+    """Per-connection PRAGMAs for the SQLite production profile."""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",      # readers never block the writer (or each other)
+        "PRAGMA synchronous=NORMAL",    # fsync at checkpoints, not every commit; safe with WAL
+        f"PRAGMA mmap_size={settings.sqlite_mmap_bytes}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_kib}",  # negative = KiB
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if readonly:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def _apply_pragmas(engine: AsyncEngine, readonly: bool) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for pragma in sqlite_pragmas(readonly):
+            cur.execute(pragma)
+        cur.close()
+
+def create_sqlite_engines(url: str, readers: int = 4) -> tuple[AsyncEngine, AsyncEngine]:
+    """
+    SQLite production profile: one writer connection (callers queue on _write_lock in
+    session_scope instead of fighting over the database lock) plus a small pool of
+    query_only readers, which WAL lets run alongside the writer.
+    """
+    writer = create_async_engine(url, pool_size=1, max_overflow=0, connect_args={"timeout": 30})
+    reader = create_async_engine(
+        url, pool_size=max(1, readers), max_overflow=0, connect_args={"timeout": 30}
+    )
+    _apply_pragmas(writer, readonly=False)
+    _apply_pragmas(reader, readonly=True)
+    return writer, reader
 
 def get_engine() -> AsyncEngine:
-    global _engine, _sessionmaker
+    global _engine, _sessionmaker, _read_engine, _read_sessionmaker
     if _engine is None:
-        # Safer defaults per backend
-        kwargs = {}
-        if DATABASE_URL.startswith("sqlite+aiosqlite://"):
-            # SQLite ignores pool_size; keep it minimal and avoid pre_ping
-            kwargs.update(connect_args={"timeout": 30})
-        else:
-            kwargs.update(pool_pre_ping=True, pool_size=5, max_overflow=10)
-
-        _engine = create_async_engine(DATABASE_URL, **kwargs)
+        sqlite_file = (
+            DATABASE_URL.startswith("sqlite+aiosqlite://") and ":memory:" not in DATABASE_URL
+        )
+        if sqlite_file and settings.sqlite_production:
+            _engine, _read_engine = create_sqlite_engines(DATABASE_URL, settings.sqlite_readers)
+            _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+            _read_sessionmaker = async_sessionmaker(_read_engine, expire_on_commit=False)
+            return _engine
+        _engine = create_async_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
         _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
     return _engine
 
@@ -44,13 +181,78 @@ def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
         get_engine()
     return _sessionmaker  # type: ignore[return-value]
 
+def get_read_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Read-only sessions where a separate read pool exists; the primary otherwise."""
+    get_sessionmaker()
+    return _read_sessionmaker or _sessionmaker  # type: ignore[return-value]
+
+def _writer_queue() -> asyncio.Lock | None:
+    global _write_lock, _write_lock_loop
+    if _read_sessionmaker is None:
+        return None
+    loop = asyncio.get_running_loop()
+    if _write_lock is None or _write_lock_loop is not loop:
+        _write_lock, _write_lock_loop = asyncio.Lock(), loop
+    return _write_lock
+
+async def dispose_engines() -> None:
+    from Adventorator.sharding import router
+    for engine in (_engine, _read_engine, *(r.engine for r in _replicas or ())):
+        if engine is not None:
+            await engine.dispose()
+    await router.dispose()
+
+async def _pick_sessionmaker(
+    readonly: bool, guild_id: int | None, shard: str | None, replica: bool = True
+) -> tuple[async_sessionmaker[AsyncSession], str | None]:
+    if guild_id is not None or shard is not None:
+        from Adventorator.sharding import router  # sharding imports this module
+        if router.enabled:
+            name = shard if shard is not None else await router.shard_for(guild_id)  # type: ignore[arg-type]
+            return router.sessionmaker(name), name
+        if shard is not None:
+            raise KeyError(f"sharding is not configured (asked for shard {shard!r})")
+    if readonly:
+        chosen = await choose_replica() if replica else None
+        return (chosen.sessionmaker if chosen else get_read_sessionmaker()), None
+    return get_sessionmaker(), None
+
 @contextlib.asynccontextmanager
-async def session_scope() -> AsyncIterator[AsyncSession]:
-    sm = get_sessionmaker()
-    async with sm() as s:
-        try:
-            yield s
-            await s.commit()
-        except:  # noqa: E722
-            await s.rollback()
-            raise
+async def session_scope(
+    readonly: bool = False, guild_id: int | None = None, shard: str | None = None,
+    replica: bool = True,
+) -> AsyncIterator[AsyncSession]:
+    """
+    Transactional session. Pass readonly=True for pure reads (repos functions marked
+    @reads): they go to a replica within the lag budget, else the SQLite read pool,
+    else the primary. Writes through a read-only session raise ReadOnlySessionError.
+    replica=False keeps a read off the replicas when it must see the caller's own
+    recent writes.
+
+    With sharding configured, guild_id routes to that guild's shard (see sharding.py)
+    and shard picks one by name; without it both fall through to the primary.
+    """
+    sm, shard_name = await _pick_sessionmaker(readonly, guild_id, shard, replica)
+    queue = None if readonly or shard_name is not None else _writer_queue()
+    if queue is not None:
+        started = time.perf_counter()
+        await queue.acquire()
+        metrics.observe_ms("db.write_queue_ms", (time.perf_counter() - started) * 1000)
+    try:
+        async with sm() as s:
+            s.info["readonly"] = readonly
+            s.info["shard"] = shard_name
+            s.info["guild_id"] = guild_id
+            try:
+                # Check the connection out up front so pool wait time is measurable.
+                started = time.perf_counter()
+                await s.connection()
+                metrics.observe_ms("db.pool_wait_ms", (time.perf_counter() - started) * 1000)
+                yield s
+                await s.commit()
+            except:  # noqa: E722
+                await s.rollback()
+                raise
+    finally:
+        if queue is not None:
+            queue.release()
@@ -0,0 +1,136 @@
+# executor.py
+
+"""
+Bounded, supervised executor for deferred command dispatch.
+
+`/interactions` acks within Discord's budget and hands the real work to this
+executor: a fixed pool of worker tasks pulling from a bounded queue, with an
+optional per-command concurrency cap (e.g. only N concurrent /ooc narrations).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+import structlog
+
+from Adventorator import metrics
+
+log = structlog.get_logger()
+
+JobFactory = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class _Job:
+    name: str
+    factory: JobFactory
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class DispatchExecutor:
+    def __init__(
+        self, workers: int = 8, queue_size: int = 100, limits: dict[str, int] | None = None
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.limits = dict(limits or {})
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[_Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[str, int] = {}
+        # Jobs pulled off the queue while their command was at its limit.
+        self._parked: dict[str, deque[_Job]] = {}
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # First use, or the loop changed under us (test clients spin up their own loops).
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._running.clear()
+        self._parked.clear()
+        self._tasks = [loop.create_task(self._worker(i)) for i in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(d) for d in self._parked.values())
+
+    def submit(self, name: str, factory: JobFactory) -> bool:
+        """
+        Enqueue without blocking. Returns False when the executor is full or shut down;
+        the caller is expected to tell the user to retry.
+        """
+        if self._closed:
+            metrics.inc("dispatch.rejected")
+            return False
+        self._ensure_started()
+        assert self._queue is not None
+        # depth counts parked jobs too: workers drain capped commands off the queue.
+        if self.depth >= self.queue_size:
+            metrics.inc("dispatch.rejected")
+            log.warning("dispatch queue full", command=name, depth=self.depth)
+            return False
+        self._queue.put_nowait(_Job(name, factory))
+        metrics.inc("dispatch.submitted")
+        metrics.set_gauge("dispatch.queue_depth", self.depth)
+        return True
+
+    async def _worker(self, idx: int) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            limit = self.limits.get(job.name)
+            if limit is not None and self._running.get(job.name, 0) >= limit:
+                self._parked.setdefault(job.name, deque()).append(job)
+                continue
+            # Run the job, then keep draining parked jobs of the same command
+            # while we still hold its slot.
+            while job is not None:
+                await self._run(job)
+                queue.task_done()
+                parked = self._parked.get(job.name)
+                job = parked.popleft() if parked else None
+
+    async def _run(self, job: _Job) -> None:
+        self._running[job.name] = self._running.get(job.name, 0) + 1
+        metrics.observe_ms("dispatch.wait_ms", (time.perf_counter() - job.enqueued_at) * 1000)
+        metrics.set_gauge("dispatch.queue_depth", self.depth)
+        started = time.perf_counter()
+        try:
+            await job.factory()
+        except Exception:
+            metrics.inc("dispatch.errors")
+            log.exception("dispatch job failed", command=job.name)
+        finally:
+            self._running[job.name] -= 1
+            metrics.observe_ms("dispatch.run_ms", (time.perf_counter() - started) * 1000)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Stop accepting work, wait for queued and in-flight jobs, then stop the workers.
+        Returns False if the timeout hit first (remaining jobs are cancelled).
+        """
+        self._closed = True
+        if not self._tasks or self._loop is not asyncio.get_running_loop():
+            return True
+        assert self._queue is not None
+        finished = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            finished = False
+            log.warning("dispatch drain timed out", depth=self.depth)
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        return finished
@@ -0,0 +1,65 @@
+# export.py
+
+"""
+Transcript export as NDJSON (one orjson-encoded row per line), optionally gzip or
+zstd compressed. Everything here is a generator so exports stream in constant
+memory; used by the /campaigns/{id}/transcripts/export route and
+scripts/export_transcripts.py.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator
+
+import orjson
+
+CHUNK_BYTES = 64 * 1024
+
+
+async def ndjson_chunks(
+    rows: AsyncIterable[dict], chunk_bytes: int = CHUNK_BYTES
+) -> AsyncIterator[bytes]:
+    buf = bytearray()
+    async for row in rows:
+        buf += orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+        if len(buf) >= chunk_bytes:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def check_compression(compression: str | None) -> None:
+    """Raise ValueError if `compression` is unknown or its library isn't installed."""
+    _compressor(compression)
+
+
+def _compressor(compression: str | None):
+    if compression is None:
+        return None
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd export needs the optional 'zstandard' package") from None
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise ValueError(f"unknown compression: {compression}")
+
+
+async def export_stream(
+    rows: AsyncIterable[dict], compression: str | None = None
+) -> AsyncIterator[bytes]:
+    """NDJSON byte chunks for `rows`, compressed on the fly if asked."""
+    comp = _compressor(compression)
+    async for chunk in ndjson_chunks(rows):
+        if comp is None:
+            yield chunk
+        else:
+            out = comp.compress(chunk)
+            if out:
+                yield out
+    if comp is not None:
+        yield comp.flush()
@@ -1,13 +1,24 @@
 # src/Adventorator/llm.py
 
+import hashlib
+import time
+from collections.abc import AsyncIterator
+
 import httpx
 import orjson
 import structlog
+
+from Adventorator import metrics
+from Adventorator.cache import DiskCache, SingleFlight, StreamFlight, TTLCache
 from Adventorator.config import Settings
-from typing import List, Dict, Optional
 
 log = structlog.get_logger()
 
+def prompt_key(payload: dict) -> str:
+    """Stable hash of everything that shapes the generation (model, prompts, sampling params)."""
+    material = {k: v for k, v in payload.items() if k != "stream"}
+    return hashlib.sha256(orjson.dumps(material, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
 class LLMClient:
     def __init__(self, settings: Settings):
         self.api_url = settings.llm_api_url
@@ -16,13 +27,25 @@ class LLMClient:
         self.headers = {"Content-Type": "application/json"}
         # We use a persistent client for connection pooling
         self._client = httpx.AsyncClient(timeout=60.0)
+        # Identical prompts within the TTL are answered from cache (Phase 8 spam control);
+        # concurrent identical prompts share one upstream call.
+        self._cache: TTLCache[str, str] | None = None
+        self._disk: DiskCache | None = None
+        if settings.llm_cache_ttl_seconds > 0:
+            self._cache = TTLCache(
+                settings.llm_cache_max_entries, settings.llm_cache_ttl_seconds, name="llm"
+            )
+            if settings.llm_cache_path:
+                self._disk = DiskCache(settings.llm_cache_path, settings.llm_cache_ttl_seconds)
+        self._flight: SingleFlight[str, str] = SingleFlight(name="llm")
+        self._streams: StreamFlight[str, str] = StreamFlight(name="llm")
         log.info("LLMClient initialized", model=self.model_name, url=self.api_url)
 
     async def generate_response(
         self,
-        messages: List[Dict[str, str]],
-        system_prompt: Optional[str] = None
-    ) -> Optional[str]:
+        messages: list[dict[str, str]],
+        system_prompt: str | None = None
+    ) -> str | None:
         """
         Generates a response from the LLM based on a list of messages.
         """
@@ -30,38 +53,149 @@ class LLMClient:
             log.warning("LLM service is not configured (api_url or model_name missing).")
             return None
 
+        data = self._payload(messages, system_prompt, stream=False)
+        key = prompt_key(data)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            return await self._flight.do(key, lambda: self._generate(key, data))
+        except httpx.RequestError as e:
+            log.error("LLM API request failed", url=e.request.url, error=str(e))
+            return "The connection to the ethereal plane was lost. (LLM request failed)"
+        except Exception as e:
+            log.error("Failed to process LLM response", error=str(e))
+            return "A strange psychic interference prevents a clear response. (LLM response error)"
+
+    async def stream_response(
+        self,
+        messages: list[dict[str, str]],
+        system_prompt: str | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Streams the response as text deltas, consuming Ollama's NDJSON chunks as they arrive.
+        On failure, yields the same in-world error text as generate_response (once).
+        Concurrent identical prompts share one upstream stream.
+        """
+        if not self.api_url or not self.model_name:
+            log.warning("LLM service is not configured (api_url or model_name missing).")
+            return
+
+        data = self._payload(messages, system_prompt, stream=True)
+        key = prompt_key(data)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        async for delta in self._streams.stream(key, lambda: self._stream(key, data)):
+            yield delta
+
+    async def _stream(self, key: str, data: dict) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first = True
+        parts: list[str] = []
+
+        try:
+            async with self._client.stream(
+                "POST", self.api_url, content=orjson.dumps(data), headers=self.headers
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = orjson.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    delta = chunk.get("message", {}).get("content") or ""
+                    if delta:
+                        if first:
+                            ttft = (time.perf_counter() - started) * 1000
+                            metrics.observe_ms("llm.ttft_ms", ttft)
+                            first = False
+                        parts.append(delta)
+                        yield delta
+                    if chunk.get("done"):
+                        break
+            metrics.observe_ms("llm.total_ms", (time.perf_counter() - started) * 1000)
+            if first:
+                log.error("LLM stream ended without content")
+                yield "The narrator seems lost for words..."
+            else:
+                await self._cache_put(key, "".join(parts).strip())
+
+        except httpx.RequestError as e:
+            log.error("LLM API request failed", url=e.request.url, error=str(e))
+            if first:
+                yield "The connection to the ethereal plane was lost. (LLM request failed)"
+        except Exception as e:
+            log.error("Failed to process LLM stream", error=str(e))
+            if first:
+                yield (
+                    "A strange psychic interference prevents a clear response. (LLM response error)"
+                )
+
+    async def _generate(self, key: str, data: dict) -> str:
+        started = time.perf_counter()
+        response = await self._client.post(
+            self.api_url, content=orjson.dumps(data), headers=self.headers
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        content = result.get("message", {}).get("content")
+        metrics.observe_ms("llm.total_ms", (time.perf_counter() - started) * 1000)
+
+        if not content:
+            log.error("LLM API response missing 'content'", response_body=result)
+            return "The narrator seems lost for words..."
+
+        content = content.strip()
+        await self._cache_put(key, content)
+        return content
+
+    async def _cache_get(self, key: str) -> str | None:
+        if self._cache is None:
+            return None
+        hit = self._cache.get(key)
+        if hit is None and self._disk is not None:
+            raw = await self._disk.get(key)
+            if raw is not None:
+                hit = raw.decode()
+                self._cache.set(key, hit)
+                metrics.inc("cache.llm.disk_hit")
+        return hit
+
+    async def _cache_put(self, key: str, content: str) -> None:
+        if self._cache is None or not content:
+            return
+        self._cache.set(key, content)
+        if self._disk is not None:
+            await self._disk.set(key, content.encode())
+
+    def cache_stats(self) -> dict:
+        stats = self._cache.stats() if self._cache else {}
+        stats["coalesced"] = self._flight.coalesced + self._streams.coalesced
+        return stats
+
+    def _payload(
+        self, messages: list[dict[str, str]], system_prompt: str | None, stream: bool
+    ) -> dict:
         # The first message should always be the system prompt
         full_prompt = [{"role": "system", "content": system_prompt or self.system_prompt}]
         full_prompt.extend(messages)
 
         # Ollama API payload structure
-        data = {
+        return {
             "model": self.model_name,
             "messages": full_prompt,
-            "stream": False,  # For MVP, we'll wait for the full response
+            "stream": stream,
             "temperature": 0.4,
         }
 
-        try:
-            response = await self._client.post(self.api_url, content=orjson.dumps(data), headers=self.headers)
-            response.raise_for_status()
-            
-            result = response.json()
-            content = result.get("message", {}).get("content")
-
-            if not content:
-                log.error("LLM API response missing 'content'", response_body=result)
-                return "The narrator seems lost for words..."
-                
-            return content.strip()
-
-        except httpx.RequestError as e:
-            log.error("LLM API request failed", url=e.request.url, error=str(e))
-            return "The connection to the ethereal plane was lost. (LLM request failed)"
-        except Exception as e:
-            log.error("Failed to process LLM response", error=str(e))
-            return "A strange psychic interference prevents a clear response. (LLM response error)"
-
     async def close(self):
         """Gracefully close the HTTP client."""
-        await self._client.aclose()
\ No newline at end of file
+        await self._client.aclose()
+        if self._disk is not None:
+            self._disk.close()
@@ -0,0 +1,472 @@
+# locks.py
+
+"""
+Lease locks with TTLs and fencing tokens, e.g. one per scene so two players'
+commands don't mutate the same scene at once (app._dispatch_command).
+
+A Lease is held until released or until its TTL runs out, whichever comes
+first; a holder that dies never blocks a key for longer than the TTL. Every
+grant gets a fencing token that is strictly larger than any earlier grant of
+the same key, so a store that remembers the last token it accepted can reject
+writes from a holder whose lease has already expired.
+
+LockManager does the waiting (jittered exponential backoff up to `wait`
+seconds), metrics and context management on top of a backend:
+
+- LocalLocks: in-process, keys hashed over sharded tables. Right for one worker.
+- PostgresLocks: session advisory locks on a dedicated connection per lease;
+  tokens from the lock_fencing_seq sequence. Postgres drops the lock with the
+  connection if the process dies.
+- RedisLocks: SET NX PX plus compare-and-delete scripts, spoken as plain RESP
+  over asyncio streams (no client library). Works with Redis, Valkey, etc.
+
+Metrics: locks.acquired, locks.contended (had to wait), locks.wait_ms,
+locks.held_ms, locks.timeouts (gave up waiting), locks.expired (lease ran out
+before its holder released it).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlparse
+
+import structlog
+
+from Adventorator import metrics
+from Adventorator.config import load_settings
+
+log = structlog.get_logger()
+settings = load_settings()
+
+BACKENDS = ("local", "postgres", "redis")
+
+
+class LockTimeoutError(TimeoutError):
+    """Waited `wait` seconds without getting the lock."""
+
+
+class LeaseLostError(RuntimeError):
+    """The lease expired (and may belong to someone else now)."""
+
+
+@dataclass(frozen=True, slots=True)
+class Lease:
+    key: str
+    owner: str
+    token: int          # fencing token
+    ttl: float
+    acquired_at: float  # time.monotonic()
+
+    @property
+    def expires_at(self) -> float:
+        return self.acquired_at + self.ttl
+
+
+class LockBackend:
+    """try_acquire/release/renew never block on other holders; LockManager does the waiting."""
+
+    async def try_acquire(self, key: str, owner: str, ttl: float) -> int | None:
+        """Fencing token if granted, None if someone else holds the key."""
+        raise NotImplementedError
+
+    async def release(self, key: str, owner: str, token: int) -> bool:
+        """False if the lease had already expired."""
+        raise NotImplementedError
+
+    async def renew(self, key: str, owner: str, token: int, ttl: float) -> bool:
+        raise NotImplementedError
+
+    async def wait(self, key: str, timeout: float) -> None:
+        """Pause before retrying `key`. Backends that can tell when it's released wake early."""
+        await asyncio.sleep(timeout)
+
+    async def close(self) -> None:
+        pass
+
+
+# --- in-process ---
+
+@dataclass(slots=True)
+class _Held:
+    owner: str
+    token: int
+    expires: float
+
+
+class LocalLocks(LockBackend):
+    """
+    In-process locks. Keys are spread over `shards` tables, each with its own
+    threading.Lock, so threads and event loops contending on different keys
+    don't serialize on one table.
+    """
+
+    def __init__(self, shards: int = 64, clock=time.monotonic):
+        self._shards: list[tuple[threading.Lock, dict[str, _Held]]] = [
+            (threading.Lock(), {}) for _ in range(shards)
+        ]
+        self._tokens = itertools.count(1)  # one sequence for every key: increasing per key too
+        self._clock = clock
+        self._waiters: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def _shard(self, key: str) -> tuple[threading.Lock, dict[str, _Held]]:
+        return self._shards[hash(key) % len(self._shards)]
+
+    async def try_acquire(self, key: str, owner: str, ttl: float) -> int | None:
+        lock, table = self._shard(key)
+        now = self._clock()
+        with lock:
+            held = table.get(key)
+            if held is not None and held.expires > now:
+                return None
+            token = next(self._tokens)
+            table[key] = _Held(owner, token, now + ttl)
+        return token
+
+    async def release(self, key: str, owner: str, token: int) -> bool:
+        lock, table = self._shard(key)
+        with lock:
+            held = table.get(key)
+            ok = held is not None and held.token == token and held.expires > self._clock()
+            if held is not None and (ok or held.expires <= self._clock()):
+                del table[key]
+        self._wake(key)
+        return ok
+
+    async def renew(self, key: str, owner: str, token: int, ttl: float) -> bool:
+        lock, table = self._shard(key)
+        with lock:
+            held = table.get(key)
+            now = self._clock()
+            if held is None or held.token != token or held.expires <= now:
+                return False
+            held.expires = now + ttl
+            return True
+
+    def _wake(self, key: str) -> None:
+        with self._waiters_lock:
+            waiters = self._waiters.pop(key, ())
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(lambda f=fut: f.done() or f.set_result(None))
+
+    async def wait(self, key: str, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._waiters_lock:
+            self._waiters.setdefault(key, []).append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            with self._waiters_lock:
+                waiters = self._waiters.get(key)
+                if waiters is not None:
+                    waiters[:] = [w for w in waiters if w[1] is not fut]
+                    if not waiters:
+                        del self._waiters[key]
+
+
+# --- Postgres ---
+
+def _key64(key: str) -> int:
+    """Stable signed 64-bit advisory lock id for a key."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class PostgresLocks(LockBackend):
+    """
+    Session-level advisory locks. A lease holds its own pooled connection; the
+    TTL is enforced here by unlocking and returning the connection on a timer.
+    """
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self._held: dict[tuple[str, int], tuple[Any, asyncio.TimerHandle]] = {}
+
+    def _get_engine(self):
+        if self._engine is None:
+            from Adventorator.db import get_engine
+            self._engine = get_engine()
+        return self._engine
+
+    async def try_acquire(self, key: str, owner: str, ttl: float) -> int | None:
+        from sqlalchemy import text
+
+        conn = await self._get_engine().connect()
+        try:
+            got = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:k)"), {"k": _key64(key)}
+            )).scalar()
+            if not got:
+                await conn.rollback()
+                await conn.close()
+                return None
+            token = (await conn.execute(text("SELECT nextval('lock_fencing_seq')"))).scalar_one()
+            await conn.commit()  # the advisory lock outlives the transaction; don't sit idle in one
+        except BaseException:
+            # never hand a connection that may hold the lock back to the pool
+            await conn.invalidate()
+            raise
+        handle = asyncio.get_running_loop().call_later(ttl, self._expire, key, token)
+        self._held[(key, token)] = (conn, handle)
+        return token
+
+    def _expire(self, key: str, token: int) -> None:
+        entry = self._held.pop((key, token), None)
+        if entry is not None:
+            asyncio.ensure_future(self._unlock(entry[0], key))
+
+    async def _unlock(self, conn, key: str) -> None:
+        from sqlalchemy import text
+
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _key64(key)})
+            await conn.commit()
+            await conn.close()
+        except Exception:
+            log.exception("advisory unlock failed", key=key)
+            await conn.invalidate()  # closing the session releases it server-side
+
+    async def release(self, key: str, owner: str, token: int) -> bool:
+        entry = self._held.pop((key, token), None)
+        if entry is None:
+            return False
+        entry[1].cancel()
+        await self._unlock(entry[0], key)
+        return True
+
+    async def renew(self, key: str, owner: str, token: int, ttl: float) -> bool:
+        entry = self._held.get((key, token))
+        if entry is None:
+            return False
+        entry[1].cancel()
+        handle = asyncio.get_running_loop().call_later(ttl, self._expire, key, token)
+        self._held[(key, token)] = (entry[0], handle)
+        return True
+
+    async def close(self) -> None:
+        for (key, _), (conn, handle) in list(self._held.items()):
+            handle.cancel()
+            await self._unlock(conn, key)
+        self._held.clear()
+
+
+# --- Redis protocol ---
+
+class RedisError(RuntimeError):
+    pass
+
+
+# KEYS[1] = lock key, ARGV[1] = "owner:token" [, ARGV[2] = ttl ms]
+RELEASE_SCRIPT = (
+    'if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) '
+    'else return 0 end'
+)
+RENEW_SCRIPT = (
+    'if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("pexpire", KEYS[1], ARGV[2]) '
+    'else return 0 end'
+)
+
+
+def _encode(*args: Any) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for a in args:
+        b = a if isinstance(a, bytes) else str(a).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+    return b"".join(out)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("redis connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        n = int(rest)
+        if n < 0:
+            return None
+        data = await reader.readexactly(n + 2)
+        return data[:-2]
+    if kind == b"*":
+        n = int(rest)
+        return None if n < 0 else [await _read_reply(reader) for _ in range(n)]
+    raise RedisError(f"bad reply: {line!r}")
+
+
+class RedisLocks(LockBackend):
+    """SET key "owner:token" NX PX ttl; tokens from INCR on a per-key fence counter."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "adventorator:lock:"):
+        u = urlparse(url)
+        self.host, self.port = u.hostname or "localhost", u.port or 6379
+        self.password = u.password
+        self.db = int(u.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self._conn: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._io: asyncio.Lock | None = None
+
+    async def _call(self, *args: Any) -> Any:
+        if self._io is None:
+            self._io = asyncio.Lock()
+        async with self._io:  # one request in flight per connection
+            try:
+                if self._conn is None:
+                    self._conn = await asyncio.open_connection(self.host, self.port)
+                    if self.password:
+                        await self._roundtrip("AUTH", self.password)
+                    if self.db:
+                        await self._roundtrip("SELECT", self.db)
+                return await self._roundtrip(*args)
+            except BaseException:
+                # Broken, garbled, or cancelled mid-request: a late reply would be
+                # read by the next caller as its own.
+                await self._drop()
+                raise
+
+    async def _roundtrip(self, *args: Any) -> Any:
+        reader, writer = self._conn  # type: ignore[misc]
+        writer.write(_encode(*args))
+        await writer.drain()
+        return await _read_reply(reader)
+
+    async def _drop(self) -> None:
+        if self._conn is not None:
+            self._conn[1].close()
+            self._conn = None
+
+    async def try_acquire(self, key: str, owner: str, ttl: float) -> int | None:
+        k = self.prefix + key
+        token = await self._call("INCR", k + ":fence")
+        ok = await self._call("SET", k, f"{owner}:{token}", "NX", "PX", max(1, int(ttl * 1000)))
+        return token if ok == "OK" else None
+
+    async def release(self, key: str, owner: str, token: int) -> bool:
+        value = f"{owner}:{token}"
+        return await self._call("EVAL", RELEASE_SCRIPT, 1, self.prefix + key, value) == 1
+
+    async def renew(self, key: str, owner: str, token: int, ttl: float) -> bool:
+        ms = max(1, int(ttl * 1000))
+        value = f"{owner}:{token}"
+        return await self._call("EVAL", RENEW_SCRIPT, 1, self.prefix + key, value, ms) == 1
+
+    async def close(self) -> None:
+        await self._drop()
+
+
+# --- manager ---
+
+class LockManager:
+    def __init__(self, backend: LockBackend, ttl: float = 30.0, wait: float = 10.0,
+                 retry_min: float = 0.005, retry_max: float = 0.25):
+        self.backend = backend
+        self.ttl = ttl
+        self.wait = wait
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self._owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def acquire(self, key: str, ttl: float | None = None, wait: float | None = None) -> Lease:
+        """Wait up to `wait` seconds for `key`; raises LockTimeoutError."""
+        ttl = self.ttl if ttl is None else ttl
+        wait = self.wait if wait is None else wait
+        owner = f"{self._owner_prefix}:{uuid.uuid4().hex[:12]}"
+        started = time.perf_counter()
+        delay = self.retry_min
+        contended = False
+        while True:
+            token = await self.backend.try_acquire(key, owner, ttl)
+            if token is not None:
+                break
+            if not contended:
+                contended = True
+                metrics.inc("locks.contended")
+            left = wait - (time.perf_counter() - started)
+            if left <= 0:
+                metrics.inc("locks.timeouts")
+                raise LockTimeoutError(f"timed out waiting for {key}")
+            await self.backend.wait(key, min(delay * (0.5 + random.random()), left))
+            delay = min(delay * 2, self.retry_max)
+        metrics.inc("locks.acquired")
+        metrics.observe_ms("locks.wait_ms", (time.perf_counter() - started) * 1000)
+        return Lease(key, owner, token, ttl, time.monotonic())
+
+    async def release(self, lease: Lease) -> bool:
+        """False (and locks.expired) if the lease ran out first."""
+        ok = await self.backend.release(lease.key, lease.owner, lease.token)
+        held_ms = (time.monotonic() - lease.acquired_at) * 1000
+        metrics.observe_ms("locks.held_ms", held_ms)
+        if not ok:
+            metrics.inc("locks.expired")
+            log.warning(
+                "lease expired before release",
+                key=lease.key, token=lease.token, held_ms=round(held_ms),
+            )
+        return ok
+
+    async def renew(self, lease: Lease, ttl: float | None = None) -> Lease:
+        """Extend a lease still held; raises LeaseLostError if it already expired."""
+        ttl = self.ttl if ttl is None else ttl
+        if not await self.backend.renew(lease.key, lease.owner, lease.token, ttl):
+            metrics.inc("locks.expired")
+            raise LeaseLostError(lease.key)
+        return Lease(lease.key, lease.owner, lease.token, ttl, time.monotonic())
+
+    @contextlib.asynccontextmanager
+    async def lock(
+        self, key: str, ttl: float | None = None, wait: float | None = None
+    ) -> AsyncIterator[Lease]:
+        lease = await self.acquire(key, ttl, wait)
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def make_backend(name: str) -> LockBackend:
+    if name == "local":
+        return LocalLocks(settings.locks_shards)
+    if name == "postgres":
+        return PostgresLocks()
+    if name == "redis":
+        return RedisLocks(settings.locks_redis_url)
+    raise ValueError(f"unknown lock backend {name!r}; expected one of {BACKENDS}")
+
+
+_manager: LockManager | None = None
+
+
+def get_manager() -> LockManager:
+    global _manager
+    if _manager is None:
+        _manager = LockManager(
+            make_backend(settings.locks_backend),
+            settings.locks_ttl_seconds, settings.locks_wait_seconds,
+        )
+    return _manager
+
+
+async def close_manager() -> None:
+    global _manager
+    if _manager is not None:
+        await _manager.close()
+        _manager = None
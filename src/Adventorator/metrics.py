@@ -0,0 +1,107 @@
+# metrics.py
+
+"""
+Tiny in-process metrics registry: counters and bucketed latency histograms.
+
+No exporter yet; `snapshot()` is what tests, logs and a future /metrics route read.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from dataclasses import dataclass, field
+
+# Upper bounds in milliseconds; the last bucket is +inf.
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 1500, 3000, 5000, 10000)
+
+_lock = threading.Lock()
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS_MS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def fraction_at_or_below(self, bound: float) -> float:
+        """Share of observations <= bound (bound must be one of the bucket edges)."""
+        if not self.count:
+            return 1.0
+        idx = self.buckets.index(bound)
+        return sum(self.counts[: idx + 1]) / self.count
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "max": round(self.max, 3),
+            "buckets": {
+                str(b): c for b, c in zip(list(self.buckets) + ["inf"], self.counts, strict=True)
+            },
+        }
+
+
+_counters: dict[str, int] = {}
+_gauges: dict[str, float] = {}
+_histograms: dict[str, Histogram] = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe_ms(name: str, value_ms: float) -> None:
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.observe(value_ms)
+
+
+def get_counter(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def get_gauge(name: str) -> float | None:
+    return _gauges.get(name)
+
+
+def get_histogram(name: str) -> Histogram | None:
+    return _histograms.get(name)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {k: h.to_dict() for k, h in _histograms.items()},
+        }
+
+
+def reset() -> None:
+    """Clear everything (tests)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
@@ -1,6 +1,7 @@
 # models.py
 
 from __future__ import annotations
+import secrets
 from datetime import datetime, timezone
 from sqlalchemy import String, Integer, ForeignKey, JSON, BigInteger, Index, Boolean, Text, DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -9,20 +10,27 @@ from Adventorator.db import Base
 class Campaign(Base):
     __tablename__ = "campaigns"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    guild_id: Mapped[int | None] = mapped_column(BigInteger, index=True)  # Discord guild
+    # Discord guild
+    guild_id: Mapped[int | None] = mapped_column(BigInteger, index=True, unique=True)
     name: Mapped[str] = mapped_column(String(120))
     system: Mapped[str] = mapped_column(String(32), default="5e-srd")
+    # Keys the per-scene dice streams (rules/streams.py); NULL on old rows until resolved.
+    rng_seed: Mapped[int | None] = mapped_column(
+        BigInteger, nullable=True, default=lambda: secrets.randbits(63)
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class Player(Base):
     __tablename__ = "players"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    discord_user_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    discord_user_id: Mapped[int] = mapped_column(BigInteger, index=True, unique=True)
     display_name: Mapped[str] = mapped_column(String(120))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class Character(Base):
     __tablename__ = "characters"
+    # Upsert conflict target (repos.upsert_character)
+    __table_args__ = (Index("uq_characters_campaign_name", "campaign_id", "name", unique=True),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     campaign_id: Mapped[int] = mapped_column(ForeignKey("campaigns.id", ondelete="CASCADE"), index=True)
     player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="SET NULL"), nullable=True)
@@ -40,16 +48,41 @@ class Scene(Base):
     mode: Mapped[str] = mapped_column(String(16), default="exploration")  # exploration|combat
     location_node_id: Mapped[str | None] = mapped_column(String(128), nullable=True)  # optional content link
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # next dice stream index
+    roll_counter: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class Turn(Base):
     __tablename__ = "turns"
+    # Write-behind upsert target (combat.TurnWriter); NULL turn_no on pre-engine rows
+    __table_args__ = (Index("uq_turns_scene_turn_no", "scene_id", "turn_no", unique=True),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     scene_id: Mapped[int] = mapped_column(ForeignKey("scenes.id", ondelete="CASCADE"), index=True)
     # who is acting; could be a character id or an npc key
     actor_ref: Mapped[str] = mapped_column(String(64))
+    # 1, 2, ... per combat in the scene
+    turn_no: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    round: Mapped[int | None] = mapped_column(Integer, nullable=True)
     started_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    ended_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    deadline: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # NULL while the turn is in progress
+    ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # acted|dodge|skip|removed|ended
+    outcome: Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+class Combatant(Base):
+    """Initiative order of a scene in combat (combat.py); rows go when the combat ends."""
+    __tablename__ = "combatants"
+    __table_args__ = (Index("uq_combatants_scene_actor", "scene_id", "actor_ref", unique=True),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    scene_id: Mapped[int] = mapped_column(ForeignKey("scenes.id", ondelete="CASCADE"), index=True)
+    actor_ref: Mapped[str] = mapped_column(String(64))
+    initiative: Mapped[int] = mapped_column(Integer)
+    dex_mod: Mapped[int] = mapped_column(Integer, default=0)  # initiative tiebreak
+    seq: Mapped[int] = mapped_column(Integer, default=0)      # then join order
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
 
 class Transcript(Base):
     __tablename__ = "transcripts"
@@ -64,4 +97,22 @@ class Transcript(Base):
     meta: Mapped[dict | None] = mapped_column(JSON, nullable=True)  # rolls, dc, etc.
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
-Index("ix_transcripts_campaign_channel_time", Transcript.campaign_id, Transcript.channel_id, Transcript.created_at)
\ No newline at end of file
+Index(
+    "ix_transcripts_campaign_channel_time",
+    Transcript.campaign_id, Transcript.channel_id, Transcript.created_at,
+)
+# History reads: WHERE scene_id [AND author_ref] ORDER BY created_at, id (keyset pagination)
+Index("ix_transcripts_scene_time", Transcript.scene_id, Transcript.created_at, Transcript.id)
+Index(
+    "ix_transcripts_scene_author_time",
+    Transcript.scene_id, Transcript.author_ref, Transcript.created_at, Transcript.id,
+)
+
+class GuildShard(Base):
+    """Shard override for one guild (sharding.py). Read from the primary/directory database only."""
+    __tablename__ = "guild_shards"
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    shard: Mapped[str] = mapped_column(String(64))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
@@ -1,53 +1,102 @@
 # repos.py
 
 from __future__ import annotations
-from sqlalchemy import select, update
-from sqlalchemy.exc import NoResultFound
+import asyncio
+import functools
+import json
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import JSON, Text, cast, delete, func, insert, literal, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from Adventorator import models
+from Adventorator import archive, context_cache, metrics
+from Adventorator.db import ReadOnlySessionError
+from Adventorator.context_cache import CampaignRef, PlayerRef, SceneRef
+from Adventorator.rules.character import CharacterView
 from Adventorator.schemas import CharacterSheet
-from typing import List
-
-async def get_or_create_campaign(s: AsyncSession, guild_id: int, name: str="Default") -> models.Campaign:
-    q = await s.execute(select(models.Campaign).where(models.Campaign.guild_id == guild_id))
-    obj = q.scalar_one_or_none()
-    if obj: return obj
-    obj = models.Campaign(guild_id=guild_id, name=name)
-    s.add(obj)
-    await s.flush()
-    return obj
-
-async def get_or_create_player(s: AsyncSession, discord_user_id: int, display_name: str) -> models.Player:
-    q = await s.execute(select(models.Player).where(models.Player.discord_user_id == discord_user_id))
-    obj = q.scalar_one_or_none()
-    if obj: return obj
-    obj = models.Player(discord_user_id=discord_user_id, display_name=display_name)
-    s.add(obj)
-    await s.flush()
-    return obj
+from Adventorator.sheet_patch import PatchResult, apply_patch
+from collections.abc import AsyncIterator, Hashable
+
+# Every public function is marked @reads or @writes. Callers open
+# session_scope(readonly=True) only around @reads (it may be served by a replica);
+# @writes refuses a read-only session up front rather than at flush time.
+
+def reads(fn):
+    fn.db_access = "read"
+    return fn
+
+def writes(fn):
+    @functools.wraps(fn)
+    async def wrapper(s: AsyncSession, *args, **kwargs):
+        if s.info.get("readonly"):
+            raise ReadOnlySessionError(
+                f"repos.{fn.__name__} writes; open session_scope() without readonly=True"
+            )
+        return await fn(s, *args, **kwargs)
+    wrapper.db_access = "write"
+    return wrapper
+
+def _insert(s: AsyncSession, model):
+    """Dialect-specific INSERT so we get ON CONFLICT ... RETURNING on both backends."""
+    dialect = s.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upsert not implemented for {dialect}")
+    return insert(model)
 
+async def _upsert_returning(s: AsyncSession, stmt, model):
+    # One round trip, race-safe: the unique index arbitrates concurrent first contacts.
+    # populate_existing refreshes an instance already in the identity map.
+    q = await s.scalars(stmt.returning(model), execution_options={"populate_existing": True})
+    return q.one()
+
+@writes
+async def get_or_create_campaign(
+    s: AsyncSession, guild_id: int, name: str="Default"
+) -> models.Campaign:
+    stmt = _insert(s, models.Campaign).values(
+        guild_id=guild_id, name=name, rng_seed=secrets.randbits(63)
+    )
+    # No-op update so RETURNING yields the existing row on conflict (DO NOTHING returns nothing);
+    # it also seeds campaigns created before rng_seed existed.
+    stmt = stmt.on_conflict_do_update(index_elements=["guild_id"], set_={
+        "guild_id": stmt.excluded.guild_id,
+        "rng_seed": func.coalesce(models.Campaign.rng_seed, stmt.excluded.rng_seed),
+    })
+    return await _upsert_returning(s, stmt, models.Campaign)
+
+@writes
+async def get_or_create_player(
+    s: AsyncSession, discord_user_id: int, display_name: str
+) -> models.Player:
+    stmt = _insert(s, models.Player).values(
+        discord_user_id=discord_user_id, display_name=display_name
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["discord_user_id"], set_={"discord_user_id": stmt.excluded.discord_user_id}
+    )
+    return await _upsert_returning(s, stmt, models.Player)
+
+@writes
 async def upsert_character(
     s: AsyncSession, campaign_id: int, player_id: int | None, sheet: CharacterSheet
 ) -> models.Character:
-    q = await s.execute(
-        select(models.Character).where(
-            models.Character.campaign_id == campaign_id,
-            models.Character.name == sheet.name
-        )
-    )
-    obj = q.scalar_one_or_none()
-    if obj:
-        obj.sheet = sheet.model_dump(by_alias=True)
-        await s.flush()
-        return obj
-    obj = models.Character(
+    now = datetime.now(timezone.utc)
+    stmt = _insert(s, models.Character).values(
         campaign_id=campaign_id, player_id=player_id, name=sheet.name,
-        sheet=sheet.model_dump(by_alias=True)
+        sheet=sheet.model_dump(by_alias=True), created_at=now, updated_at=now,
     )
-    s.add(obj)
-    await s.flush()
-    return obj
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "name"],
+        set_={"sheet": stmt.excluded.sheet, "updated_at": stmt.excluded.updated_at},
+    )
+    return await _upsert_returning(s, stmt, models.Character)
 
+@reads
 async def get_character(s: AsyncSession, campaign_id: int, name: str) -> models.Character | None:
     q = await s.execute(
         select(models.Character).where(
@@ -57,15 +106,205 @@ async def get_character(s: AsyncSession, campaign_id: int, name: str) -> models.
     )
     return q.scalar_one_or_none()
 
+@reads
+async def get_character_view(s: AsyncSession, campaign_id: int, name: str) -> CharacterView | None:
+    """
+    Parsed, cached view of a character. Costs one indexed lookup of updated_at; the
+    sheet JSON is only fetched and parsed again when it has changed.
+    """
+    char = models.Character
+    where = (char.campaign_id == campaign_id, char.name == name)
+    updated_at = (await s.execute(select(char.updated_at).where(*where))).scalar_one_or_none()
+    if updated_at is None:
+        return None
+    key = _cache_key(s, (campaign_id, name))
+    view = context_cache.character_views.get(key)
+    if view is None or view.updated_at != updated_at:
+        row = (await s.execute(select(char.sheet, char.updated_at).where(*where))).one_or_none()
+        if row is None:
+            return None
+        view = CharacterView.from_dict(row.sheet, row.updated_at)
+        context_cache.character_views.set(key, view)
+    return view
+
+@reads
+async def get_character_views(
+    s: AsyncSession, campaign_id: int, names: list[str] | None = None
+) -> list[CharacterView]:
+    """
+    Views for a party (names=None: every character in the campaign), by name. One
+    query for the updated_at stamps, one more for whichever sheets changed.
+    """
+    char = models.Character
+    q = select(char.name, char.updated_at).where(char.campaign_id == campaign_id)
+    if names is not None:
+        q = q.where(char.name.in_(names))
+    stamps = (await s.execute(q.order_by(char.name))).all()
+    views: dict[str, CharacterView] = {}
+    for name, updated_at in stamps:
+        view = context_cache.character_views.get(_cache_key(s, (campaign_id, name)))
+        if view is not None and view.updated_at == updated_at:
+            views[name] = view
+    stale = [name for name, _ in stamps if name not in views]
+    if stale:
+        rows = await s.execute(
+            select(char.name, char.sheet, char.updated_at)
+            .where(char.campaign_id == campaign_id, char.name.in_(stale))
+        )
+        for name, sheet, updated_at in rows:
+            views[name] = CharacterView.from_dict(sheet, updated_at)
+            context_cache.character_views.set(_cache_key(s, (campaign_id, name)), views[name])
+    return [views[name] for name, _ in stamps if name in views]
+
+class StaleSheetError(RuntimeError):
+    """The sheet changed since it was read (optimistic concurrency on updated_at)."""
+
+def _sheet_value(dialect: str, res: PatchResult):
+    """
+    New value for characters.sheet. On Postgres, a jsonb_set chain over just the
+    touched paths (safe because the UPDATE is conditional on updated_at, so the
+    stored sheet is the one the patch was applied to); elsewhere the whole document.
+    """
+    if dialect != "postgresql":
+        return res.doc
+    from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+    def path(p):
+        return literal(list(p), ARRAY(Text))
+
+    def jsonb(v):
+        return cast(literal(json.dumps(v), Text), JSONB)
+
+    expr = cast(models.Character.sheet, JSONB)
+    for key in res.fields:
+        sets = res.sets[key]
+        if key not in res.doc:
+            expr = expr.delete_path([key])
+        elif sets is None:
+            expr = func.jsonb_set(expr, path([key]), jsonb(res.doc[key]), True, type_=JSONB)
+        else:
+            for p, v in sets:
+                expr = func.jsonb_set(expr, path(p), jsonb(v), True, type_=JSONB)
+    return cast(expr, JSON)
+
+@writes
+async def patch_character(
+    s: AsyncSession, campaign_id: int, name: str, ops: list[dict],
+    expected_updated_at: datetime | None = None, retries: int = 3,
+) -> models.Character | None:
+    """
+    Apply a JSON Patch (sheet_patch.apply_patch) to a stored sheet. None if there's
+    no such character. The UPDATE only lands if updated_at is unchanged since the
+    read, so concurrent edits never clobber each other: a lost race re-reads and
+    re-applies the patch (up to `retries` times), or raises StaleSheetError at once
+    when the caller pinned expected_updated_at.
+    """
+    char = models.Character
+    dialect = s.get_bind().dialect.name
+    for _ in range(retries + 1):
+        row = (await s.execute(
+            select(char.id, char.sheet, char.updated_at)
+            .where(char.campaign_id == campaign_id, char.name == name)
+        )).one_or_none()
+        if row is None:
+            return None
+        if expected_updated_at is not None and row.updated_at != expected_updated_at:
+            raise StaleSheetError(f"{name} was changed by someone else")
+        res = apply_patch(row.sheet, ops)
+        if row.updated_at is None:
+            unchanged = char.updated_at.is_(None)
+        else:
+            unchanged = char.updated_at == row.updated_at
+        stmt = (
+            update(char).where(char.id == row.id, unchanged)
+            .values(sheet=_sheet_value(dialect, res), updated_at=datetime.now(timezone.utc))
+            .returning(char)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        ch = (await s.scalars(stmt)).one_or_none()
+        if ch is not None:
+            return ch
+        metrics.inc("sheets.patch_conflicts")
+        if expected_updated_at is not None:
+            break
+    raise StaleSheetError(f"{name} is being changed concurrently; try again")
+
+@writes
+async def next_roll_index(s: AsyncSession, scene_id: int, n: int = 1) -> int:
+    """
+    Reserve n consecutive dice stream indexes for a scene; returns the first.
+    One atomic UPDATE ... RETURNING, so concurrent workers never get the same index.
+    """
+    stmt = (
+        update(models.Scene).where(models.Scene.id == scene_id)
+        .values(roll_counter=models.Scene.roll_counter + n)
+        .returning(models.Scene.roll_counter)
+    )
+    return (await s.execute(stmt)).scalar_one() - n
+
+@writes
 async def ensure_scene(s: AsyncSession, campaign_id: int, channel_id: int) -> models.Scene:
-    q = await s.execute(select(models.Scene).where(models.Scene.channel_id == channel_id))
-    sc = q.scalar_one_or_none()
-    if sc: return sc
-    sc = models.Scene(campaign_id=campaign_id, channel_id=channel_id)
-    s.add(sc)
-    await s.flush()
-    return sc
+    stmt = _insert(s, models.Scene).values(campaign_id=campaign_id, channel_id=channel_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["channel_id"], set_={"channel_id": stmt.excluded.channel_id}
+    )
+    return await _upsert_returning(s, stmt, models.Scene)
+
+@writes
+async def set_scene_mode(s: AsyncSession, channel_id: int, mode: str) -> None:
+    await s.execute(
+        update(models.Scene).where(models.Scene.channel_id == channel_id).values(mode=mode)
+    )
+    context_cache.invalidate_scene(_cache_key(s, channel_id))
+
+@writes
+async def deactivate_scene(s: AsyncSession, channel_id: int) -> None:
+    await s.execute(
+        update(models.Scene).where(models.Scene.channel_id == channel_id).values(is_active=False)
+    )
+    context_cache.invalidate_scene(_cache_key(s, channel_id))
+
+# --- cached read-through resolution (see context_cache.py) ---
 
+def _cache_key(s: AsyncSession, key: Hashable):
+    # Row ids are per shard, so cached refs are too (a moved guild re-resolves on its new shard).
+    shard = s.info.get("shard")
+    return key if shard is None else (shard, key)
+
+@writes
+async def resolve_campaign(s: AsyncSession, guild_id: int, name: str = "Default") -> CampaignRef:
+    key = _cache_key(s, guild_id)
+    ref = context_cache.campaigns.get(key)
+    if ref is None:
+        obj = await get_or_create_campaign(s, guild_id, name=name)
+        ref = CampaignRef(obj.id, obj.guild_id, obj.rng_seed)
+        context_cache.remember_on_commit(s, context_cache.campaigns, key, ref)
+    return ref
+
+@writes
+async def resolve_scene(
+    s: AsyncSession, campaign_id: int, channel_id: int, fresh: bool = False
+) -> SceneRef:
+    """fresh=True bypasses the cache for callers that must see the current mode."""
+    key = _cache_key(s, channel_id)
+    ref = None if fresh else context_cache.scenes.get(key)
+    if ref is None:
+        sc = await ensure_scene(s, campaign_id, channel_id)
+        ref = SceneRef(sc.id, sc.campaign_id, sc.channel_id, sc.mode, sc.is_active)
+        context_cache.remember_on_commit(s, context_cache.scenes, key, ref)
+    return ref
+
+@writes
+async def resolve_player(s: AsyncSession, discord_user_id: int, display_name: str) -> PlayerRef:
+    key = _cache_key(s, discord_user_id)
+    ref = context_cache.players.get(key)
+    if ref is None:
+        obj = await get_or_create_player(s, discord_user_id, display_name)
+        ref = PlayerRef(obj.id, obj.discord_user_id, obj.display_name)
+        context_cache.remember_on_commit(s, context_cache.players, key, ref)
+    return ref
+
+@writes
 async def write_transcript(
         s: AsyncSession, 
         campaign_id: int, 
@@ -83,16 +322,199 @@ async def write_transcript(
     s.add(t)
     await s.flush()
 
+@dataclass(frozen=True, slots=True)
+class TranscriptLine:
+    """Column-projected transcript row for history reads (no ORM identity, no meta blob)."""
+    id: int | None
+    author: str
+    author_ref: str | None
+    content: str
+    created_at: datetime
+
+    @property
+    def cursor(self) -> tuple[datetime, int | None]:
+        return (self.created_at, self.id)
+
+_LINE_COLUMNS = (
+    models.Transcript.id, models.Transcript.author, models.Transcript.author_ref,
+    models.Transcript.content, models.Transcript.created_at,
+)
+
+@reads
+async def get_transcript_page(
+    s: AsyncSession,
+    scene_id: int,
+    limit: int = 50,
+    user_id: str | None = None,
+    before: tuple[datetime, int] | None = None,
+    after: tuple[datetime, int] | None = None,
+) -> list[TranscriptLine]:
+    """
+    Keyset-paginated history for a scene, in chronological order.
+
+    Cursors are (created_at, id) taken from TranscriptLine.cursor: pass the first row's
+    cursor as `before` to page back, the last row's as `after` to page forward. With
+    neither, returns the latest `limit` rows. Served by ix_transcripts_scene_time /
+    ix_transcripts_scene_author_time without a sort.
+    """
+    if before is not None and after is not None:
+        raise ValueError("pass before or after, not both")
+    tr = models.Transcript
+    stmt = select(*_LINE_COLUMNS).where(tr.scene_id == scene_id)
+    if user_id is not None:
+        stmt = stmt.where(tr.author_ref == user_id)
+    key = tuple_(tr.created_at, tr.id)
+    if after is not None:
+        stmt = stmt.where(key > tuple_(*after)).order_by(tr.created_at.asc(), tr.id.asc())
+    else:
+        if before is not None:
+            stmt = stmt.where(key < tuple_(*before))
+        stmt = stmt.order_by(tr.created_at.desc(), tr.id.desc())
+    rows = [TranscriptLine(*r) for r in (await s.execute(stmt.limit(limit))).all()]
+    return rows if after is not None else rows[::-1]
+
+@reads
 async def get_recent_transcripts(
     s: AsyncSession, scene_id: int, limit: int = 15, user_id: str | None = None
-) -> List[models.Transcript]:
+) -> list[TranscriptLine]:
     """
-    Fetches the most recent transcript entries for a given scene, optionally filtered by user_id, in chronological order.
+    Fetches the most recent transcript entries for a given scene, optionally filtered by
+    user_id, in chronological order.
     """
-    stmt = select(models.Transcript).where(models.Transcript.scene_id == scene_id)
-    if user_id is not None:
-        stmt = stmt.where(models.Transcript.author_ref == user_id)
-    stmt = stmt.order_by(models.Transcript.created_at.desc()).limit(limit)
-    q = await s.execute(stmt)
-    results = q.scalars().all()
-    return results[::-1]
+    return await get_transcript_page(s, scene_id, limit=limit, user_id=user_id)
+
+@reads
+async def get_transcript_history(
+    s: AsyncSession,
+    scene_id: int,
+    limit: int = 50,
+    user_id: str | None = None,
+    before: tuple[datetime, int] | None = None,
+) -> list[TranscriptLine]:
+    """
+    Like get_transcript_page (latest rows, or rows before a cursor), but once the
+    database runs out, keeps going into the cold archive (see archive.py).
+    """
+    hot = await get_transcript_page(s, scene_id, limit=limit, user_id=user_id, before=before)
+    store = archive.get_store()
+    if len(hot) >= limit or store is None:
+        return hot
+    cursor = hot[0].cursor if hot else before
+    cold = await asyncio.to_thread(
+        store.scan, scene_id, limit - len(hot), user_id, cursor, s.info.get("shard")
+    )
+    hot_ids = {t.id for t in hot}
+    return [
+        TranscriptLine(r["id"], r["author"], r["author_ref"], r["content"], r["created_at"])
+        for r in cold
+        if r["id"] not in hot_ids
+    ] + hot
+
+_EXPORT_COLUMNS = (
+    models.Transcript.id, models.Transcript.campaign_id, models.Transcript.scene_id,
+    models.Transcript.channel_id, models.Transcript.message_id, models.Transcript.author,
+    models.Transcript.author_ref, models.Transcript.content, models.Transcript.meta,
+    models.Transcript.created_at,
+)
+
+@reads
+async def stream_transcripts(
+    s: AsyncSession, campaign_id: int, scene_id: int | None = None, batch_size: int = 1000
+) -> AsyncIterator[dict]:
+    """
+    Walks a campaign's (or one scene's) transcripts in chronological order through a
+    server-side cursor, `batch_size` rows at a time. Memory use doesn't grow with the campaign.
+    """
+    tr = models.Transcript
+    stmt = select(*_EXPORT_COLUMNS).where(tr.campaign_id == campaign_id)
+    if scene_id is not None:
+        stmt = stmt.where(tr.scene_id == scene_id)
+    stmt = stmt.order_by(tr.created_at, tr.id).execution_options(yield_per=batch_size)
+    result = await s.stream(stmt)
+    async for row in result.mappings():
+        yield dict(row)
+
+# --- combat (see combat.py) ---
+
+@dataclass(frozen=True, slots=True)
+class CombatRow:
+    """A scene in combat, as stored: enough for CombatEngine.restore to pick it back up."""
+    scene_id: int
+    guild_id: int | None
+    campaign_id: int
+    channel_id: int
+    combatants: list[models.Combatant]
+    last_turn: models.Turn | None
+
+@writes
+async def set_combatants(s: AsyncSession, scene_id: int, rows: list[dict]) -> None:
+    """Replace a scene's initiative order (rows: actor_ref, initiative, dex_mod, seq)."""
+    await s.execute(delete(models.Combatant).where(models.Combatant.scene_id == scene_id))
+    if rows:
+        await s.execute(insert(models.Combatant), [{"scene_id": scene_id, **r} for r in rows])
+
+@writes
+async def add_combatant(s: AsyncSession, scene_id: int, row: dict) -> None:
+    stmt = _insert(s, models.Combatant).values(scene_id=scene_id, **row)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scene_id", "actor_ref"],
+        set_={k: stmt.excluded[k] for k in ("initiative", "dex_mod", "seq")},
+    )
+    await s.execute(stmt)
+
+@writes
+async def remove_combatant(s: AsyncSession, scene_id: int, actor_ref: str) -> None:
+    cb = models.Combatant
+    await s.execute(delete(cb).where(cb.scene_id == scene_id, cb.actor_ref == actor_ref))
+
+@reads
+async def last_turn_no(s: AsyncSession, scene_id: int) -> int:
+    """Highest turn number recorded for the scene (turn numbers run on across combats)."""
+    q = await s.execute(
+        select(func.max(models.Turn.turn_no)).where(models.Turn.scene_id == scene_id)
+    )
+    return q.scalar_one() or 0
+
+@writes
+async def upsert_turns(s: AsyncSession, rows: list[dict]) -> None:
+    """Write-behind turn rows, keyed on (scene_id, turn_no); later state overwrites earlier."""
+    stmt = _insert(s, models.Turn)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scene_id", "turn_no"],
+        set_={k: stmt.excluded[k] for k in ("ended_at", "outcome", "deadline")},
+    )
+    await s.execute(stmt, rows)
+
+@reads
+async def get_active_combats(s: AsyncSession) -> list[CombatRow]:
+    """Every active scene in combat mode on this database, with its combatants and latest turn."""
+    sc, cb, tu = models.Scene, models.Combatant, models.Turn
+    scenes = (await s.execute(
+        select(sc.id, sc.campaign_id, sc.channel_id, models.Campaign.guild_id)
+        .join(models.Campaign, models.Campaign.id == sc.campaign_id)
+        .where(sc.mode == "combat", sc.is_active.is_(True))
+    )).all()
+    if not scenes:
+        return []
+    ids = [r.id for r in scenes]
+    by_scene: dict[int, list[models.Combatant]] = {}
+    rows = await s.execute(select(cb).where(cb.scene_id.in_(ids)).order_by(cb.scene_id, cb.seq))
+    for c in rows.scalars():
+        by_scene.setdefault(c.scene_id, []).append(c)
+    latest = (
+        select(tu.scene_id, func.max(tu.turn_no).label("turn_no"))
+        .where(tu.scene_id.in_(ids), tu.turn_no.is_not(None)).group_by(tu.scene_id).subquery()
+    )
+    turns = {
+        t.scene_id: t for t in (await s.execute(
+            select(tu).join(
+                latest, (tu.scene_id == latest.c.scene_id) & (tu.turn_no == latest.c.turn_no)
+            )
+        )).scalars()
+    }
+    return [
+        CombatRow(
+            r.id, r.guild_id, r.campaign_id, r.channel_id, by_scene.get(r.id, []), turns.get(r.id)
+        )
+        for r in scenes
+    ]
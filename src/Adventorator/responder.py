@@ -1,8 +1,20 @@
 # src/Adventorator/responder.py
 
-from fastapi import Response
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import random
+import re
+import time
+from dataclasses import dataclass, field
+
 import httpx
 import orjson
+import structlog
+from fastapi import Response
+
+from Adventorator import metrics
 
 # Keep this module dependency-free of Settings to avoid import-time env errors
 # (we don't actually need settings here)
@@ -11,9 +23,18 @@ __all__ = [
     "orjson_response",
     "respond_pong",
     "respond_deferred",
+    "respond_message",
     "followup_message",
+    "edit_followup_message",
+    "DiscordClient",
+    "get_discord_client",
+    "close_discord_client",
 ]
 
+log = structlog.get_logger()
+
+DISCORD_API_BASE = "https://discord.com/api/v10"
+
 def orjson_response(data: dict) -> Response:
     return Response(content=orjson.dumps(data), media_type="application/json")
 
@@ -25,14 +46,248 @@ def respond_deferred() -> Response:
     # Interaction callback type 5 (DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE)
     return orjson_response({"type": 5})
 
-async def followup_message(application_id: str, token: str, content: str, ephemeral: bool = False):
+def respond_message(content: str, ephemeral: bool = False) -> Response:
+    # Interaction callback type 4 (CHANNEL_MESSAGE_WITH_SOURCE); no follow-up needed
+    flags = 64 if ephemeral else 0
+    return orjson_response({"type": 4, "data": {"content": content, "flags": flags}})
+
+
+# Message ids are minor parameters: every message under one webhook shares a bucket.
+_MINOR_ID_RE = re.compile(r"/messages/\d+")
+# Interaction tokens are per interaction: keep them out of route keys (and logs).
+_WEBHOOK_TOKEN_RE = re.compile(r"^/webhooks/([^/]+)/[^/]+")
+
+# Transport errors raised before the request went out: safe to retry even a POST.
+_UNSENT = httpx.ConnectError | httpx.ConnectTimeout | httpx.PoolTimeout
+
+# Idle buckets whose reset has passed are dropped at most this often (seconds).
+_PRUNE_INTERVAL = 30.0
+
+
+def _route_key(method: str, path: str) -> str:
+    path = _WEBHOOK_TOKEN_RE.sub(r"/webhooks/\1/:token", path)
+    return f"{method} {_MINOR_ID_RE.sub('/messages/:id', path)}"
+
+
+def _major_param(path: str) -> str:
+    # /webhooks/{application_id}/{token}/... -> the webhook is the major parameter
+    parts = path.strip("/").split("/")
+    return "/".join(parts[:3]) if parts and parts[0] == "webhooks" else ""
+
+
+@dataclass
+class _Bucket:
+    remaining: int | None = None
+    reset_at: float = 0.0  # time.monotonic()
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class DiscordClient:
+    """
+    App-lifetime outbound client for the Discord REST API.
+
+    One pooled httpx client (keep-alive, HTTP/2 when `h2` is installed), per-route
+    rate-limit buckets fed from the X-RateLimit-* headers, and retries with backoff
+    on 429/5xx/transport errors. Requests in the same bucket are queued behind its
+    lock, so we wait out an exhausted bucket instead of eating a 429.
+
+    Each interaction's webhook is its own bucket; idle ones are pruned once their
+    reset has passed. A POST is only retried on errors raised before it was sent
+    (connecting, waiting for a pooled connection): after a read timeout the
+    message may already be posted.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DISCORD_API_BASE,
+        timeout: float = 10.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        bot_token: str | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.bot_token = bot_token
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._buckets: dict[str, _Bucket] = {}
+        self._route_buckets: dict[str, str] = {}  # route key -> Discord bucket hash
+        self._global_reset_at = 0.0
+        self._pruned_at = 0.0
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # httpx clients are bound to the loop they were created on.
+            self._loop = loop
+            self._buckets.clear()
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=50, max_keepalive_connections=20, keepalive_expiry=30
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    def _bucket_for(self, method: str, path: str) -> _Bucket:
+        self._prune()
+        route = _route_key(method, path)
+        key = f"{self._route_buckets.get(route, route)}:{_major_param(path)}"
+        b = self._buckets.get(key)
+        if b is None:
+            b = self._buckets[key] = _Bucket()
+        return b
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        if now - self._pruned_at < _PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        # A locked bucket has a request in flight or queued on it; keep those.
+        idle = [k for k, b in self._buckets.items() if b.reset_at <= now and not b.lock.locked()]
+        for k in idle:
+            del self._buckets[k]
+        metrics.set_gauge("discord.buckets", len(self._buckets))
+
+    def _update_limits(self, method: str, path: str, bucket: _Bucket, r: httpx.Response) -> None:
+        h = r.headers
+        bucket_hash = h.get("X-RateLimit-Bucket")
+        if bucket_hash:
+            route = _route_key(method, path)
+            if self._route_buckets.get(route) != bucket_hash:
+                self._route_buckets[route] = bucket_hash
+                # Share state with any other route Discord put in the same bucket.
+                self._buckets.setdefault(f"{bucket_hash}:{_major_param(path)}", bucket)
+        if "X-RateLimit-Remaining" in h:
+            bucket.remaining = int(h["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in h:
+            bucket.reset_at = time.monotonic() + float(h["X-RateLimit-Reset-After"])
+
+    async def request(
+        self, method: str, path: str, json: dict | None = None, params: dict | None = None
+    ) -> httpx.Response:
+        client = self._http()
+        bucket = self._bucket_for(method, path)
+        headers = {"Authorization": f"Bot {self.bot_token}"} if self.bot_token else None
+        body = orjson.dumps(json) if json is not None else None
+        started = time.perf_counter()
+
+        async with bucket.lock:
+            attempt = 0
+            while True:
+                now = time.monotonic()
+                wait = max(self._global_reset_at - now, 0.0)
+                if bucket.remaining == 0 and bucket.reset_at > now:
+                    wait = max(wait, bucket.reset_at - now)
+                if wait > 0:
+                    metrics.inc("discord.ratelimit_waits")
+                    await asyncio.sleep(wait)
+                    bucket.remaining = None
+
+                try:
+                    r = await client.request(
+                        method, path, content=body, params=params, headers=headers
+                    )
+                except httpx.TransportError as e:
+                    unsent = isinstance(e, _UNSENT)
+                    if attempt >= self.max_retries or (method == "POST" and not unsent):
+                        metrics.inc("discord.errors")
+                        raise
+                    attempt += 1
+                    metrics.inc("discord.retries")
+                    log.warning(
+                        "discord request failed, retrying",
+                        path=_route_key(method, path), error=str(e), attempt=attempt,
+                    )
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                self._update_limits(method, path, bucket, r)
+
+                if r.status_code == 429 and attempt < self.max_retries:
+                    attempt += 1
+                    retry_after = self._retry_after(r)
+                    if r.headers.get("X-RateLimit-Global") == "true":
+                        self._global_reset_at = time.monotonic() + retry_after
+                    else:
+                        bucket.remaining = 0
+                        bucket.reset_at = time.monotonic() + retry_after
+                    metrics.inc("discord.429")
+                    log.warning(
+                        "discord rate limited",
+                        path=_route_key(method, path), retry_after=retry_after,
+                    )
+                    continue
+                if r.status_code >= 500 and attempt < self.max_retries:
+                    attempt += 1
+                    metrics.inc("discord.retries")
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                metrics.observe_ms("discord.request_ms", (time.perf_counter() - started) * 1000)
+                if r.is_error:
+                    metrics.inc("discord.errors")
+                r.raise_for_status()
+                return r
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * (2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _retry_after(r: httpx.Response) -> float:
+        try:
+            return float(r.json().get("retry_after"))
+        except Exception:
+            return float(r.headers.get("Retry-After", 1.0))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_discord: DiscordClient | None = None
+
+
+def get_discord_client() -> DiscordClient:
+    global _discord
+    if _discord is None:
+        _discord = DiscordClient()
+    return _discord
+
+
+async def close_discord_client() -> None:
+    if _discord is not None:
+        await _discord.close()
+
+
+async def followup_message(
+    application_id: str, token: str, content: str, ephemeral: bool = False, wait: bool = False
+) -> dict | None:
     """
     Send a follow-up message via webhook:
     POST https://discord.com/api/v10/webhooks/{application_id}/{token}
+    With wait=True Discord returns the created message (we need its id to edit it).
     """
-    url = f"https://discord.com/api/v10/webhooks/{application_id}/{token}"
     flags = 64 if ephemeral else 0  # 64 = EPHEMERAL
     payload = {"content": content, "flags": flags}
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, content=orjson.dumps(payload), headers={"Content-Type": "application/json"})
-        r.raise_for_status()
+    params = {"wait": "true"} if wait else None
+    r = await get_discord_client().request(
+        "POST", f"/webhooks/{application_id}/{token}", json=payload, params=params
+    )
+    return r.json() if wait else None
+
+async def edit_followup_message(
+    application_id: str, token: str, message_id: str, content: str
+) -> None:
+    """
+    Edit a previously sent follow-up:
+    PATCH https://discord.com/api/v10/webhooks/{application_id}/{token}/messages/{message_id}
+    """
+    path = f"/webhooks/{application_id}/{token}/messages/{message_id}"
+    await get_discord_client().request("PATCH", path, json={"content": content})
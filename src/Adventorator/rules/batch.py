@@ -0,0 +1,138 @@
+# rules/batch.py
+
+"""
+Vectorized dice: roll one expression many times, or many expressions at once,
+with NumPy instead of one Python call per die. Same grammar and plans as
+rules/dice.py (compile_expr).
+
+Results are a pure function of the seed: a BatchRoller seeded with s gives the
+same arrays for the same calls every time. Dice are rejection-sampled from the
+bit generator's raw 64-bit output (PCG64 by default), not taken from
+Generator.integers, so that holds across NumPy versions too. It is not
+DiceRNG's random.Random, so the two don't produce the same rolls for the same
+seed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from Adventorator.rules.dice import MAX_EXPLODE, DiceRoll, _Dice, compile_expr, roll_plan
+
+MAX_BATCH = 1_000_000  # repetitions per call
+MAX_CELLS = 50_000_000  # repetitions x dice per term, about 400MB of int64
+MAX_LOOP_CELLS = 20_000  # repetitions x dice, summed over terms rolled one repetition at a time
+
+
+def _uniform(bits: np.random.BitGenerator, n: int, size) -> np.ndarray:
+    """Uniform int64 draws in 0..n-1 from raw output, without modulo bias."""
+    raw = bits.random_raw(size)
+    rem = (1 << 64) % n
+    if rem:
+        limit = np.uint64((1 << 64) - rem)  # largest multiple of n
+        bad = raw >= limit
+        while bad.any():
+            raw[bad] = bits.random_raw(int(bad.sum()))
+            bad = raw >= limit
+    return (raw % np.uint64(n)).astype(np.int64)
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    expr: str
+    totals: np.ndarray  # int64, one per repetition
+
+    def stats(self) -> dict:
+        t = self.totals
+        p5, p50, p95 = np.percentile(t, (5, 50, 95))
+        return {
+            "n": int(t.size), "mean": float(t.mean()), "std": float(t.std()),
+            "min": int(t.min()), "max": int(t.max()),
+            "p5": float(p5), "p50": float(p50), "p95": float(p95),
+        }
+
+
+class BatchRoller:
+    def __init__(
+        self, seed: int | np.random.SeedSequence | np.random.BitGenerator | None = None
+    ):
+        if isinstance(seed, np.random.BitGenerator):
+            self._bits = seed
+        else:
+            self._bits = np.random.PCG64(seed)
+
+    def spawn(self, n: int) -> list[BatchRoller]:
+        """Independent child streams (e.g. one per worker), reproducible from the parent seed."""
+        return [BatchRoller(b) for b in self._bits.spawn(n)]
+
+    def _below(self, n: int) -> int:
+        return int(_uniform(self._bits, n, 1)[0])
+
+    def _dice(self, sides: int, shape: tuple[int, int]) -> np.ndarray:
+        return _uniform(self._bits, sides, shape) + 1
+
+    def roll(self, expr: str, advantage: bool = False, disadvantage: bool = False) -> DiceRoll:
+        """One roll as a DiceRoll, drawn from this roller's stream."""
+        return roll_plan(compile_expr(expr), expr, self._below, advantage, disadvantage)
+
+    def roll_n(self, expr: str, n: int) -> BatchResult:
+        """Roll `expr` n times."""
+        if not 1 <= n <= MAX_BATCH:
+            raise ValueError(f"n must be 1..{MAX_BATCH}")
+        plan = compile_expr(expr)
+        looped = sum(t.count for t in plan.dice if t.explode and t.keep is not None)
+        if n * looped > MAX_LOOP_CELLS:
+            raise ValueError(
+                f"batch too large: {n} x {looped} exploding kept dice (up to {MAX_LOOP_CELLS})"
+            )
+        totals = np.full(n, plan.modifier, dtype=np.int64)
+        for term in plan.dice:
+            totals += term.sign * self._term(term, n)
+        return BatchResult(expr, totals)
+
+    def roll_many(self, exprs: Sequence[str]) -> np.ndarray:
+        """One total per expression, in order. Repeated expressions are rolled as one batch."""
+        out = np.empty(len(exprs), dtype=np.int64)
+        where: dict[str, list[int]] = {}
+        for i, e in enumerate(exprs):
+            where.setdefault(e, []).append(i)
+        for e, idx in where.items():
+            out[idx] = self.roll_n(e, len(idx)).totals
+        return out
+
+    def _term(self, term: _Dice, n: int) -> np.ndarray:
+        if n * term.count > MAX_CELLS:
+            raise ValueError(f"batch too large: {n} x {term.count}d{term.sides}")
+        if term.explode and term.keep is not None:
+            # Exploded dice join the keep/drop pool, so the pool size varies per
+            # repetition; roll those one at a time.
+            return np.fromiter((sum(term.roll(self._below)[0]) for _ in range(n)), np.int64, n)
+        sides, shape = term.sides, (n, term.count)
+        if term.reroll is not None and not term.reroll_once:
+            # Rerolling until a face is outside lo..hi is a uniform draw over the other faces.
+            lo, hi = term.reroll
+            faces = np.concatenate((np.arange(1, min(lo, sides + 1)), np.arange(hi + 1, sides + 1)))
+            dice = faces[_uniform(self._bits, faces.size, shape)]
+        else:
+            dice = self._dice(sides, shape)
+            if term.reroll is not None:
+                lo, hi = term.reroll
+                again = self._dice(sides, shape)
+                dice = np.where((dice >= lo) & (dice <= hi), again, dice)
+        if term.explode:
+            last = dice
+            for _ in range(MAX_EXPLODE):
+                hit = last == sides
+                if not hit.any():
+                    break
+                last = np.where(hit, self._dice(sides, shape), 0)
+                dice = dice + last
+        if term.keep is not None:
+            highest, k, drop = term.keep
+            k = max(0, term.count - k) if drop else min(k, term.count)
+            dice = np.sort(dice, axis=1)
+            dice = dice[:, term.count - k:] if highest else dice[:, :k]
+        return dice.sum(axis=1, dtype=np.int64)
@@ -0,0 +1,100 @@
+# rules/character.py
+
+"""
+CharacterView: a compact, pre-parsed character for hot paths (/check, /sheet show).
+Built once from a validated CharacterSheet; cached by repos.get_character_view.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from Adventorator.rules.checks import ABILS, CheckInput, ability_mod
+from Adventorator.schemas import CharacterSheet
+
+SKILL_ABILITY: dict[str, str] = {
+    "acrobatics": "DEX", "animal_handling": "WIS", "arcana": "INT", "athletics": "STR",
+    "deception": "CHA", "history": "INT", "insight": "WIS", "intimidation": "CHA",
+    "investigation": "INT", "medicine": "WIS", "nature": "INT", "perception": "WIS",
+    "performance": "CHA", "persuasion": "CHA", "religion": "INT", "sleight_of_hand": "DEX",
+    "stealth": "DEX", "survival": "WIS",
+}
+SKILLS = tuple(SKILL_ABILITY)
+_SKILL_BIT = {name: 1 << i for i, name in enumerate(SKILLS)}
+_ABIL_INDEX = {a: i for i, a in enumerate(ABILS)}
+
+
+def skill_key(name: str) -> str:
+    """'Sleight of Hand' / 'sleight-of-hand' -> 'sleight_of_hand'."""
+    return name.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+class CharacterView:
+    __slots__ = (
+        "name", "class_name", "level", "ac", "hp_current", "hp_max", "proficiency_bonus",
+        "scores", "mods", "skills", "summary", "updated_at",
+    )
+
+    def __init__(self, sheet: CharacterSheet, updated_at: datetime | None = None):
+        self.name = sheet.name
+        self.class_name = sheet.class_name
+        self.level = sheet.level
+        self.ac = sheet.ac
+        self.hp_current = sheet.hp.get("current", 0)
+        self.hp_max = sheet.hp.get("max", 0)
+        self.proficiency_bonus = sheet.proficiency_bonus
+        self.scores = tuple(sheet.abilities[a] for a in ABILS)
+        self.mods = tuple(ability_mod(s) for s in self.scores)
+        bits = 0
+        for name, proficient in sheet.skills.items():
+            if proficient:
+                bits |= _SKILL_BIT.get(skill_key(name), 0)
+        self.skills = bits
+        self.updated_at = updated_at
+        self.summary = (
+            f"**{self.name}** — {self.class_name} {self.level}\n"
+            f"AC {self.ac} | HP {self.hp_current}/{self.hp_max} | "
+            + " ".join(f"{a} {s}" for a, s in zip(ABILS, self.scores, strict=True))
+        )
+
+    @classmethod
+    def from_dict(cls, sheet: dict, updated_at: datetime | None = None) -> CharacterView:
+        return cls(CharacterSheet.model_validate(sheet), updated_at)
+
+    def score(self, ability: str) -> int:
+        return self.scores[_ABIL_INDEX[ability.upper()]]
+
+    def mod(self, ability: str) -> int:
+        return self.mods[_ABIL_INDEX[ability.upper()]]
+
+    def proficient_in(self, skill: str) -> bool:
+        return bool(self.skills & _SKILL_BIT.get(skill_key(skill), 0))
+
+    def check_input(
+        self,
+        ability: str | None = None,
+        skill: str | None = None,
+        dc: int | None = None,
+        advantage: bool = False,
+        disadvantage: bool = False,
+        expertise: bool = False,
+    ) -> CheckInput:
+        """A CheckInput for an ability or skill check, filled from the sheet."""
+        if skill is not None:
+            key = skill_key(skill)
+            if key not in SKILL_ABILITY:
+                raise ValueError(f"unknown skill: {skill}")
+            ability = ability or SKILL_ABILITY[key]
+        ability = (ability or "DEX").upper()
+        if ability not in _ABIL_INDEX:
+            raise ValueError("unknown ability")
+        return CheckInput(
+            ability=ability,
+            score=self.score(ability),
+            proficient=skill is not None and self.proficient_in(skill),
+            expertise=expertise,
+            proficiency_bonus=self.proficiency_bonus,
+            dc=dc,
+            advantage=advantage,
+            disadvantage=disadvantage,
+        )
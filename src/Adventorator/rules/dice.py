@@ -1,21 +1,201 @@
 # rules/dice.py
 
+"""
+Dice expressions, compiled once into a plan and cached by expression string.
+
+Grammar (whitespace and case ignored), terms joined by + or -:
+  N           constant
+  XdY         X dice of Y sides (X defaults to 1; d% is d100), then any of:
+    khN / klN   keep highest / lowest N (N defaults to 1; k = kh)
+    dhN / dlN   drop highest / lowest N
+    !           explode: a max roll adds another die
+    rN / r<N    reroll dice equal to / at most N until they aren't; ro = once
+
+e.g. 4d6kh3, 2d8+1d6+3, 1d20!, 2d6r<2. Dice are drawn in order, one draw per
+die, so a plain XdY+Z consumes the seeded RNG exactly as it always has.
+"""
+
 from __future__ import annotations
+import functools
 import re
 import random
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-_DICE_RE = re.compile(r"^\s*(?P<count>\d+)?d(?P<sides>\d+)\s*(?P<mod>[+\-]\s*\d+)?\s*$")
+MAX_DICE = 100
+MAX_SIDES = 1000
+MAX_TERMS = 20
+MAX_EXPLODE = 100  # extra dice per exploding die
+MAX_DRAWS = MAX_DICE * MAX_TERMS  # dice drawn per roll, rerolls and explosions included
+
+_TERM_RE = re.compile(r"([+\-])?(?:(\d*)d(\d+|%)((?:k[hl]?\d*|d[hl]\d*|!|ro?<?\d+)*)|(\d+))")
+_MOD_RE = re.compile(r"(k[hl]?|d[hl])(\d*)|(!)|(ro?)(<?)(\d+)")
 
 @dataclass(frozen=True)
 class DiceRoll:
     expr: str
-    rolls: list[int]
+    rolls: list[int]   # counted dice (adv/dis: [a, b, pick])
     total: int
     modifier: int
     sides: int
     count: int
     crit: bool = False
+    dropped: list[int] = field(default_factory=list)  # rolled but not counted (kh/kl/dh/dl)
+
+@dataclass(frozen=True, slots=True)
+class _Dice:
+    sign: int
+    count: int
+    sides: int
+    keep: tuple[bool, int, bool] | None = None  # (highest, n, n counts dropped dice)
+    explode: bool = False
+    reroll: tuple[int, int] | None = None       # reroll faces lo..hi
+    reroll_once: bool = False
+
+    @property
+    def plain(self) -> bool:
+        return self.keep is None and not self.explode and self.reroll is None
+
+    def roll(self, below) -> tuple[list[int], list[int]]:
+        """(kept, dropped) dice; `below` is the RNG's _randbelow."""
+        sides = self.sides
+        if self.plain:
+            return [below(sides) + 1 for _ in range(self.count)], []
+        out = []
+        for _ in range(self.count):
+            v = below(sides) + 1
+            if self.reroll is not None:
+                lo, hi = self.reroll
+                while lo <= v <= hi:
+                    v = below(sides) + 1
+                    if self.reroll_once:
+                        break
+            out.append(v)
+            if self.explode:
+                for _ in range(MAX_EXPLODE):
+                    if v != sides:
+                        break
+                    v = below(sides) + 1
+                    out.append(v)
+        if self.keep is None:
+            return out, []
+        highest, n, drop = self.keep
+        n = max(0, len(out) - n) if drop else min(n, len(out))
+        order = sorted(range(len(out)), key=out.__getitem__, reverse=highest)
+        keep = set(order[:n])
+        kept = [v for i, v in enumerate(out) if i in keep]
+        return kept, [v for i, v in enumerate(out) if i not in keep]
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    dice: tuple[_Dice, ...]
+    modifier: int
+    # A lone plain +XdY: rolled inline. single_d20 is the one shape adv/dis applies to.
+    simple: bool = False
+    single_d20: bool = False
+
+def _plan(dice: tuple[_Dice, ...], modifier: int) -> Plan:
+    simple = len(dice) == 1 and dice[0].plain and dice[0].sign == 1
+    return Plan(dice, modifier, simple, simple and dice[0].count == 1 and dice[0].sides == 20)
+
+def _parse_dice(sign: int, count: str, sides: str, mods: str, expr: str) -> _Dice:
+    n = int(count) if count else 1
+    faces = 100 if sides == "%" else int(sides)
+    if not (1 <= n <= MAX_DICE and 1 <= faces <= MAX_SIDES):
+        raise ValueError(f"Bad dice expression: {expr} (up to {MAX_DICE}d{MAX_SIDES})")
+    keep = reroll = None
+    explode = once = False
+    pos = 0
+    while pos < len(mods):
+        m = _MOD_RE.match(mods, pos)
+        if m is None:
+            raise ValueError(f"Bad dice expression: {expr}")
+        pos = m.end()
+        if m.group(1):
+            k = int(m.group(2)) if m.group(2) else 1
+            kind = m.group(1)
+            keep = (kind in ("k", "kh", "dl"), k, kind.startswith("d"))
+        elif m.group(3):
+            if faces < 2:
+                raise ValueError(f"Bad dice expression: {expr} (can't explode a d1)")
+            explode = True
+        else:
+            once = m.group(4) == "ro"
+            v = int(m.group(6))
+            if not 1 <= v <= faces:
+                raise ValueError(
+                    f"Bad dice expression: {expr} (a d{faces} has no face {v} to reroll)"
+                )
+            reroll = (1, v) if m.group(5) else (v, v)
+            if reroll[0] <= 1 and reroll[1] >= faces and not once:
+                raise ValueError(f"Bad dice expression: {expr} (rerolls every face)")
+    return _Dice(sign, n, faces, keep, explode, reroll, once)
+
+@functools.lru_cache(maxsize=1024)
+def compile_expr(expr: str) -> Plan:
+    """Parse a dice expression into a Plan (memoized per expression string)."""
+    s = "".join(expr.split()).lower()
+    dice: list[_Dice] = []
+    modifier = 0
+    pos = terms = 0
+    while pos < len(s):
+        m = _TERM_RE.match(s, pos)
+        if m is None or m.end() == pos or (pos and not m.group(1)):
+            raise ValueError(f"Bad dice expression: {expr}")
+        pos = m.end()
+        terms += 1
+        sign = -1 if m.group(1) == "-" else 1
+        if m.group(5) is not None:
+            modifier += sign * int(m.group(5))
+        else:
+            dice.append(_parse_dice(sign, m.group(2), m.group(3), m.group(4), expr))
+    if not dice or terms > MAX_TERMS:
+        raise ValueError(f"Bad dice expression: {expr}")
+    return _plan(tuple(dice), modifier)
+
+def _capped(below, expr: str):
+    """`below` that raises ValueError past MAX_DRAWS: rerolls and explosions can't run away."""
+    draws = 0
+
+    def capped(n: int) -> int:
+        nonlocal draws
+        draws += 1
+        if draws > MAX_DRAWS:
+            raise ValueError(f"Bad dice expression: {expr} (rolls more than {MAX_DRAWS} dice)")
+        return below(n)
+    return capped
+
+def roll_plan(
+    plan: Plan, expr: str, below, advantage: bool = False, disadvantage: bool = False
+) -> DiceRoll:
+    """Evaluate a compiled plan; `below(n)` draws uniformly from 0..n-1."""
+    mod = plan.modifier
+
+    # Advantage/Disadvantage only sensibly applies to d20 single rolls.
+    if plan.single_d20 and (advantage or disadvantage):
+        a = below(20) + 1
+        b = below(20) + 1
+        pick = max(a, b) if advantage else min(a, b)
+        total = pick + mod
+        return DiceRoll(expr=expr, rolls=[a, b, pick], total=total, modifier=mod,
+                        sides=20, count=1, crit=(pick==20))
+
+    first = plan.dice[0]
+    if plan.simple:
+        sides, count = first.sides, first.count
+        rolls = [below(sides) + 1 for _ in range(count)]
+        crit = plan.single_d20 and rolls[0] == 20
+        return DiceRoll(expr, rolls, sum(rolls) + mod, mod, sides, count, crit)
+
+    rolls, dropped = [], []
+    total = mod
+    below = _capped(below, expr)
+    for term in plan.dice:
+        kept, lost = term.roll(below)
+        total += term.sign * sum(kept)
+        rolls += kept
+        dropped += lost
+    return DiceRoll(expr=expr, rolls=rolls, total=total, modifier=mod, sides=first.sides,
+                    count=first.count, dropped=dropped)
 
 class DiceRNG:
     def __init__(self, seed: int | None = None):
@@ -23,27 +203,8 @@ class DiceRNG:
 
     def roll(self, expr: str, advantage: bool=False, disadvantage: bool=False) -> DiceRoll:
         """
-        Supports: XdY+Z
-        Special case: d20 with adv/dis
+        Roll a dice expression (see module docstring).
+        Special case: a lone d20 with adv/dis
         """
-        m = _DICE_RE.match(expr.replace(" ", ""))
-        if not m:
-            raise ValueError(f"Bad dice expression: {expr}")
-        count = int(m.group("count") or 1)
-        sides = int(m.group("sides"))
-        mod   = int((m.group("mod") or "0").replace(" ", ""))
-
-        # Advantage/Disadvantage only sensibly applies to d20 single rolls.
-        if sides == 20 and count == 1 and (advantage or disadvantage):
-            a = self._rng.randint(1, 20)
-            b = self._rng.randint(1, 20)
-            pick = max(a, b) if advantage else min(a, b)
-            total = pick + mod
-            return DiceRoll(expr=expr, rolls=[a, b, pick], total=total, modifier=mod,
-                            sides=20, count=1, crit=(pick==20))
-
-        rolls = [self._rng.randint(1, sides) for _ in range(count)]
-        total = sum(rolls) + mod
-        crit = (sides == 20 and count == 1 and rolls[0] == 20)
-        return DiceRoll(expr=expr, rolls=rolls, total=total, modifier=mod, sides=sides,
-                        count=count, crit=crit)
+        # randint(1, n) is 1 + _randbelow(n) after argument checks: same draws, less overhead.
+        return roll_plan(compile_expr(expr), expr, self._rng._randbelow, advantage, disadvantage)
@@ -0,0 +1,71 @@
+# rules/group.py
+
+"""
+Checks for a whole party at once: group checks, "everyone roll stealth",
+passive sweeps. Same rules as compute_check, evaluated as arrays over one
+(n, 2) block of d20s.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from Adventorator.rules.checks import ABILS, CheckInput
+
+
+@dataclass(frozen=True)
+class GroupResult:
+    d20: np.ndarray      # (n, 2) raw d20s; column 1 only counts with adv/dis (zeros when passive)
+    pick: np.ndarray     # (n,) d20 used, or 10 (+/-5 for adv/dis) for passive checks
+    mod: np.ndarray      # (n,) ability mod + proficiency
+    total: np.ndarray    # (n,)
+    success: np.ndarray  # (n,) bool; False where there's no DC
+
+    @property
+    def successes(self) -> int:
+        return int(self.success.sum())
+
+    @property
+    def group_success(self) -> bool:
+        """5e group check: the group succeeds if at least half of it does."""
+        return 2 * self.successes >= len(self.success)
+
+
+def check_mods(inputs: Sequence[CheckInput]) -> np.ndarray:
+    """Ability modifier + proficiency per input, as compute_check adds them."""
+    for inp in inputs:
+        if inp.ability.upper() not in ABILS:
+            raise ValueError("unknown ability")
+    score = np.array([inp.score for inp in inputs], dtype=np.int64)
+    prof = np.array([
+        inp.proficiency_bonus * (2 if inp.expertise else 1)
+        if inp.proficient or inp.expertise else 0
+        for inp in inputs
+    ], dtype=np.int64)
+    return (score - 10) // 2 + prof
+
+
+def compute_checks(inputs: Sequence[CheckInput], d20: np.ndarray | None = None) -> GroupResult:
+    """
+    Resolve many checks in one pass. d20 is an (n, 2) array of rolls (second
+    column used for adv/dis; advantage wins if both are set, as in compute_check).
+    Without d20, the checks are passive: 10 + mod, +5 with advantage, -5 with
+    disadvantage.
+    """
+    n = len(inputs)
+    adv = np.array([inp.advantage for inp in inputs], dtype=bool)
+    dis = np.array([inp.disadvantage for inp in inputs], dtype=bool) & ~adv
+    if d20 is None:
+        d20 = np.zeros((n, 2), dtype=np.int64)
+        pick = 10 + 5 * adv - 5 * dis
+    else:
+        d20 = np.asarray(d20, dtype=np.int64).reshape(n, 2)
+        pick = np.where(adv, d20.max(axis=1), np.where(dis, d20.min(axis=1), d20[:, 0]))
+    mod = check_mods(inputs)
+    total = pick + mod
+    never = np.iinfo(np.int64).max
+    dc = np.array([never if inp.dc is None else inp.dc for inp in inputs], dtype=np.int64)
+    return GroupResult(d20, pick, mod, total, total >= dc)
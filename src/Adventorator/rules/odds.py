@@ -0,0 +1,237 @@
+# rules/odds.py
+
+"""
+Exact outcome distributions for dice expressions and checks, no simulation.
+
+A Dist is a PMF over consecutive integers. Sums of dice are convolutions;
+keep/drop pools are worked out face by face as order statistics; advantage and
+disadvantage on a lone d20 are the max/min of two. Exploding dice are expanded
+until the remaining tail is below TAIL (so their PMFs sum to 1 - ~1e-12).
+Distributions are memoized per normalized expression. Supports wider than
+MAX_SUPPORT values are refused up front, and big convolutions go through the
+FFT, so no expression the parser accepts takes more than a fraction of a second.
+"""
+
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass
+from math import comb
+
+import numpy as np
+
+from Adventorator.rules.checks import CheckInput, compute_check
+from Adventorator.rules.dice import MAX_EXPLODE, _Dice, compile_expr
+
+TAIL = 1e-12
+MAX_POOL = 40  # keep/drop pools larger than this get slow (pool x pool x faces x sum)
+MAX_POOL_WORK = 25_000  # pool x pool x sides: ~0.4s of the face-by-face loop
+MAX_SUPPORT = 250_000  # max - min of a distribution (two 100d1000 terms fit)
+DIRECT = 50_000  # len(a) x len(b) below this: np.convolve beats the FFT
+
+
+@dataclass(frozen=True)
+class Dist:
+    offset: int      # value of p[0]
+    p: np.ndarray    # probabilities of offset, offset+1, ...
+
+    @property
+    def min(self) -> int:
+        return self.offset
+
+    @property
+    def max(self) -> int:
+        return self.offset + len(self.p) - 1
+
+    @property
+    def mean(self) -> float:
+        return float(np.dot(np.arange(self.offset, self.max + 1), self.p))
+
+    def __add__(self, other: Dist) -> Dist:
+        return Dist(self.offset + other.offset, _convolve(self.p, other.p))
+
+    def shift(self, k: int) -> Dist:
+        return Dist(self.offset + k, self.p)
+
+    def neg(self) -> Dist:
+        return Dist(-self.max, self.p[::-1])
+
+    def prob(self, value: int) -> float:
+        i = value - self.offset
+        return float(self.p[i]) if 0 <= i < len(self.p) else 0.0
+
+    def prob_at_least(self, value: int) -> float:
+        i = min(max(value - self.offset, 0), len(self.p))
+        return float(self.p[i:].sum())
+
+    def cdf(self) -> np.ndarray:
+        return np.cumsum(self.p)
+
+
+def _convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    n = len(a) + len(b) - 1
+    if len(a) * len(b) <= DIRECT:
+        return np.convolve(a, b)
+    size = 1 << (n - 1).bit_length()
+    out = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:n]
+    return np.clip(out, 0.0, None)  # round-off leaves ~1e-17 noise, some of it negative
+
+
+def _trimmed(offset: int, p: np.ndarray) -> Dist:
+    nz = np.flatnonzero(p)
+    return Dist(offset + int(nz[0]), p[nz[0]:nz[-1] + 1])
+
+
+def _uniform(faces: np.ndarray, sides: int) -> np.ndarray:
+    p = np.zeros(sides)
+    p[faces - 1] = 1.0 / len(faces)
+    return p
+
+
+def _face_pmf(term: _Dice) -> np.ndarray:
+    """PMF of one die's value over 1..sides, after rerolls, before explosions."""
+    s = term.sides
+    if term.reroll is None:
+        return np.full(s, 1.0 / s)
+    lo, hi = term.reroll
+    faces = np.arange(1, s + 1)
+    bad = (faces >= lo) & (faces <= hi)
+    if not term.reroll_once:
+        return _uniform(faces[~bad], s)
+    # first roll stands unless it's bad, then one fresh uniform roll
+    return np.where(bad, 0.0, 1.0 / s) + bad.sum() / s / s
+
+
+def _die(term: _Dice) -> Dist:
+    """One die, explosions included."""
+    base = _face_pmf(term)
+    if not term.explode:
+        return Dist(1, base)
+    # value = s*k + r (r < s) after k max rolls: first roll is base, chained rolls uniform
+    s = term.sides
+    p_max = base[-1]
+    out = np.zeros(s * (MAX_EXPLODE + 1))
+    out[:s - 1] = base[:s - 1]
+    chain = p_max
+    for k in range(1, MAX_EXPLODE + 1):
+        out[s * k:s * k + s - 1] = chain / s
+        chain /= s
+        if chain < TAIL:
+            break
+    return _trimmed(1, out)
+
+
+def _power(d: Dist, n: int) -> Dist:
+    out = Dist(0, np.ones(1))
+    while n:
+        if n & 1:
+            out = out + d
+        n >>= 1
+        if n:
+            d = d + d
+    return out
+
+
+def _keep(term: _Dice) -> Dist:
+    """Sum of the kept dice of a keep/drop pool, as order statistics."""
+    highest, k, drop = term.keep  # type: ignore[misc]
+    n, s = term.count, term.sides
+    k = max(0, n - k) if drop else min(k, n)
+    if term.explode:
+        raise ValueError("odds for keep/drop on exploding dice aren't supported")
+    if n > MAX_POOL or n * n * s > MAX_POOL_WORK:
+        raise ValueError(
+            f"odds for a {n}d{s} keep/drop pool aren't supported (too many dice or sides)"
+        )
+    q = _face_pmf(term)
+    faces = range(s, 0, -1) if highest else range(1, s + 1)
+    # state: dice placed so far (best faces first) -> PMF of the kept sum
+    states: dict[int, np.ndarray] = {0: np.ones(1)}
+    for v in faces:
+        nxt: dict[int, np.ndarray] = {}
+        qv = q[v - 1]
+        for j, pmf in states.items():
+            for c in range(n - j + 1):
+                w = comb(n - j, c) * qv ** c
+                if w == 0.0:
+                    continue
+                add = (min(j + c, k) - min(j, k)) * v
+                shifted = np.zeros(len(pmf) + add)
+                shifted[add:] = pmf * w
+                cur = nxt.get(j + c)
+                if cur is None:
+                    nxt[j + c] = shifted
+                else:
+                    if len(cur) < len(shifted):
+                        cur = np.pad(cur, (0, len(shifted) - len(cur)))
+                    cur[:len(shifted)] += shifted
+                    nxt[j + c] = cur
+        states = nxt
+    # every die has been placed on some face
+    return _trimmed(0, states[n])
+
+
+def _width(term: _Dice) -> int:
+    """max - min of a term's total, without building it."""
+    if term.keep is not None:
+        highest, k, drop = term.keep
+        k = max(0, term.count - k) if drop else min(k, term.count)
+        return k * (term.sides - 1)
+    return term.count * (len(_die(term).p) - 1)
+
+
+def _term(term: _Dice) -> Dist:
+    d = _keep(term) if term.keep is not None else _power(_die(term), term.count)
+    return d.neg() if term.sign < 0 else d
+
+
+def normalize(expr: str) -> str:
+    return "".join(expr.split()).lower()
+
+
+def distribution(expr: str, advantage: bool = False, disadvantage: bool = False) -> Dist:
+    """Exact PMF of a dice expression's total (adv/dis as in DiceRNG.roll: lone d20 only)."""
+    return _distribution(normalize(expr), advantage, disadvantage)
+
+
+@functools.lru_cache(maxsize=512)
+def _distribution(expr: str, advantage: bool, disadvantage: bool) -> Dist:
+    plan = compile_expr(expr)
+    if plan.single_d20 and (advantage or disadvantage):
+        return _d20(advantage, disadvantage).shift(plan.modifier)
+    width = sum(_width(t) for t in plan.dice)
+    if width > MAX_SUPPORT:
+        raise ValueError(
+            f"odds for {expr} span {width + 1} totals; up to {MAX_SUPPORT} are supported"
+        )
+    out = Dist(plan.modifier, np.ones(1))
+    for term in plan.dice:
+        out = out + _term(term)
+    out.p.flags.writeable = False  # shared through the cache
+    return out
+
+
+@functools.lru_cache(maxsize=4)
+def _d20(advantage: bool, disadvantage: bool) -> Dist:
+    """Picked d20 for a check; advantage wins if both are set, as in compute_check."""
+    cdf = np.arange(1, 21) / 20
+    if advantage:
+        cdf = cdf ** 2
+    elif disadvantage:
+        cdf = 1 - (1 - cdf) ** 2
+    p = np.diff(cdf, prepend=0.0)
+    p.flags.writeable = False
+    return Dist(1, p)
+
+
+def check_distribution(inp: CheckInput) -> Dist:
+    """PMF of a check's total (d20 pick + modifier, computed by compute_check)."""
+    mod = compute_check(inp, [10, 10]).mod
+    return _d20(inp.advantage, inp.disadvantage).shift(mod)
+
+
+def check_odds(inp: CheckInput) -> float:
+    """P(success) of a check against inp.dc."""
+    if inp.dc is None:
+        raise ValueError("check has no DC")
+    return check_distribution(inp).prob_at_least(inp.dc)
@@ -0,0 +1,65 @@
+# rules/streams.py
+
+"""
+Per-scene dice streams on a counter-based generator (Philox-4x64).
+
+Roll i of a scene is drawn from Philox keyed by (campaign seed, scene id) with
+its counter positioned at i, so any roll can be regenerated in O(1) from
+(seed, scene, index, expr) without replaying the rolls before it. Indexes come
+from repos.next_roll_index (an atomic counter on the scene row), and a
+SceneRNG holds no mutable state, so any worker can roll or replay any index.
+
+Bounded draws are rejection-sampled from the raw 64-bit output rather than
+taken from Generator.integers, whose algorithm NumPy may change between
+releases; a logged roll or batch replays the same on any NumPy version.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from Adventorator.rules.batch import BatchRoller, _uniform
+from Adventorator.rules.dice import DiceRoll, compile_expr, roll_plan
+
+_MASK64 = (1 << 64) - 1
+
+
+@dataclass(frozen=True)
+class SceneRNG:
+    seed: int      # campaigns.rng_seed
+    scene_id: int
+
+    def _bitgen(self, index: int) -> np.random.Philox:
+        if index < 0:
+            raise ValueError("roll index must be >= 0")
+        # Low counter words advance within a roll; the high ones select the roll.
+        counter = [0, 0, index & _MASK64, (index >> 64) & _MASK64]
+        return np.random.Philox(counter=counter, key=[self.seed & _MASK64, self.scene_id & _MASK64])
+
+    def roll(
+        self, index: int, expr: str, advantage: bool = False, disadvantage: bool = False
+    ) -> DiceRoll:
+        """Roll `index` of this scene. The same arguments always give the same DiceRoll."""
+        raw = self._bitgen(index).random_raw
+
+        def below(n: int) -> int:
+            limit = (1 << 64) - (1 << 64) % n  # largest multiple of n: no modulo bias
+            while True:
+                x = int(raw())
+                if x < limit:
+                    return x % n
+
+        return roll_plan(compile_expr(expr), expr, below, advantage, disadvantage)
+
+    def draws(self, index: int, sides: int, n: int) -> np.ndarray:
+        """
+        n dice of `sides` from roll `index`'s stream in one vectorized call; the
+        same values roll() would draw one at a time (e.g. a party's d20s).
+        """
+        return _uniform(self._bitgen(index), sides, n) + 1
+
+    def batch(self, index: int) -> BatchRoller:
+        """A BatchRoller on roll `index`'s stream, for repeated rolls (/roll times:N)."""
+        return BatchRoller(self._bitgen(index))
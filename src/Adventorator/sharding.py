@@ -0,0 +1,398 @@
+# sharding.py
+
+"""
+Guild-based sharding.
+
+Everything a campaign owns is keyed by its Discord guild and nothing queries
+across guilds, so each guild lives wholly on one shard. `[sharding] shards` maps
+shard names to database URLs; a guild's shard is the `guild_shards` override row
+if there is one (kept in the primary/directory database), otherwise its point on
+a consistent-hash ring, so adding a shard only moves ~1/N of the guilds.
+
+Callers don't use this directly: `session_scope(guild_id=...)` routes through
+`router`. `move_guild` (scripts/reshard.py) moves one guild between shards while
+it stays online; `pin_placements` pins existing guilds before a shard is added,
+so the new ring only places new guilds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+import structlog
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from Adventorator import metrics, models
+from Adventorator.config import load_settings
+from Adventorator.db import _engine_kwargs, _normalize_url, get_sessionmaker
+from Adventorator.models import Campaign, Character, Combatant, Player, Scene, Transcript, Turn
+from Adventorator.repos import _insert
+
+log = structlog.get_logger()
+settings = load_settings()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with `vnodes` points per shard."""
+
+    def __init__(self, names: list[str], vnodes: int = 64):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._names = [p[1] for p in points]
+
+    def lookup(self, guild_id: int) -> str:
+        if not self._keys:
+            raise LookupError("no shards configured")
+        i = bisect.bisect(self._keys, _hash(str(guild_id))) % len(self._keys)
+        return self._names[i]
+
+
+class ShardRouter:
+    def __init__(self, shards: dict[str, str], vnodes: int = 64, override_ttl: float = 30.0):
+        self.shards = {name: _normalize_url(url) for name, url in shards.items()}
+        self.ring = HashRing(sorted(self.shards), vnodes)
+        self.override_ttl = override_ttl
+        self._engines: dict[str, AsyncEngine] = {}
+        self._sessionmakers: dict[str, async_sessionmaker[AsyncSession]] = {}
+        self._overrides: dict[int, str] = {}
+        self._overrides_at = float("-inf")
+        self._refresh: asyncio.Lock | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.shards)
+
+    async def _load_overrides(self) -> None:
+        if self._refresh is None:
+            self._refresh = asyncio.Lock()
+        async with self._refresh:
+            if time.monotonic() - self._overrides_at < self.override_ttl:
+                return
+            # The override table lives in the directory (primary) database.
+            async with get_sessionmaker()() as s:
+                stmt = select(models.GuildShard.guild_id, models.GuildShard.shard)
+                rows = (await s.execute(stmt)).all()
+            self._overrides = {g: name for g, name in rows}
+            self._overrides_at = time.monotonic()
+
+    async def shard_for(self, guild_id: int) -> str:
+        if time.monotonic() - self._overrides_at >= self.override_ttl:
+            await self._load_overrides()
+        name = self._overrides.get(guild_id)
+        if name is not None and name in self.shards:
+            return name
+        return self.ring.lookup(guild_id)
+
+    def sessionmaker(self, name: str) -> async_sessionmaker[AsyncSession]:
+        sm = self._sessionmakers.get(name)
+        if sm is None:
+            url = self.shards[name]
+            engine = self._engines[name] = create_async_engine(url, **_engine_kwargs(url))
+            sm = self._sessionmakers[name] = async_sessionmaker(engine, expire_on_commit=False)
+        return sm
+
+    async def set_override(self, guild_id: int, name: str) -> None:
+        if name not in self.shards:
+            raise KeyError(f"unknown shard {name!r}")
+        async with get_sessionmaker()() as s:
+            await s.merge(models.GuildShard(guild_id=guild_id, shard=name))
+            await s.commit()
+        self._overrides[guild_id] = name  # this worker switches now; others within override_ttl
+
+    async def dispose(self) -> None:
+        for engine in self._engines.values():
+            await engine.dispose()
+        self._engines.clear()
+        self._sessionmakers.clear()
+
+
+router = ShardRouter(
+    settings.database_shards, settings.shard_vnodes, settings.shard_override_ttl_seconds
+)
+
+
+# --- moving a guild between shards ---
+
+@dataclass
+class MoveReport:
+    guild_id: int
+    source: str
+    target: str
+    campaigns: int = 0
+    scenes: int = 0
+    characters: int = 0
+    turns: int = 0
+    transcripts: int = 0
+    # source id -> target id, built up across sync passes
+    campaign_ids: dict[int, int] = field(default_factory=dict)
+    scene_ids: dict[int, int] = field(default_factory=dict)
+    player_ids: dict[int, int] = field(default_factory=dict)
+    turn_watermark: int = 0
+    transcript_watermark: int = 0
+
+
+async def _sync(
+    src: AsyncSession, dst: AsyncSession, rep: MoveReport, batch_rows: int, flipped: bool = False
+) -> None:
+    """
+    Copy the guild's rows from src to dst, remapping ids. Idempotent: rows are matched
+    on natural keys (guild, channel, discord user, campaign+name), and append-only
+    tables (turns, transcripts) resume from the last copied source id (turns: the
+    first one still in progress).
+
+    flipped: the target is already serving the guild, so its campaign, scene and
+    initiative state wins; only missing rows (and appends) come across.
+    """
+    stmt = select(Campaign).where(Campaign.guild_id == rep.guild_id)
+    camp = (await src.execute(stmt)).scalar_one_or_none()
+    if camp is None:
+        return
+    stmt = _insert(dst, Campaign).values(
+        guild_id=camp.guild_id, name=camp.name, system=camp.system, rng_seed=camp.rng_seed,
+        created_at=camp.created_at,
+    )
+    # The seed moves with the guild so logged rolls still replay (rules/streams.py).
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["guild_id"],
+        set_={"guild_id": stmt.excluded.guild_id} if flipped
+        else {"name": stmt.excluded.name, "rng_seed": stmt.excluded.rng_seed},
+    )
+    new_camp = (await dst.execute(stmt.returning(Campaign.id))).scalar_one()
+    if camp.id not in rep.campaign_ids:
+        rep.campaigns += 1
+    rep.campaign_ids[camp.id] = new_camp
+
+    for sc in (await src.execute(select(Scene).where(Scene.campaign_id == camp.id))).scalars():
+        stmt = _insert(dst, Scene).values(
+            campaign_id=new_camp, channel_id=sc.channel_id, mode=sc.mode,
+            location_node_id=sc.location_node_id, is_active=sc.is_active,
+            roll_counter=sc.roll_counter, created_at=sc.created_at,
+        )
+        # never hand out a stream index twice, whichever side rolled last
+        ours, theirs = Scene.roll_counter, stmt.excluded.roll_counter
+        set_ = {"roll_counter": case((ours < theirs, theirs), else_=ours)}
+        if not flipped:  # after the flip, e.g. /combat start on the target must stick
+            set_.update(mode=stmt.excluded.mode, is_active=stmt.excluded.is_active,
+                        location_node_id=stmt.excluded.location_node_id)
+        stmt = stmt.on_conflict_do_update(index_elements=["channel_id"], set_=set_)
+        if sc.id not in rep.scene_ids:
+            rep.scenes += 1
+        rep.scene_ids[sc.id] = (await dst.execute(stmt.returning(Scene.id))).scalar_one()
+
+    stmt = select(Character).where(Character.campaign_id == camp.id)
+    chars = (await src.execute(stmt)).scalars().all()
+    player_ids = {c.player_id for c in chars if c.player_id is not None} - rep.player_ids.keys()
+    if player_ids:
+        for p in (await src.execute(select(Player).where(Player.id.in_(player_ids)))).scalars():
+            stmt = _insert(dst, Player).values(
+                discord_user_id=p.discord_user_id, display_name=p.display_name,
+                created_at=p.created_at,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["discord_user_id"],
+                set_={"discord_user_id": stmt.excluded.discord_user_id},
+            )
+            rep.player_ids[p.id] = (await dst.execute(stmt.returning(Player.id))).scalar_one()
+    for c in chars:
+        stmt = _insert(dst, Character).values(
+            campaign_id=new_camp, player_id=rep.player_ids.get(c.player_id), name=c.name,
+            sheet=c.sheet, created_at=c.created_at, updated_at=c.updated_at,
+        )
+        # Last writer wins: a sheet edited on the target after the flip isn't clobbered.
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["campaign_id", "name"],
+            set_={"sheet": stmt.excluded.sheet, "player_id": stmt.excluded.player_id,
+                  "updated_at": stmt.excluded.updated_at},
+            where=Character.updated_at < stmt.excluded.updated_at,
+        )
+        rep.characters += (await dst.execute(stmt)).rowcount or 0
+
+    if rep.scene_ids:
+        turns = (await src.execute(
+            select(Turn).where(Turn.scene_id.in_(rep.scene_ids), Turn.id > rep.turn_watermark)
+            .order_by(Turn.id)
+        )).scalars().all()
+        if turns:
+            stmt = _insert(dst, Turn)
+            # Turns in progress are copied again next pass, so they land with their final state
+            # (unless the target has already ended them).
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["scene_id", "turn_no"],
+                set_={k: stmt.excluded[k] for k in ("ended_at", "outcome", "deadline")},
+                where=Turn.ended_at.is_(None),
+            )
+            await dst.execute(stmt, [
+                {"scene_id": rep.scene_ids[t.scene_id], "actor_ref": t.actor_ref,
+                 "turn_no": t.turn_no, "round": t.round, "started_at": t.started_at,
+                 "deadline": t.deadline, "ended_at": t.ended_at, "outcome": t.outcome}
+                for t in turns
+            ])
+            rep.turns += len(turns)
+            open_ids = [t.id for t in turns if t.ended_at is None]
+            rep.turn_watermark = min(open_ids) - 1 if open_ids else turns[-1].id
+
+        # Initiative order is small and mutable: replace it wholesale, until the target owns it.
+        combatants = []
+        if not flipped:
+            await dst.execute(
+                delete(Combatant).where(Combatant.scene_id.in_(rep.scene_ids.values()))
+            )
+            stmt = select(Combatant).where(Combatant.scene_id.in_(rep.scene_ids))
+            combatants = (await src.execute(stmt)).scalars().all()
+        if combatants:
+            await dst.execute(_insert(dst, Combatant), [
+                {"scene_id": rep.scene_ids[c.scene_id], "actor_ref": c.actor_ref,
+                 "initiative": c.initiative, "dex_mod": c.dex_mod, "seq": c.seq,
+                 "created_at": c.created_at}
+                for c in combatants
+            ])
+
+    cols = (
+        Transcript.id, Transcript.scene_id, Transcript.channel_id, Transcript.message_id,
+        Transcript.author, Transcript.author_ref, Transcript.content, Transcript.meta,
+        Transcript.created_at,
+    )
+    result = await src.stream(
+        select(*cols)
+        .where(Transcript.campaign_id == camp.id, Transcript.id > rep.transcript_watermark)
+        .order_by(Transcript.id).execution_options(yield_per=batch_rows)
+    )
+    async for part in result.mappings().partitions(batch_rows):
+        await dst.execute(_insert(dst, Transcript), [
+            {**{k: v for k, v in r.items() if k != "id"},
+             "campaign_id": new_camp, "scene_id": rep.scene_ids.get(r["scene_id"])}
+            for r in part
+        ])
+        rep.transcripts += len(part)
+        rep.transcript_watermark = part[-1]["id"]
+
+
+async def _sync_pass(rep: MoveReport, batch_rows: int, flipped: bool = False) -> None:
+    async with router.sessionmaker(rep.source)() as src, router.sessionmaker(rep.target)() as dst:
+        await _sync(src, dst, rep, batch_rows, flipped)
+        await dst.commit()
+
+
+async def _fence(src: AsyncSession, guild_id: int) -> None:
+    """
+    Hold off the guild's writers on the source until `src` commits. On Postgres,
+    FOR UPDATE conflicts with updates to these rows and with the key-share locks that
+    inserts referencing them (scenes, characters, turns, transcripts) take. SQLite
+    has one writer at a time: the no-op update takes the database lock.
+    """
+    camp_ids = select(Campaign.id).where(Campaign.guild_id == guild_id).scalar_subquery()
+    if src.get_bind().dialect.name == "sqlite":
+        await src.execute(
+            update(Campaign).where(Campaign.guild_id == guild_id).values(name=Campaign.name)
+        )
+        return
+    await src.execute(select(Campaign.id).where(Campaign.guild_id == guild_id).with_for_update())
+    await src.execute(select(Scene.id).where(Scene.campaign_id.in_(camp_ids)).with_for_update())
+    stmt = select(Character.id).where(Character.campaign_id.in_(camp_ids))
+    await src.execute(stmt.with_for_update())
+
+
+async def move_guild(
+    guild_id: int, target: str, settle_seconds: float | None = None, batch_rows: int = 1000
+) -> MoveReport:
+    """
+    Move one guild to `target` without taking it offline:
+
+    1. bulk-copy its rows while the source keeps serving traffic;
+    2. flush this process's transcript buffer, then write the override, so
+       workers route the guild to the target as their override cache expires
+       (this one immediately);
+    3. wait `settle_seconds` (default: override TTL + 1s) for the rest to switch;
+    4. fence the guild on the source (see _fence) and, under the fence, copy
+       whatever landed there in the meantime (new rows and appends; scene and
+       combat state already on the target is kept);
+    5. delete the guild from the source and lift the fence.
+
+    Transcript rows other workers still have buffered were bound to the source
+    when written (transcripts.py) and reach it within a flush interval, well
+    inside the settle time. Writers the fence held back find the guild gone
+    from the source when it lifts: their writes fail there rather than landing
+    with ids that mean nothing on the target.
+
+    Re-running after a failure is safe: each copy pass is idempotent.
+    """
+    from Adventorator.transcripts import sink  # transcripts imports this module
+
+    if target not in router.shards:
+        raise KeyError(f"unknown shard {target!r}")
+    source = await router.shard_for(guild_id)
+    rep = MoveReport(guild_id, source, target)
+    if source == target:
+        return rep
+    started = time.perf_counter()
+
+    await _sync_pass(rep, batch_rows)
+    await sink.flush()
+    await router.set_override(guild_id, target)
+    await asyncio.sleep(router.override_ttl + 1 if settle_seconds is None else settle_seconds)
+
+    async with router.sessionmaker(source)() as src, router.sessionmaker(target)() as dst:
+        await _fence(src, guild_id)
+        await _sync(src, dst, rep, batch_rows, flipped=True)
+        await dst.commit()
+        camp_ids = list(rep.campaign_ids)
+        if camp_ids:
+            await src.execute(delete(Transcript).where(Transcript.campaign_id.in_(camp_ids)))
+            await src.execute(delete(Combatant).where(Combatant.scene_id.in_(rep.scene_ids)))
+            await src.execute(delete(Turn).where(Turn.scene_id.in_(rep.scene_ids)))
+            await src.execute(delete(Character).where(Character.campaign_id.in_(camp_ids)))
+            await src.execute(delete(Scene).where(Scene.campaign_id.in_(camp_ids)))
+            await src.execute(delete(Campaign).where(Campaign.id.in_(camp_ids)))
+        await src.commit()
+
+    metrics.inc("sharding.guilds_moved")
+    log.info(
+        "guild moved", guild_id=guild_id, source=source, target=target, transcripts=rep.transcripts,
+        seconds=round(time.perf_counter() - started, 2),
+    )
+    return rep
+
+
+async def pin_placements() -> dict[int, str]:
+    """
+    Write a guild_shards override for every guild that doesn't have one, naming the
+    shard that holds it now. Run with the current shard list *before* adding a shard:
+    the ring then only decides where new guilds go, and existing ones move when
+    move_guild says so. Returns the overrides written.
+    """
+    router._overrides_at = float("-inf")
+    await router._load_overrides()
+    found: dict[int, list[str]] = {}
+    for name in sorted(router.shards):
+        async with router.sessionmaker(name)() as s:
+            for g in (await s.execute(select(models.Campaign.guild_id))).scalars():
+                found.setdefault(g, []).append(name)
+    pins = {}
+    for g, names in found.items():
+        if g in router._overrides:
+            continue
+        ring = router.ring.lookup(g)
+        # On two shards (a move in flight): pin the one serving it.
+        pins[g] = ring if ring in names else names[0]
+    if pins:
+        async with get_sessionmaker()() as s:
+            stmt = _insert(s, models.GuildShard).on_conflict_do_nothing(index_elements=["guild_id"])
+            await s.execute(stmt, [{"guild_id": g, "shard": name} for g, name in pins.items()])
+            await s.commit()
+        router._overrides.update(pins)
+    log.info("guild placements pinned", pinned=len(pins), guilds=len(found))
+    return pins
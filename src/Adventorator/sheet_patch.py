@@ -0,0 +1,198 @@
+# sheet_patch.py
+
+"""
+Partial character sheet updates: RFC 6902 JSON Patch, plus dotted field setters
+("hp.current" -> 11) as a shorthand for replace ops. Only the top-level sheet
+fields a patch touches are re-validated. repos.patch_character writes the result.
+"""
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import ValidationError
+
+from Adventorator.schemas import CharacterSheet
+
+# Stored sheets are model_dump(by_alias=True): keys are aliases ("class").
+_FIELD_BY_KEY = {(f.alias or name): name for name, f in CharacterSheet.model_fields.items()}
+_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class PatchError(ValueError):
+    """The patch is malformed, doesn't apply to the sheet, or leaves a field invalid."""
+
+
+@dataclass
+class PatchResult:
+    doc: dict
+    # top-level keys touched, in first-touch order
+    fields: list[str] = field(default_factory=list)
+    # per touched key: (path, value) sets in order, or None when the key must be
+    # rewritten whole (structural change, removal, or validation coerced a value)
+    sets: dict[str, list[tuple[tuple[str, ...], Any]] | None] = field(default_factory=dict)
+
+    def touch(self, path: tuple[str, ...], value: Any = None, exact: bool = False) -> None:
+        key = path[0]
+        if key not in self.sets:
+            self.fields.append(key)
+            self.sets[key] = []
+        sets = self.sets[key]
+        if sets is not None and exact:
+            sets.append((path, value))
+        else:
+            self.sets[key] = None
+
+
+def parse_pointer(ptr: str) -> tuple[str, ...]:
+    """RFC 6901 pointer -> tokens. The root ("") isn't patchable: use /sheet create."""
+    if not isinstance(ptr, str) or not ptr.startswith("/"):
+        raise PatchError(f"bad JSON pointer: {ptr!r}")
+    return tuple(t.replace("~1", "/").replace("~0", "~") for t in ptr[1:].split("/"))
+
+
+def _index(node: list, token: str, insert: bool = False) -> int:
+    if token == "-" and insert:
+        return len(node)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"bad array index: {token!r}")
+    i = int(token)
+    if i > len(node) or (i == len(node) and not insert):
+        raise PatchError(f"array index out of range: {i}")
+    return i
+
+
+def _get(node: Any, path: tuple[str, ...]) -> Any:
+    for token in path:
+        if isinstance(node, dict):
+            if token not in node:
+                raise PatchError(f"no such path: /{'/'.join(path)}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"no such path: /{'/'.join(path)}")
+    return node
+
+
+def _parent(doc: dict, path: tuple[str, ...]) -> dict | list:
+    """Container holding path[-1], copying each container on the way (callers' docs stay intact)."""
+    node: Any = doc
+    for token in path[:-1]:
+        child = _get(node, (token,))
+        if not isinstance(child, dict | list):
+            raise PatchError(f"no such path: /{'/'.join(path)}")
+        child = copy.copy(child)
+        if isinstance(node, dict):
+            node[token] = child
+        else:
+            node[_index(node, token)] = child
+        node = child
+    return node
+
+
+def _add(doc: dict, path: tuple[str, ...], value: Any, res: PatchResult) -> None:
+    parent = _parent(doc, path)
+    if isinstance(parent, dict):
+        parent[path[-1]] = value
+        res.touch(path, value, exact=True)
+    else:
+        parent.insert(_index(parent, path[-1], insert=True), value)
+        res.touch(path)
+
+
+def _remove(doc: dict, path: tuple[str, ...], res: PatchResult) -> Any:
+    parent = _parent(doc, path)
+    if isinstance(parent, dict):
+        if path[-1] not in parent:
+            raise PatchError(f"no such path: /{'/'.join(path)}")
+        value = parent.pop(path[-1])
+    else:
+        value = parent.pop(_index(parent, path[-1]))
+    res.touch(path)
+    return value
+
+
+def apply_patch(doc: dict, ops: list[dict]) -> PatchResult:
+    """
+    Apply RFC 6902 ops to a stored sheet and validate the touched fields. Returns a
+    new document; `doc` isn't modified. Raises PatchError.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("a patch is a JSON array of operations")
+    out = dict(doc)
+    res = PatchResult(out)
+    for op in ops:
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind not in _OPS:
+            raise PatchError(f"unknown op: {kind!r}")
+        path = parse_pointer(op.get("path"))
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"{kind} needs a value")
+        if kind == "add":
+            _add(out, path, copy.deepcopy(op["value"]), res)
+        elif kind == "remove":
+            _remove(out, path, res)
+        elif kind == "replace":
+            _get(out, path)  # must exist
+            parent = _parent(out, path)
+            value = copy.deepcopy(op["value"])
+            if isinstance(parent, dict):
+                parent[path[-1]] = value
+            else:
+                parent[_index(parent, path[-1])] = value
+            res.touch(path, value, exact=True)
+        elif kind == "test":
+            if _get(out, path) != op["value"]:
+                raise PatchError(f"test failed at {op['path']}")
+        else:  # move / copy
+            src = parse_pointer(op.get("from"))
+            if kind == "move":
+                if path[:len(src)] == src and path != src:
+                    raise PatchError("can't move a value into itself")
+                value = _remove(out, src, res)
+            else:
+                value = copy.deepcopy(_get(out, src))
+            _add(out, path, value, res)
+            res.touch(path)  # moved/copied values go out whole
+    validate_fields(res)
+    return res
+
+
+def validate_fields(res: PatchResult) -> None:
+    """Re-validate only the touched top-level fields, through the model's own validators."""
+    inst = CharacterSheet.model_construct()
+    validator = CharacterSheet.__pydantic_validator__
+    for key in res.fields:
+        name = _FIELD_BY_KEY.get(key)
+        if name is None:
+            raise PatchError(f"unknown field: {key}")
+        if name == "name":
+            raise PatchError("name can't be patched; rename with /sheet create")
+        if key not in res.doc:
+            if CharacterSheet.model_fields[name].is_required():
+                raise PatchError(f"{key} is required")
+            continue
+        raw = res.doc[key]
+        try:
+            validator.validate_assignment(inst, name, raw)
+        except ValidationError as e:
+            err = e.errors()[0]
+            where = ".".join(str(p) for p in (key, *err["loc"][1:]))
+            raise PatchError(f"{where}: {err['msg']}") from None
+        value = getattr(inst, name)
+        if value != raw or type(value) is not type(raw):
+            res.doc[key] = value
+            res.sets[key] = None  # coerced: write the validated value
+
+
+def setters_to_patch(setters: dict[str, Any]) -> list[dict]:
+    """{"hp.current": 11, "conditions": []} -> replace ops. The fields must exist."""
+    return [
+        {"op": "replace", "path": "/" + "/".join(
+            p.replace("~", "~0").replace("/", "~1") for p in dotted.split(".")
+        ), "value": value}
+        for dotted, value in setters.items()
+    ]
@@ -0,0 +1,115 @@
+# timerwheel.py
+
+"""
+Hierarchical timing wheel (Varghese & Lauck): O(1) schedule and cancel for any
+number of timers, and advancing the clock only touches the slots that come due.
+
+Level 0 has `slots` buckets of one tick each; every level above covers `slots`
+times the span of the one below. A timer goes into the lowest level whose span
+reaches its deadline. When a lower level wraps, the matching bucket one level
+up is emptied and its timers are re-placed with their (now nearer) deadlines
+("cascading"). Deadlines beyond the top level wait in its last reachable bucket
+and are re-placed as they come closer.
+
+Time is in integer ticks; callers convert (e.g. CombatEngine uses 100ms ticks).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(slots=True, eq=False)
+class Timer:
+    deadline: int  # tick
+    payload: Any
+    cancelled: bool = False
+
+
+class TimerWheel:
+    def __init__(self, slots: int = 64, levels: int = 4, now: int = 0):
+        if slots & (slots - 1) or slots < 2:
+            raise ValueError("slots must be a power of two")
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._levels = levels
+        self._wheels: list[list[list[Timer]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.now = now
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def schedule(self, deadline: int, payload: Any) -> Timer:
+        """
+        Fire `payload` once the clock reaches `deadline` (ticks). Past deadlines fire
+        on the next advance.
+        """
+        t = Timer(deadline, payload)
+        self._place(t, self.now + 1)  # this tick's bucket has already been visited
+        self._live += 1
+        return t
+
+    def cancel(self, timer: Timer) -> None:
+        # Lazy: the timer stays in its bucket and is dropped when that bucket is visited.
+        if not timer.cancelled:
+            timer.cancelled = True
+            self._live -= 1
+
+    def _place(self, t: Timer, floor: int) -> None:
+        deadline = max(t.deadline, floor)
+        delta = deadline - self.now
+        bits = self._bits
+        for level in range(self._levels):
+            if delta < 1 << (bits * (level + 1)):
+                self._wheels[level][(deadline >> (bits * level)) & self._mask].append(t)
+                return
+        # Beyond the top level: park it in the farthest top bucket; it re-places from there.
+        top = self._levels - 1
+        far = self.now + (1 << (bits * self._levels)) - (1 << (bits * top))
+        self._wheels[top][(far >> (bits * top)) & self._mask].append(t)
+
+    def _cascade(self, level: int, index: int) -> None:
+        bucket = self._wheels[level][index]
+        if bucket:
+            self._wheels[level][index] = []
+            for t in bucket:
+                if not t.cancelled:
+                    self._place(t, self.now)  # due now: lands in the level-0 bucket visited next
+
+    def advance(self, to: int) -> list[Any]:
+        """Move the clock to tick `to`; payloads of timers that came due, in deadline order."""
+        fired: list[Timer] = []
+        bits, mask = self._bits, self._mask
+        while self.now < to:
+            self.now += 1
+            now = self.now
+            # Entering a new span at level n: pull its bucket down from level n.
+            for level in range(1, self._levels):
+                if (now >> (bits * (level - 1))) & mask:
+                    break
+                self._cascade(level, (now >> (bits * level)) & mask)
+            bucket = self._wheels[0][now & mask]
+            if bucket:
+                self._wheels[0][now & mask] = []
+                for t in bucket:
+                    if t.cancelled:
+                        continue
+                    if t.deadline <= now:
+                        t.cancelled = True  # a late cancel() is a no-op
+                        self._live -= 1
+                        fired.append(t)
+                    else:  # parked far-future timer passing through
+                        self._place(t, now + 1)
+            if not self._live:
+                self.now = max(self.now, to)  # nothing pending: jump straight there
+        fired.sort(key=lambda t: t.deadline)
+        return [t.payload for t in fired]
+
+    def next_deadline(self) -> int | None:
+        """Earliest pending deadline, or None. O(timers); for tests and diagnostics."""
+        return min(
+            (t.deadline for wheel in self._wheels for b in wheel for t in b if not t.cancelled),
+            default=None,
+        )
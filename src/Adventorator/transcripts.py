@@ -0,0 +1,252 @@
+# transcripts.py
+
+"""
+Buffered, batched transcript writer.
+
+Transcript rows are collected in memory and flushed as one multi-row insert
+(COPY on Postgres, executemany on SQLite) when the buffer reaches `max_rows` or
+every `flush_interval` seconds, whichever comes first. Callers pick per write:
+`durable=True` returns only after the row (and everything before it) is committed,
+and raises if it couldn't be; other writes never raise.
+
+Rows from a failed flush are retried on later ticks. A row still failing after
+`max_attempts` flushes is retried on its own, so one bad row can't hold back the
+rest of its guild, and dead-lettered (logged, transcripts.dead_letter) if it
+fails alone too. While the database is unreachable the buffer holds at most
+`max_buffered` rows; beyond that the oldest are dropped (transcripts.dropped).
+
+With sharding, a row is bound to its guild's shard when it is written, not when
+it is flushed: its campaign and scene ids are only valid there, even if the guild
+moves (sharding.move_guild) while the row is still buffered.
+
+Readers go through `recent()`, which merges rows still sitting in the buffer with
+what's already in the database, so history never has a gap.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+import orjson
+import structlog
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Adventorator import metrics, models, repos, sharding
+from Adventorator.config import load_settings
+from Adventorator.db import session_scope, utc
+
+log = structlog.get_logger()
+settings = load_settings()
+
+_COLUMNS = (
+    "campaign_id", "scene_id", "channel_id", "author", "author_ref", "content", "meta",
+    "created_at",
+)
+
+
+class TranscriptSink:
+    def __init__(
+        self, max_rows: int = 100, flush_interval: float = 0.5, scope: Callable = None,
+        max_attempts: int = 20, max_buffered: int = 10_000,
+    ):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_buffered = max_buffered
+        self._scope = scope
+        self._buffer: list[dict] = []
+        self._retained = 0  # rows at the front of the buffer kept from a failed flush
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._timer: asyncio.Task | None = None
+
+    def _ensure_loop(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._timer = None
+        if self._timer is None or self._timer.done():
+            self._timer = loop.create_task(self._tick())
+        return self._lock  # type: ignore[return-value]
+
+    async def write(
+        self,
+        campaign_id: int,
+        scene_id: int | None,
+        channel_id: int | None,
+        author: str,
+        content: str,
+        author_ref: str | None = None,
+        meta: dict | None = None,
+        durable: bool = False,
+        guild_id: int | None = None,
+    ) -> None:
+        self._ensure_loop()
+        router = sharding.router
+        shard = None
+        if router.enabled and guild_id is not None:
+            shard = await router.shard_for(guild_id)
+        self._buffer.append({
+            # routing only (session_scope(guild_id=..., shard=...)); not columns
+            "guild_id": guild_id, "shard": shard,
+            "campaign_id": campaign_id, "scene_id": scene_id, "channel_id": channel_id,
+            "author": author, "author_ref": author_ref, "content": content, "meta": meta or {},
+            # Stamp now, not at flush time, so ordering reflects when things happened.
+            "created_at": datetime.now(timezone.utc),
+            "attempts": 0,  # failed flushes so far; not a column either
+        })
+        self._trim()
+        metrics.set_gauge("transcripts.buffered", len(self._buffer))
+        if durable:
+            await self.flush()
+        elif len(self._buffer) - self._retained >= self.max_rows:
+            # Rows kept from a failed flush don't count, so an outage costs one attempt
+            # per max_rows writes rather than one per write.
+            with contextlib.suppress(RuntimeError):
+                await self.flush()  # already logged; what's left goes again next tick
+
+    def _trim(self) -> None:
+        excess = len(self._buffer) - self.max_buffered
+        if excess > 0:
+            del self._buffer[:excess]
+            self._retained = max(0, self._retained - excess)
+            metrics.inc("transcripts.dropped", excess)
+            log.warning("transcript buffer full; dropped oldest rows", rows=excess)
+
+    async def flush(self) -> int:
+        """Write out the buffer. Raises RuntimeError if any row wasn't committed."""
+        lock = self._ensure_loop()
+        async with lock:
+            return await self._flush_locked()
+
+    async def _flush_locked(self) -> int:
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        self._retained = 0
+        started = time.perf_counter()
+        by_guild: dict[tuple[int | None, str | None], list[dict]] = {}
+        for r in rows:
+            by_guild.setdefault((r["guild_id"], r["shard"]), []).append(r)
+        scope = self._scope or session_scope
+        failed: list[dict] = []
+        dead = 0
+        for (guild_id, shard), group in by_guild.items():
+            try:
+                # One transaction per shard; without sharding every guild lands on the primary.
+                async with scope(guild_id=guild_id, shard=shard) as s:
+                    await _bulk_insert(s, group)
+            except Exception:
+                metrics.inc("transcripts.flush_errors")
+                log.exception("transcript flush failed", rows=len(group), guild_id=guild_id)
+                spent = []
+                for r in group:
+                    r["attempts"] += 1
+                    (spent if r["attempts"] >= self.max_attempts else failed).append(r)
+                dead += await self._insert_one_by_one(scope, guild_id, shard, spent)
+        if failed:
+            # Keep them for the next attempt, ahead of anything written meanwhile.
+            self._buffer[:0] = failed
+            self._retained = len(failed)
+            self._trim()
+        metrics.set_gauge("transcripts.buffered", len(self._buffer))
+        if failed or dead:
+            raise RuntimeError(f"{len(failed) + dead} transcript rows not flushed")
+        metrics.inc("transcripts.flushed", len(rows))
+        metrics.observe_ms("transcripts.flush_ms", (time.perf_counter() - started) * 1000)
+        return len(rows)
+
+    async def _insert_one_by_one(
+        self, scope: Callable, guild_id: int | None, shard: str | None, rows: list[dict]
+    ) -> int:
+        """Rows out of attempts get one last try each; returns how many were dead-lettered."""
+        dead = 0
+        for r in rows:
+            try:
+                async with scope(guild_id=guild_id, shard=shard) as s:
+                    await _bulk_insert(s, [r])
+            except Exception as e:
+                dead += 1
+                metrics.inc("transcripts.dead_letter")
+                log.error(
+                    "transcript row dead-lettered", guild_id=guild_id, shard=shard, error=str(e),
+                    **{c: r[c] for c in _COLUMNS},
+                )
+        return dead
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                try:
+                    await self.flush()
+                except Exception:
+                    pass  # already logged; retried next tick
+
+    def pending(
+        self, scene_id: int, user_id: str | None = None, guild_id: int | None = None
+    ) -> list[repos.TranscriptLine]:
+        # Scene ids are only unique per shard; the guild disambiguates when sharded.
+        return [
+            repos.TranscriptLine(None, r["author"], r["author_ref"], r["content"], r["created_at"])
+            for r in self._buffer
+            if r["scene_id"] == scene_id
+            and (user_id is None or r["author_ref"] == user_id)
+            and (guild_id is None or r["guild_id"] == guild_id)
+        ]
+
+    async def recent(
+        self, s: AsyncSession, scene_id: int, limit: int = 15, user_id: str | None = None
+    ) -> list[repos.TranscriptLine]:
+        """repos.get_recent_transcripts plus rows not yet flushed, in chronological order."""
+        lock = self._ensure_loop()
+        # Holding the lock keeps a flush from moving rows between the two views mid-read.
+        async with lock:
+            stored = await repos.get_recent_transcripts(s, scene_id, limit=limit, user_id=user_id)
+            buffered = self.pending(scene_id, user_id, s.info.get("guild_id"))
+        merged = sorted([*stored, *buffered], key=lambda t: utc(t.created_at))
+        return merged[-limit:]
+
+    async def close(self) -> None:
+        """Flush everything and stop the timer (shutdown hook)."""
+        if self._loop is not asyncio.get_running_loop():
+            if self._buffer:
+                log.warning(
+                    "dropping transcripts buffered on a closed loop", rows=len(self._buffer)
+                )
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:  # type: ignore[union-attr]
+            await self._flush_locked()
+
+
+async def _bulk_insert(s: AsyncSession, rows: list[dict]) -> None:
+    if s.get_bind().dialect.name == "postgresql":
+        # COPY is the cheapest bulk path on Postgres; asyncpg wants JSON as text.
+        conn = await s.connection()
+        raw = await conn.get_raw_connection()
+        records = [
+            tuple(orjson.dumps(r[c]).decode() if c == "meta" else r[c] for c in _COLUMNS)
+            for r in rows
+        ]
+        await raw.driver_connection.copy_records_to_table(
+            models.Transcript.__tablename__, records=records, columns=list(_COLUMNS)
+        )
+    else:
+        # executemany; SQLAlchemy batches it into multi-row VALUES on SQLite.
+        await s.execute(insert(models.Transcript), [{c: r[c] for c in _COLUMNS} for r in rows])
+
+
+sink = TranscriptSink(
+    settings.transcript_flush_rows, settings.transcript_flush_interval_seconds,
+    max_attempts=settings.transcript_max_attempts,
+    max_buffered=settings.transcript_max_buffered,
+)
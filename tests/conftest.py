@@ -4,6 +4,7 @@ import os
 import pytest
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from Adventorator.db import Base
+from Adventorator import db as dbmod, context_cache
 from typing import AsyncIterator  # <-- add this (or from collections.abc)
 
 @pytest.fixture(scope="session")
@@ -11,6 +12,8 @@ async def test_sessionmaker() -> AsyncIterator[async_sessionmaker[AsyncSession]]
     os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///./adventurator_test.sqlite3"
     engine = create_async_engine(os.environ["DATABASE_URL"], future=True, echo=False)
     async with engine.begin() as conn:
+        # The file outlives test runs; rebuild so schema changes are picked up.
+        await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
     try:
         yield async_sessionmaker(engine, expire_on_commit=False)
@@ -24,3 +27,19 @@ async def db(test_sessionmaker: async_sessionmaker[AsyncSession]) -> AsyncIterat
             yield s
         finally:
             await s.rollback()
+
+@pytest.fixture
+async def app_db(tmp_path, monkeypatch):
+    """A fresh SQLite file wired into Adventorator.db, for code that opens session_scope()."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.sqlite3'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(dbmod, "_engine", engine)
+    monkeypatch.setattr(dbmod, "_sessionmaker", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(dbmod, "_read_sessionmaker", None)
+    context_cache.clear()
+    try:
+        yield engine
+    finally:
+        context_cache.clear()
+        await engine.dispose()
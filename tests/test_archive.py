@@ -0,0 +1,106 @@
+# tests/test_archive.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from Adventorator import archive, locks, models, repos
+from Adventorator.db import session_scope
+from Adventorator.locks import LocalLocks, LockManager
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive.settings, "archive_path", str(tmp_path / "archive"))
+    monkeypatch.setattr(archive, "_store", None)
+    return archive.get_store()
+
+
+async def _seed(days_back: list[int]) -> int:
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1, name="Archive")
+        scene = await repos.ensure_scene(s, camp.id, 100)
+        s.add_all(
+            models.Transcript(
+                campaign_id=camp.id, scene_id=scene.id, channel_id=100, author="player",
+                author_ref="7" if i % 2 else "8", content=f"line {i}", meta={},
+                created_at=NOW - timedelta(days=d, seconds=-i),
+            )
+            for i, d in enumerate(days_back)
+        )
+    return scene.id
+
+
+async def test_archive_moves_old_rows_to_files(app_db, store):
+    # 6 rows older than 30 days, 4 recent ones.
+    scene_id = await _seed([200, 150, 100, 90, 60, 45, 10, 5, 2, 1])
+    moved = await archive.archive_once(store, timedelta(days=30), batch_rows=4, now=NOW)
+    assert moved == 6
+
+    async with session_scope() as s:
+        left = (await s.execute(select(func.count()).select_from(models.Transcript))).scalar_one()
+    assert left == 4
+    entries = store.entries()
+    assert sum(e.rows for e in entries) == 6 and len(entries) == 2
+    assert all(scene_id in e.scene_ids for e in entries)
+
+    # Running again is a no-op.
+    assert await archive.archive_once(store, timedelta(days=30), batch_rows=4, now=NOW) == 0
+
+
+async def test_history_merges_hot_and_archived(app_db, store):
+    scene_id = await _seed([200, 150, 100, 90, 60, 45, 10, 5, 2, 1])
+    await archive.archive_once(store, timedelta(days=30), batch_rows=4, now=NOW)
+
+    async with session_scope() as s:
+        latest = await repos.get_transcript_history(s, scene_id, limit=3)
+        assert [t.content for t in latest] == ["line 7", "line 8", "line 9"]
+
+        page = await repos.get_transcript_history(s, scene_id, limit=6)
+        assert [t.content for t in page] == [f"line {i}" for i in range(4, 10)]
+
+        older = await repos.get_transcript_history(s, scene_id, limit=3, before=page[0].cursor)
+        assert [t.content for t in older] == ["line 1", "line 2", "line 3"]
+
+        mine = await repos.get_transcript_history(s, scene_id, limit=10, user_id="7")
+        assert [t.content for t in mine] == [f"line {i}" for i in (1, 3, 5, 7, 9)]
+
+
+async def test_rows_archived_twice_are_deduped(app_db, store):
+    scene_id = await _seed([100, 90, 1])
+    async with session_scope() as s:
+        rows = [dict(r) async for r in repos.stream_transcripts(s, 1)]
+    # Simulate a crash after writing the file but before deleting the rows.
+    store.write_file("crash/rows.jsonl.gz", rows[:2])
+    await archive.archive_once(store, timedelta(days=30), now=NOW)
+
+    async with session_scope() as s:
+        history = await repos.get_transcript_history(s, scene_id, limit=10)
+    assert [t.content for t in history] == ["line 0", "line 1", "line 2"]
+
+
+async def test_one_archiver_per_interval_across_workers(store, monkeypatch):
+    monkeypatch.setattr(locks, "_manager", LockManager(LocalLocks()))
+    passes = []
+
+    async def fake_once(store, older_than, batch_rows, shard=None):
+        passes.append(shard)
+        await asyncio.sleep(0.05)
+        return 0
+
+    monkeypatch.setattr(archive, "archive_once", fake_once)
+    workers = [
+        asyncio.create_task(archive.run_forever(store, timedelta(days=90), 0.3, 100))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.2)
+    assert passes == [None]  # the other two found the lease taken
+    await asyncio.sleep(0.3)
+    assert len(passes) == 2  # ...and the next period gets one pass again
+    for w in workers:
+        w.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await locks.get_manager().close()
@@ -0,0 +1,119 @@
+# tests/test_audit.py
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import Adventorator.app as appmod
+from Adventorator import audit, metrics, repos
+from Adventorator.db import session_scope
+from Adventorator.rules.checks import CheckInput, compute_check
+from Adventorator.rules.dice import DiceRNG
+from Adventorator.rules.group import compute_checks
+from Adventorator.rules.streams import SceneRNG
+
+
+def _write_session(log: audit.AuditLog, seed: int = 99, scene: int = 5) -> None:
+    rng = SceneRNG(seed, scene)
+    log.roll(seed, scene, 0, rng.roll(0, "4d6kh3"))
+    log.roll(seed, scene, 1, rng.roll(1, "1d20+2", advantage=True), advantage=True)
+    ci = CheckInput("DEX", 15, proficient=True, dc=14, disadvantage=True)
+    r = rng.roll(2, "1d20", disadvantage=True)
+    log.check(seed, scene, 2, ci, compute_check(ci, r.rolls[:2]))
+    party = [CheckInput("WIS", 8 + 2 * i, expertise=i == 1, dc=12) for i in range(3)]
+    log.group(seed, scene, 3, party, compute_checks(party, rng.draws(3, 20, 6).reshape(3, 2)))
+    log.group(seed, scene, None, party, compute_checks(party), passive=True)
+    log.batch(seed, scene, 4, "8d6", 50, int(rng.batch(4).roll_n("8d6", 50).totals.sum()))
+
+
+def test_round_trip_and_filters(tmp_path):
+    log = audit.AuditLog(tmp_path, fsync_interval_ms=0)
+    _write_session(log)
+    _write_session(log, scene=6)
+    log.close()
+
+    recs = list(audit.read_records(tmp_path))
+    assert len(recs) == 2 * 10
+    first = recs[0]
+    assert (first.kind, first.expr, first.scene_id, first.index) == (audit.ROLL, "4d6kh3", 5, 0)
+    assert len(first.rolls) == 3 and len(first.dropped) == 1
+    assert first.total == sum(first.rolls) and first.seeded
+    check = recs[2]
+    assert check.check_input() == CheckInput("DEX", 15, proficient=True, dc=14, disadvantage=True)
+    assert check.pick == min(check.rolls) and check.mod == 4 and check.total == check.pick + 4
+    members = [r for r in recs[:10] if r.kind == audit.GROUP]
+    assert [r.position for r in members] == [0, 1, 2, 0, 1, 2]
+    assert members[1].flags & audit.EXPERTISE and members[4].rolls == [] and members[4].pick == 10
+    assert recs[9].kind == audit.BATCH and recs[9].count == 50
+
+    assert [r.kind for r in audit.read_records(tmp_path, kind=audit.CHECK)] == [audit.CHECK] * 2
+    assert {r.scene_id for r in audit.read_records(tmp_path, scene_id=6)} == {6}
+    later = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert list(audit.read_records(tmp_path, since=later)) == []
+
+
+def test_rotation_and_torn_tail(tmp_path):
+    log = audit.AuditLog(tmp_path, segment_bytes=4096)
+    rng = SceneRNG(1, 1)
+    for i in range(300):
+        log.roll(1, 1, i, rng.roll(i, "3d6"))
+    log.flush()
+    # no close(): the live segment still has its zero-filled tail, as after a crash
+    assert len(audit.segments(tmp_path)) > 5
+    assert [r.index for r in audit.read_records(tmp_path)] == list(range(300))
+    log.close()
+
+    # a half-written last record: CRC mismatch ends the segment there
+    last = audit.segments(tmp_path)[-1]
+    data = bytearray(last.read_bytes())
+    data[-3] ^= 0xFF
+    last.write_bytes(data)
+    assert [r.index for r in audit.read_records(tmp_path)] == list(range(299))
+
+
+def test_verify_replays_and_catches_tampering(tmp_path):
+    log = audit.AuditLog(tmp_path, fsync_interval_ms=0)
+    _write_session(log)
+    log.roll(None, 5, None, DiceRNG(seed=3).roll("2d6"))
+    log.close()
+
+    report = audit.verify(audit.read_records(tmp_path))
+    assert report.ok and report.checked == 10 and report.skipped == 1
+
+    # a record whose logged total doesn't follow from its seed
+    log = audit.AuditLog(tmp_path, fsync_interval_ms=0)
+    real = SceneRNG(99, 5).roll(7, "2d6")
+    log.roll(99, 5, 7, replace(real, total=real.total + 1))
+    log.close()
+    report = audit.verify(audit.read_records(tmp_path))
+    assert [r.index for r in report.failed] == [7]
+
+
+def test_unencodable_record_is_skipped_not_raised(tmp_path):
+    metrics.reset()
+    log = audit.AuditLog(tmp_path, fsync_interval_ms=0)
+    ci = CheckInput("DEX", 15, dc=40_000)  # past the record's int16 field
+    log.check(1, 5, 0, ci, compute_check(ci, [12]))
+    log.roll(1, 5, 1, SceneRNG(1, 5).roll(1, "1d20"))
+    log.close()
+    assert metrics.get_counter("audit.errors") == 1
+    assert [r.kind for r in audit.read_records(tmp_path)] == [audit.ROLL]
+
+
+async def test_check_options_are_range_checked_before_rolling(app_db, monkeypatch):
+    sent = []
+
+    async def _followup(app_id, token, content, ephemeral=False):
+        sent.append((content, ephemeral))
+
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        scene = await repos.ensure_scene(s, camp.id, 10)
+    ctx = appmod._Context(1, 10, 42, "Goose", camp.id, scene.id, camp.rng_seed)
+    inter = SimpleNamespace(application_id="app", token="t", data=SimpleNamespace(
+        name="check", options=[{"name": "dc", "type": 4, "value": 40_000}],
+    ))
+    await appmod._handle_command(inter, ctx)
+    assert sent == [("❌ dc must be between 1 and 99.", True)]
+    async with session_scope() as s:
+        assert await repos.next_roll_index(s, scene.id) == 0  # no stream index spent
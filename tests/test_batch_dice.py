@@ -0,0 +1,66 @@
+# tests/test_batch_dice.py
+import numpy as np
+import pytest
+
+from Adventorator.rules import odds
+from Adventorator.rules.batch import BatchRoller
+
+
+def test_same_seed_same_arrays():
+    a = BatchRoller(seed=42)
+    b = BatchRoller(seed=42)
+    for expr in ("100d6", "4d6kh3", "2d8+1d6+3", "3d6!", "2d6r<2", "4d6ro1", "3d6!kh2"):
+        assert np.array_equal(a.roll_n(expr, 500).totals, b.roll_n(expr, 500).totals)
+    assert a.roll("8d6") == b.roll("8d6")
+    assert [r.roll_n("1d20", 5).totals.tolist() for r in a.spawn(2)] == \
+        [r.roll_n("1d20", 5).totals.tolist() for r in b.spawn(2)]
+
+
+def test_ranges_and_stats():
+    r = BatchRoller(seed=1)
+    t = r.roll_n("2d6+3", 50_000).totals
+    assert t.min() >= 5 and t.max() <= 15
+    s = r.roll_n("2d6+3", 50_000).stats()
+    assert s["n"] == 50_000 and abs(s["mean"] - 10) < 0.1 and s["p50"] == 10
+    assert abs(r.roll_n("4d6kh3", 50_000).stats()["mean"] - 12.24) < 0.1
+    assert r.roll_n("1d6r<2", 1000).totals.min() >= 3
+    assert abs(r.roll_n("1d6!", 50_000).stats()["mean"] - 4.2) < 0.1  # 3.5 * 6/5
+    assert r.roll_n("1d6-1d6", 1000).totals.min() >= -5
+
+
+def test_roll_many_keeps_order():
+    r = BatchRoller(seed=3)
+    out = r.roll_many(["1d4", "100d1", "1d4", "50"  + "+1d1"])
+    assert out.shape == (4,) and out[1] == 100 and out[3] == 51
+    assert 1 <= out[0] <= 4 and 1 <= out[2] <= 4
+
+
+def test_limits():
+    r = BatchRoller(seed=0)
+    with pytest.raises(ValueError):
+        r.roll_n("1d6", 0)
+    with pytest.raises(ValueError):
+        r.roll_n("100d6", 1_000_000)
+    with pytest.raises(ValueError):
+        r.roll_n("1d6x", 10)
+    with pytest.raises(ValueError):
+        r.roll_n("100d6!kh50", 1000)  # explode + keep rolls per repetition: capped lower
+    assert r.roll_n("10d6!kh5", 1000).totals.size == 1000
+
+
+@pytest.mark.parametrize("expr", ["1d6r2", "1d6r<2", "2d6r6", "1d6ro6"])
+def test_rerolls_match_exact_odds(expr):
+    totals = BatchRoller(seed=5).roll_n(expr, 60_000).totals
+    dist = odds.distribution(expr)
+    values, counts = np.unique(totals, return_counts=True)
+    assert dist.min <= values.min() and values.max() <= dist.max
+    for v, c in zip(values, counts, strict=True):
+        assert abs(c / totals.size - dist.prob(int(v))) < 0.01, (expr, v)
+
+
+def test_reroll_faces_beyond_the_die_are_rejected():
+    for expr in ("1d6r8", "1d6r20", "1d6ro7", "1d6r0"):
+        with pytest.raises(ValueError):
+            BatchRoller(seed=0).roll_n(expr, 10)
+        with pytest.raises(ValueError):
+            odds.distribution(expr)
@@ -0,0 +1,65 @@
+# tests/test_character_view.py
+import pytest
+from sqlalchemy import select
+
+from Adventorator import context_cache, models, repos
+from Adventorator.db import session_scope
+from Adventorator.rules.character import SKILLS, CharacterView
+from Adventorator.schemas import CharacterSheet
+
+SHEET = {
+    "name": "Aria", "class": "Rogue", "level": 3,
+    "abilities": {"STR": 8, "DEX": 16, "CON": 12, "INT": 13, "WIS": 10, "CHA": 14},
+    "proficiency_bonus": 2,
+    "skills": {"Stealth": True, "sleight-of-hand": True, "athletics": False},
+    "ac": 14, "hp": {"current": 11, "max": 18, "temp": 0}, "speed": 30,
+}
+
+
+def test_view_fields_and_summary():
+    v = CharacterView.from_dict(SHEET)
+    assert v.score("dex") == 16 and v.mod("DEX") == 3 and v.mod("STR") == -1
+    assert v.proficient_in("stealth") and v.proficient_in("Sleight of Hand")
+    assert not v.proficient_in("athletics") and not v.proficient_in("arcana")
+    assert len(SKILLS) == 18
+    assert v.summary == (
+        "**Aria** — Rogue 3\n"
+        "AC 14 | HP 11/18 | STR 8 DEX 16 CON 12 INT 13 WIS 10 CHA 14"
+    )
+
+
+def test_check_input_from_sheet():
+    v = CharacterView.from_dict(SHEET)
+    ci = v.check_input(skill="stealth", dc=12, advantage=True)
+    assert (ci.ability, ci.score, ci.proficient, ci.proficiency_bonus, ci.dc, ci.advantage) == (
+        "DEX", 16, True, 2, 12, True
+    )
+    ci = v.check_input("str", "athletics")
+    assert (ci.ability, ci.score, ci.proficient) == ("STR", 8, False)
+    ci = v.check_input("cha")
+    assert (ci.ability, ci.score, ci.proficient) == ("CHA", 14, False)
+    with pytest.raises(ValueError):
+        v.check_input(skill="basket weaving")
+    with pytest.raises(ValueError):
+        v.check_input("LUCK")
+
+
+async def test_cached_view_follows_updates(app_db):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        await repos.upsert_character(s, camp.id, None, CharacterSheet.model_validate(SHEET))
+
+    async with session_scope(readonly=True) as s:
+        first = await repos.get_character_view(s, camp.id, "Aria")
+        again = await repos.get_character_view(s, camp.id, "Aria")
+        assert await repos.get_character_view(s, camp.id, "Nobody") is None
+    assert first is again
+    assert context_cache.character_views.stats()["hits"] >= 1
+
+    async with session_scope() as s:
+        sheet = CharacterSheet.model_validate({**SHEET, "ac": 16})
+        await repos.upsert_character(s, camp.id, None, sheet)
+    async with session_scope(readonly=True) as s:
+        fresh = await repos.get_character_view(s, camp.id, "Aria")
+        stored = (await s.execute(select(models.Character.updated_at))).scalar_one()
+    assert fresh is not first and fresh.ac == 16 and fresh.updated_at == stored
@@ -0,0 +1,151 @@
+# tests/test_combat.py
+import random
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+import Adventorator.app as appmod
+from Adventorator import models, repos
+from Adventorator.combat import Combatant, CombatEngine, TurnError, TurnWriter
+from Adventorator.db import session_scope
+from Adventorator.timerwheel import TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def test_timer_wheel_fires_on_time():
+    rnd = random.Random(7)
+    wheel = TimerWheel(slots=8, levels=3)
+    pending = {}
+    for step in range(5000):
+        if rnd.random() < 0.4:
+            deadline = wheel.now + rnd.choice([0, 1, 7, 8, 9, 64, 65, 511, 512, 600, 9000])
+            pending[step] = (deadline, wheel.schedule(deadline, step))
+        elif rnd.random() < 0.2 and pending:
+            wheel.cancel(pending.pop(rnd.choice(list(pending)))[1])
+        else:
+            to = wheel.now + rnd.choice([1, 1, 3, 50, 700])
+            fired = wheel.advance(to)
+            assert [pending[k][0] for k in fired] == sorted(pending[k][0] for k in fired)
+            for k in fired:
+                assert pending.pop(k)[0] <= to
+            assert all(d > to for d, _ in pending.values())
+    assert len(wheel) == len(pending)
+
+
+def _party() -> list[Combatant]:
+    # Bram and Cyra tie on 15; Bram's DEX wins. Dag ties Cyra on DEX too, but joined later.
+    return [Combatant("Aria", 18, 3, 0), Combatant("Cyra", 15, 1, 1), Combatant("Bram", 15, 2, 2),
+            Combatant("Dag", 9, 1, 3)]
+
+
+def test_initiative_order_rounds_and_mid_round_changes():
+    eng = CombatEngine(turn_timeout=0, clock=Clock())
+    turn = eng.start(1, _party())
+    seen = [turn.actor_ref]
+    for _ in range(7):
+        seen.append(eng.end_turn(1).actor_ref)
+    assert seen == ["Aria", "Bram", "Cyra", "Dag"] * 2
+    assert eng.current(1).round == 2 and eng.current(1).turn_no == 8
+
+    assert eng.end_turn(1).actor_ref == "Aria"  # round 3
+    eng.add(1, Combatant("Eel", 12, 0, 4))   # still ahead this round
+    eng.add(1, Combatant("Fox", 20, 0, 5))   # already passed: next round
+    with pytest.raises(TurnError):
+        eng.end_turn(1, "Cyra")               # strict order
+    order = [eng.end_turn(1, eng.current(1).actor_ref).actor_ref for _ in range(6)]
+    assert order == ["Bram", "Cyra", "Eel", "Dag", "Fox", "Aria"]
+    assert eng.current(1).round == 4
+    assert eng.remove(1, "Cyra") is None
+    assert eng.end_turn(1).actor_ref == "Bram"
+    assert eng.remove(1, "Bram").actor_ref == "Eel"  # was Bram's turn
+    eng.end(1)
+    with pytest.raises(TurnError):
+        eng.end_turn(1)
+
+
+def test_timeouts_auto_dodge_and_skip_stale_timers():
+    clock = Clock()
+    eng = CombatEngine(turn_timeout=30, tick_ms=100, clock=clock)
+    for scene in range(200):
+        eng.start(scene, _party())
+    clock.t += 10
+    eng.end_turn(5)            # scene 5 moved on: its first deadline is void, Bram's is 10s later
+    clock.t += 19.9
+    assert eng.tick() == []
+    clock.t += 0.2
+    expired = eng.tick()
+    assert len(expired) == 199
+    enc, ended = next(e for e in expired if e[0].scene_id == 0)
+    assert (ended.turn.actor_ref, ended.outcome, ended.next.actor_ref) == ("Aria", "dodge", "Bram")
+    assert enc.dodging == {"Aria"}
+    clock.t += 10
+    expired = eng.tick()
+    assert [e.scene_id for e, _ in expired] == [5]
+    assert len(eng.wheel) == 200
+
+
+async def test_turns_written_behind_and_restored(app_db):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 42)
+        scene = await repos.ensure_scene(s, camp.id, 4200)
+        await repos.set_combatants(s, scene.id, [c.row() for c in _party()])
+        await repos.set_scene_mode(s, 4200, "combat")
+
+    clock = Clock()
+    writer = TurnWriter(flush_interval=60)
+    eng = CombatEngine(turn_timeout=30, clock=clock, writer=writer)
+    eng.start(scene.id, _party(), guild_id=42, campaign_id=camp.id, channel_id=4200)
+    for _ in range(5):
+        eng.end_turn(scene.id)
+    assert len(writer) == 6  # start and end of a turn coalesce into one row
+    assert await writer.flush() == 6
+    eng.end_turn(scene.id)  # Bram's turn (round 2) ended, Cyra's starts
+    await writer.close()
+
+    async with session_scope(readonly=True) as s:
+        rows = (await s.execute(select(models.Turn).order_by(models.Turn.turn_no))).scalars().all()
+    assert [r.actor_ref for r in rows] == ["Aria", "Bram", "Cyra", "Dag", "Aria", "Bram", "Cyra"]
+    assert [r.outcome for r in rows] == ["acted"] * 6 + [None]
+    assert rows[-1].ended_at is None and rows[-1].round == 2
+
+    # "restart": a new engine picks the fight up mid-turn, with the original deadline
+    clock.t += 10
+    fresh = CombatEngine(turn_timeout=30, clock=clock, writer=TurnWriter(flush_interval=60))
+    assert await fresh.restore() == 1
+    cur = fresh.current(scene.id)
+    assert (cur.actor_ref, cur.round, cur.turn_no) == ("Cyra", 2, 7)
+    assert abs((cur.deadline - datetime.now(timezone.utc)).total_seconds() - 30) < 5
+    assert [fresh.end_turn(scene.id).actor_ref for _ in range(3)] == ["Dag", "Aria", "Bram"]
+    assert fresh.current(scene.id).round == 3
+    await fresh.writer.close()
+
+
+async def test_shutdown_runs_every_step_past_a_failed_turn_flush(monkeypatch):
+    ran = []
+
+    def step(name, fail=False):
+        async def run(*_args):
+            ran.append(name)
+            if fail:
+                raise RuntimeError("turn flush failed")
+        return run
+
+    monkeypatch.setattr(appmod, "_archiver", None)
+    monkeypatch.setattr(appmod, "llm_client", None)
+    monkeypatch.setattr(appmod.executor, "drain", step("drain"))
+    monkeypatch.setattr(appmod.combat.engine, "close", step("combat", fail=True))
+    monkeypatch.setattr(appmod.transcript_sink, "close", step("transcripts"))
+    monkeypatch.setattr(appmod, "close_discord_client", step("discord"))
+    monkeypatch.setattr(appmod.audit, "close_log", lambda: ran.append("audit"))
+    monkeypatch.setattr(appmod.locks, "close_manager", step("locks"))
+    monkeypatch.setattr(appmod, "dispose_engines", step("db"))
+    await appmod.shutdown_event()
+    assert ran == ["drain", "combat", "transcripts", "discord", "audit", "locks", "db"]
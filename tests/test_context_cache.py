@@ -0,0 +1,62 @@
+# tests/test_context_cache.py
+import pytest
+from sqlalchemy import event
+
+from Adventorator import context_cache, repos
+from Adventorator.db import session_scope
+
+
+def _count_selects(engine):
+    seen = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _on_exec(conn, cursor, statement, params, context, executemany):
+        seen.append(statement)
+
+    return seen
+
+
+async def test_second_resolution_hits_cache(app_db):
+    async with session_scope() as s:
+        camp = await repos.resolve_campaign(s, 555)
+        scene = await repos.resolve_scene(s, camp.id, 777)
+        player = await repos.resolve_player(s, 42, "Goose")
+
+    statements = _count_selects(app_db)
+    async with session_scope() as s:
+        assert await repos.resolve_campaign(s, 555) == camp
+        assert await repos.resolve_scene(s, camp.id, 777) == scene
+        assert await repos.resolve_player(s, 42, "Goose") == player
+
+    assert not [q for q in statements if q.lstrip().upper().startswith("SELECT")]
+    st = context_cache.stats()
+    assert st["campaign"]["hits"] == 1 and st["scene"]["hits"] == 1 and st["player"]["hits"] == 1
+
+
+async def test_rolled_back_rows_are_not_cached(app_db):
+    with pytest.raises(RuntimeError):
+        async with session_scope() as s:
+            await repos.resolve_campaign(s, 999)
+            raise RuntimeError("boom")
+    assert context_cache.campaigns.get(999) is None
+
+    async with session_scope() as s:
+        camp = await repos.resolve_campaign(s, 999)
+    assert context_cache.campaigns.get(999) == camp
+
+
+async def test_scene_mode_change_invalidates(app_db):
+    async with session_scope() as s:
+        camp = await repos.resolve_campaign(s, 1)
+        scene = await repos.resolve_scene(s, camp.id, 10)
+    assert scene.mode == "exploration"
+
+    async with session_scope() as s:
+        await repos.set_scene_mode(s, 10, "combat")
+    async with session_scope() as s:
+        assert (await repos.resolve_scene(s, camp.id, 10)).mode == "combat"
+
+    async with session_scope() as s:
+        await repos.deactivate_scene(s, 10)
+    async with session_scope() as s:
+        assert (await repos.resolve_scene(s, camp.id, 10)).is_active is False
@@ -13,3 +13,53 @@ def test_parse_and_mod():
     rng = DiceRNG(seed=1)
     res = rng.roll("2d6+3")
     assert res.sides == 6 and res.count == 2 and res.modifier == 3
+
+def test_plain_rolls_draw_like_randint():
+    import random
+    ref = random.Random(7)
+    rng = DiceRNG(seed=7)
+    for expr in ["1d20", "2d6+3", "3d8-1", "d12", "1d20", "4d4"]:
+        res = rng.roll(expr)
+        count, sides = res.count, res.sides
+        assert res.rolls == [ref.randint(1, sides) for _ in range(count)]
+    res = rng.roll("1d20+5", advantage=True)
+    assert res.rolls[:2] == [ref.randint(1, 20), ref.randint(1, 20)]
+    assert res.total == res.rolls[2] + 5
+
+def test_expression_grammar():
+    from Adventorator.rules.dice import compile_expr
+    rng = DiceRNG(seed=3)
+    res = rng.roll("4d6kh3")
+    assert len(res.rolls) == 3 and len(res.dropped) == 1
+    assert min(res.rolls) >= res.dropped[0] and res.total == sum(res.rolls)
+    res = rng.roll("2d20kl1")
+    assert res.rolls == [min(res.rolls + res.dropped)]
+    res = rng.roll("4d6dl1")
+    assert len(res.rolls) == 3 and res.dropped[0] <= min(res.rolls)
+    res = rng.roll("2d8 + 1d6 + 3")
+    assert len(res.rolls) == 3 and res.total == sum(res.rolls) + 3 and res.modifier == 3
+    res = rng.roll("1d6-1d4")
+    assert res.total == res.rolls[0] - res.rolls[1]
+    assert all(r >= 3 for r in rng.roll("50d6r<2").rolls)
+    exploded = [rng.roll("1d2!").rolls for _ in range(50)]
+    assert any(len(r) > 1 for r in exploded) and all(r[-1] == 1 for r in exploded)
+    assert rng.roll("d%").sides == 100
+    assert compile_expr("2D6 + 3") is compile_expr("2D6 + 3")
+
+def test_bad_expressions():
+    import pytest
+    rng = DiceRNG(seed=1)
+    for bad in [
+        "", "5", "d", "2d6+", "2d6++3", "2d6x", "0d6", "1000d6", "1d6r<6", "1d1!", "2d6kh2kz",
+        "+".join(["1d4"] * 21),
+    ]:
+        with pytest.raises(ValueError):
+            rng.roll(bad)
+
+def test_rerolls_and_explosions_are_capped():
+    import pytest
+    rng = DiceRNG(seed=1)
+    with pytest.raises(ValueError, match="more than"):
+        rng.roll("+".join(["100d1000!r<999"] * 20))
+    # Plain dice up to the limits still roll.
+    assert len(rng.roll("+".join(["100d6"] * 20)).rolls) == 2000
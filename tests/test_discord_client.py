@@ -0,0 +1,158 @@
+# tests/test_discord_client.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import Adventorator.responder as respmod
+from Adventorator.responder import DiscordClient
+
+
+class _FakeWebhook(BaseHTTPRequestHandler):
+    """Scripted Discord webhook: pops one (status, headers, body) per request."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        srv = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        srv.seen.append((self.path, body, self.client_address[1], time.monotonic()))
+        status, headers, payload = srv.script.pop(0) if srv.script else (200, {}, {"id": "1"})
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PATCH(self):
+        self.do_POST()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeWebhook)
+    srv.seen, srv.script = [], []
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _client(srv, **kw):
+    base_url = f"http://127.0.0.1:{srv.server_address[1]}"
+    return DiscordClient(base_url=base_url, backoff_base=0.01, **kw)
+
+
+async def test_followups_reuse_one_connection(webhook_server, monkeypatch):
+    dc = _client(webhook_server)
+    monkeypatch.setattr(respmod, "_discord", dc)
+    for i in range(3):
+        await respmod.followup_message("app", "tok", f"msg {i}", ephemeral=(i == 0))
+    await dc.close()
+
+    seen = webhook_server.seen
+    assert [b["content"] for _, b, _, _ in seen] == ["msg 0", "msg 1", "msg 2"]
+    assert seen[0][1]["flags"] == 64
+    assert len({port for _, _, port, _ in seen}) == 1  # pooled keep-alive connection
+
+
+async def test_429_is_retried_after_retry_after(webhook_server):
+    webhook_server.script = [
+        (429, {"X-RateLimit-Scope": "user"}, {"retry_after": 0.1, "global": False}),
+    ]
+    dc = _client(webhook_server)
+    r = await dc.request("POST", "/webhooks/app/tok", json={"content": "hi"})
+    await dc.close()
+    assert r.status_code == 200
+    (_, _, _, t1), (_, _, _, t2) = webhook_server.seen
+    assert t2 - t1 >= 0.09
+
+
+async def test_5xx_retried_then_gives_up(webhook_server):
+    webhook_server.script = [(502, {}, {}), (200, {}, {"id": "2"})]
+    dc = _client(webhook_server)
+    r = await dc.request("POST", "/webhooks/app/tok", json={"content": "hi"})
+    assert r.json() == {"id": "2"}
+
+    webhook_server.script = [(500, {}, {})] * 3
+    dc.max_retries = 2
+    with pytest.raises(httpx.HTTPStatusError):
+        await dc.request("POST", "/webhooks/app/tok", json={"content": "hi"})
+    await dc.close()
+
+
+async def test_exhausted_bucket_waits_for_reset(webhook_server):
+    limits = {
+        "X-RateLimit-Bucket": "abc",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset-After": "0.15",
+    }
+    webhook_server.script = [(200, limits, {"id": "1"})]
+    dc = _client(webhook_server)
+    await dc.request("POST", "/webhooks/app/tok", json={"content": "a"})
+    # A different webhook has its own bucket and goes straight through.
+    await dc.request("POST", "/webhooks/app/other", json={"content": "b"})
+    # Same route + webhook: queued until the bucket resets.
+    await dc.request("POST", "/webhooks/app/tok", json={"content": "c"})
+    await dc.close()
+
+    t_a, t_b, t_c = [t for _, _, _, t in webhook_server.seen]
+    assert t_b - t_a < 0.1
+    assert t_c - t_a >= 0.14
+
+
+async def test_buckets_keyed_without_tokens_and_pruned(webhook_server):
+    limits = {"X-RateLimit-Bucket": "abc", "X-RateLimit-Remaining": "4"}
+    webhook_server.script = [(200, limits, {"id": str(i)}) for i in range(3)]
+    dc = _client(webhook_server)
+    for tok in ("t1", "t2", "t3"):
+        await dc.request("POST", f"/webhooks/app/{tok}", json={"content": tok})
+    assert dc._route_buckets == {"POST /webhooks/app/:token": "abc"}
+    # one per interaction webhook, as Discord limits them
+    assert len({id(b) for b in dc._buckets.values()}) == 3
+    dc._pruned_at = float("-inf")
+    await dc.request("POST", "/webhooks/app/t4", json={"content": "t4"})
+    assert list(dc._buckets) == ["abc:webhooks/app/t4"]
+    await dc.close()
+
+
+async def _scripted(dc: DiscordClient, errors: list[Exception]) -> list[httpx.Request]:
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        if errors:
+            raise errors.pop(0)
+        return httpx.Response(200, json={"id": "1"})
+
+    dc._http()  # bind to this loop, then swap the transport
+    await dc._client.aclose()
+    dc._client = httpx.AsyncClient(base_url=dc.base_url, transport=httpx.MockTransport(handler))
+    return sent
+
+
+async def test_post_only_retried_when_never_sent():
+    dc = DiscordClient(base_url="http://discord.test", backoff_base=0.01)
+    sent = await _scripted(dc, [httpx.ConnectError("refused")])
+    await dc.request("POST", "/webhooks/app/tok", json={"content": "hi"})
+    assert len(sent) == 2
+
+    sent = await _scripted(dc, [httpx.ReadTimeout("slow")])
+    with pytest.raises(httpx.ReadTimeout):
+        await dc.request("POST", "/webhooks/app/tok", json={"content": "hi"})
+    assert len(sent) == 1  # may have been posted: never sent twice
+
+    sent = await _scripted(dc, [httpx.ReadTimeout("slow")])
+    await dc.request("PATCH", "/webhooks/app/tok/messages/1", json={"content": "edit"})
+    assert len(sent) == 2  # edits are idempotent
+    await dc.close()
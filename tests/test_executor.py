@@ -0,0 +1,89 @@
+# tests/test_executor.py
+import asyncio
+
+from Adventorator import metrics
+from Adventorator.executor import DispatchExecutor
+
+
+async def test_per_command_limit_is_respected():
+    ex = DispatchExecutor(workers=4, queue_size=20, limits={"ooc": 1})
+    active = {"ooc": 0, "roll": 0}
+    peak = {"ooc": 0, "roll": 0}
+    done = []
+
+    def job(name):
+        async def run():
+            active[name] += 1
+            peak[name] = max(peak[name], active[name])
+            await asyncio.sleep(0.01)
+            active[name] -= 1
+            done.append(name)
+        return run
+
+    for _ in range(4):
+        assert ex.submit("ooc", job("ooc"))
+    for _ in range(4):
+        assert ex.submit("roll", job("roll"))
+
+    assert await ex.drain(timeout=5)
+    assert sorted(done) == ["ooc"] * 4 + ["roll"] * 4
+    assert peak["ooc"] == 1
+    assert peak["roll"] > 1  # limited commands don't starve the others
+
+
+async def test_bounded_queue_rejects_and_drain_finishes_inflight():
+    metrics.reset()
+    ex = DispatchExecutor(workers=1, queue_size=2)
+    gate = asyncio.Event()
+    finished = []
+
+    async def slow():
+        await gate.wait()
+        finished.append(1)
+
+    assert ex.submit("ooc", slow)
+    await asyncio.sleep(0)  # worker picks up the first job
+    assert ex.submit("ooc", slow)
+    assert ex.submit("ooc", slow)
+    assert not ex.submit("ooc", slow)  # queue full -> backpressure
+    assert metrics.get_counter("dispatch.rejected") == 1
+
+    asyncio.get_running_loop().call_later(0.02, gate.set)
+    assert await ex.drain(timeout=5)
+    assert len(finished) == 3
+    assert metrics.get_histogram("dispatch.wait_ms").count == 3
+    assert not ex.submit("ooc", slow)  # closed after drain
+
+
+async def test_queue_size_bounds_parked_jobs():
+    ex = DispatchExecutor(workers=8, queue_size=10, limits={"ooc": 2})
+    gate = asyncio.Event()
+
+    async def slow():
+        await gate.wait()
+
+    accepted = 0
+    for _ in range(500):
+        accepted += ex.submit("ooc", slow)
+        await asyncio.sleep(0)  # let workers pull (and park) what they can
+    assert ex.depth <= 10
+    assert accepted == 2 + 10  # two running, the rest waiting
+
+    gate.set()
+    assert await ex.drain(timeout=5)
+
+
+async def test_failing_job_does_not_kill_worker():
+    ex = DispatchExecutor(workers=1, queue_size=5)
+    ran = []
+
+    async def boom():
+        raise RuntimeError("nope")
+
+    async def ok():
+        ran.append(True)
+
+    ex.submit("roll", boom)
+    ex.submit("roll", ok)
+    assert await ex.drain(timeout=5)
+    assert ran == [True]
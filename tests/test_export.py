@@ -0,0 +1,96 @@
+# tests/test_export.py
+import gzip
+
+import httpx
+import orjson
+
+import Adventorator.app as appmod
+from Adventorator import export, models, repos
+from Adventorator.db import session_scope
+
+TOKEN = "s3cret"
+
+
+async def _seed(n: int) -> tuple[int, int]:
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1, name="Export")
+        scene = await repos.ensure_scene(s, camp.id, 100)
+        other = await repos.ensure_scene(s, camp.id, 200)
+        s.add_all(
+            models.Transcript(
+                campaign_id=camp.id, scene_id=scene.id if i % 2 else other.id, channel_id=100,
+                author="player", author_ref="7", content=f"line {i}", meta={"i": i},
+            )
+            for i in range(n)
+        )
+    return camp.id, scene.id
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=appmod.app), base_url="http://test")
+
+
+async def test_stream_transcripts_in_order(app_db):
+    camp_id, _ = await _seed(25)
+    async with session_scope() as s:
+        rows = [r async for r in repos.stream_transcripts(s, camp_id, batch_size=4)]
+    assert [r["content"] for r in rows] == [f"line {i}" for i in range(25)]
+    assert rows[0]["meta"] == {"i": 0}
+
+
+async def test_export_endpoint_ndjson(app_db, monkeypatch):
+    monkeypatch.setattr(appmod.settings, "export_token", TOKEN)
+    camp_id, scene_id = await _seed(10)
+    async with _client() as c:
+        r = await c.get(
+            f"/campaigns/{camp_id}/transcripts/export", headers={"Authorization": f"Bearer {TOKEN}"}
+        )
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/x-ndjson"
+        lines = [orjson.loads(line) for line in r.content.splitlines()]
+        assert len(lines) == 10 and lines[3]["content"] == "line 3"
+
+        r = await c.get(
+            f"/campaigns/{camp_id}/transcripts/export",
+            params={"scene_id": scene_id}, headers={"Authorization": f"Bearer {TOKEN}"},
+        )
+        contents = [orjson.loads(line)["content"] for line in r.content.splitlines()]
+        assert contents == [f"line {i}" for i in range(1, 10, 2)]
+
+
+async def test_export_endpoint_gzip(app_db, monkeypatch):
+    monkeypatch.setattr(appmod.settings, "export_token", TOKEN)
+    camp_id, _ = await _seed(5)
+    async with _client() as c:
+        async with c.stream(
+            "GET", f"/campaigns/{camp_id}/transcripts/export",
+            params={"compression": "gzip"}, headers={"Authorization": f"Bearer {TOKEN}"},
+        ) as r:
+            assert r.headers["content-encoding"] == "gzip"
+            raw = b"".join([chunk async for chunk in r.aiter_raw()])
+    assert len(gzip.decompress(raw).splitlines()) == 5
+
+
+async def test_export_endpoint_guarded(app_db, monkeypatch):
+    async with _client() as c:
+        monkeypatch.setattr(appmod.settings, "export_token", None)
+        assert (await c.get("/campaigns/1/transcripts/export")).status_code == 404
+        monkeypatch.setattr(appmod.settings, "export_token", TOKEN)
+        r = await c.get(
+            "/campaigns/1/transcripts/export", headers={"Authorization": "Bearer nope"}
+        )
+        assert r.status_code == 401
+        r = await c.get(
+            "/campaigns/1/transcripts/export",
+            params={"compression": "lz4"}, headers={"Authorization": f"Bearer {TOKEN}"},
+        )
+        assert r.status_code == 400
+
+
+async def test_ndjson_chunks_batch_output():
+    async def rows():
+        for i in range(1000):
+            yield {"i": i}
+    chunks = [c async for c in export.ndjson_chunks(rows(), chunk_bytes=1024)]
+    assert len(chunks) > 1
+    assert b"".join(chunks).count(b"\n") == 1000
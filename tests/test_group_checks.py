@@ -0,0 +1,60 @@
+# tests/test_group_checks.py
+import numpy as np
+
+from Adventorator import repos
+from Adventorator.db import session_scope
+from Adventorator.rules.checks import CheckInput, compute_check
+from Adventorator.rules.group import compute_checks
+from Adventorator.schemas import CharacterSheet
+
+
+def _inputs():
+    return [
+        CheckInput("DEX", 16, proficient=True, dc=15),
+        CheckInput("DEX", 8, dc=15, advantage=True),
+        CheckInput("WIS", 12, expertise=True, proficiency_bonus=3, dc=12, disadvantage=True),
+        CheckInput("STR", 10, dc=10, advantage=True, disadvantage=True),
+        CheckInput("CHA", 14),
+    ]
+
+
+def test_matches_compute_check_row_by_row():
+    inputs = _inputs()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        d20 = rng.integers(1, 21, size=(len(inputs), 2))
+        res = compute_checks(inputs, d20)
+        for i, inp in enumerate(inputs):
+            rolls = d20[i].tolist() if inp.advantage or inp.disadvantage else d20[i, :1].tolist()
+            one = compute_check(inp, rolls)
+            assert (res.pick[i], res.mod[i], res.total[i]) == (one.pick, one.mod, one.total)
+            assert bool(res.success[i]) == bool(one.success)
+
+
+def test_group_outcome_and_passive():
+    inputs = [CheckInput("DEX", 10, dc=11)] * 4
+    # half is enough
+    assert compute_checks(inputs, [[11, 1], [11, 1], [2, 1], [3, 1]]).group_success
+    assert not compute_checks(inputs, [[11, 1], [2, 1], [2, 1], [3, 1]]).group_success
+    res = compute_checks(_inputs())
+    assert res.pick.tolist() == [10, 15, 5, 15, 10]
+    assert res.total.tolist() == [15, 14, 12, 15, 12]
+    assert res.success.tolist() == [True, False, True, True, False]
+
+
+async def test_party_views(app_db):
+    base = {
+        "class": "Rogue", "level": 3,
+        "abilities": {"STR": 8, "DEX": 16, "CON": 12, "INT": 13, "WIS": 10, "CHA": 14},
+        "proficiency_bonus": 2, "ac": 14, "speed": 30,
+    }
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        for name in ("Cid", "Aria", "Bo"):
+            sheet = CharacterSheet.model_validate({**base, "name": name})
+            await repos.upsert_character(s, camp.id, None, sheet)
+    async with session_scope(readonly=True) as s:
+        everyone = await repos.get_character_views(s, camp.id)
+        again = await repos.get_character_views(s, camp.id, ["Bo", "Aria", "Nobody"])
+    assert [v.name for v in everyone] == ["Aria", "Bo", "Cid"]
+    assert [v.name for v in again] == ["Aria", "Bo"] and again[0] is everyone[0]
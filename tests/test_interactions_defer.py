@@ -19,7 +19,7 @@ def test_slash_command_defers(monkeypatch):
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-    monkeypatch.setattr(appmod, "session_scope", lambda: _DummyAsyncCM())
+    monkeypatch.setattr(appmod, "session_scope", lambda **kw: _DummyAsyncCM())
 
     # 2) Stub the repo functions used in interactions() before deferring
     async def _noop_campaign(*args, **kwargs):
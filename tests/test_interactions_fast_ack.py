@@ -0,0 +1,90 @@
+# tests/test_interactions_fast_ack.py
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import Adventorator.app as appmod
+from Adventorator import metrics
+from Adventorator.app import app
+from Adventorator.discord_schemas import Interaction
+
+client = TestClient(app)
+
+HEADERS = {"X-Signature-Ed25519": "00", "X-Signature-Timestamp": "0"}
+
+
+def _no_db():
+    raise AssertionError("ack path must not open a DB session")
+
+
+def test_ack_does_no_db_io(monkeypatch):
+    monkeypatch.setattr(appmod, "verify_ed25519", lambda *a, **k: True)
+    monkeypatch.setattr(appmod, "session_scope", _no_db)
+    dispatched = []
+    monkeypatch.setattr(
+        appmod.executor, "submit", lambda name, factory: dispatched.append(name) or True
+    )
+    metrics.reset()
+
+    body = {"type": 2, "id": "1", "token": "tok", "application_id": "app", "data": {"name": "roll"}}
+    r = client.post("/interactions", content=json.dumps(body).encode(), headers=HEADERS)
+    assert r.json() == {"type": 5}
+    ping = {"type": 1, "id": "2", "token": "tok", "application_id": "app"}
+    r = client.post("/interactions", content=json.dumps(ping).encode(), headers=HEADERS)
+    assert r.json() == {"type": 1}
+
+    h = metrics.get_histogram("interactions.ack_ms")
+    assert h is not None and h.count == 2
+    assert h.fraction_at_or_below(1500) == 1.0
+    assert dispatched == ["roll"]
+
+
+def test_full_executor_replies_busy(monkeypatch):
+    monkeypatch.setattr(appmod, "verify_ed25519", lambda *a, **k: True)
+    monkeypatch.setattr(appmod.executor, "submit", lambda name, factory: False)
+    body = {"type": 2, "id": "1", "token": "tok", "application_id": "app", "data": {"name": "ooc"}}
+    r = client.post("/interactions", content=json.dumps(body).encode(), headers=HEADERS)
+    assert r.json()["type"] == 4
+    assert r.json()["data"]["flags"] == 64
+
+
+async def test_dispatch_resolves_context_in_worker(monkeypatch):
+    calls = []
+
+    class _DummyAsyncCM:
+        async def __aenter__(self):
+            return SimpleNamespace()
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    async def _campaign(s, guild_id, name="Default"):
+        calls.append(("campaign", guild_id))
+        return SimpleNamespace(id=7, rng_seed=1234)
+
+    async def _scene(s, campaign_id, channel_id):
+        calls.append(("scene", campaign_id, channel_id))
+        return SimpleNamespace(id=9)
+
+    seen = {}
+
+    async def _handle(inter, ctx):
+        seen["ctx"] = ctx
+
+    monkeypatch.setattr(appmod, "session_scope", lambda **kw: _DummyAsyncCM())
+    monkeypatch.setattr(appmod.repos, "resolve_campaign", _campaign)
+    monkeypatch.setattr(appmod.repos, "resolve_scene", _scene)
+    monkeypatch.setattr(appmod, "_handle_command", _handle)
+
+    inter = Interaction.model_validate({
+        "type": 2, "id": "1", "token": "tok", "application_id": "app",
+        "data": {"name": "roll"},
+        "guild": {"id": "11"}, "channel": {"id": "22"},
+        "member": {"user": {"id": "33", "username": "Goose"}},
+    })
+    await appmod._dispatch_command(inter)
+
+    assert calls == [("campaign", 11), ("scene", 7, 22)]
+    ctx = seen["ctx"]
+    assert (ctx.campaign_id, ctx.scene_id, ctx.user_id, ctx.username) == (7, 9, 33, "Goose")
+    assert ctx.rng_seed == 1234
@@ -0,0 +1,154 @@
+# tests/test_llm_cache.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import orjson
+
+from Adventorator.cache import TTLCache
+from Adventorator.llm import LLMClient, prompt_key
+
+
+def _settings(**kw):
+    base = dict(
+        llm_api_url="http://llm.local/api/chat", llm_model_name="m",
+        llm_default_system_prompt="sys",
+        llm_cache_ttl_seconds=30, llm_cache_max_entries=16, llm_cache_path=None,
+    )
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def _client(settings, calls):
+    async def handler(request):
+        calls.append(orjson.loads(request.content))
+        await asyncio.sleep(0.05)
+        message = {"role": "assistant", "content": f" answer {len(calls)} "}
+        return httpx.Response(200, json={"message": message})
+
+    c = LLMClient(settings)
+    c._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return c
+
+
+def test_ttl_cache_lru_and_expiry(monkeypatch):
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # a is now most recent
+    c.set("c", 3)           # evicts b
+    assert c.get("b") is None and c.get("c") == 3
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert c.get("a") is None
+    assert c.stats()["hits"] == 2 and c.stats()["misses"] == 2
+
+
+def test_prompt_key_is_stable_and_ignores_stream():
+    a = {
+        "model": "m", "messages": [{"role": "user", "content": "hi"}],
+        "temperature": 0.4, "stream": False,
+    }
+    b = {
+        "temperature": 0.4, "stream": True,
+        "messages": [{"content": "hi", "role": "user"}], "model": "m",
+    }
+    assert prompt_key(a) == prompt_key(b)
+    assert prompt_key(a) != prompt_key({**a, "temperature": 0.5})
+
+
+async def test_identical_prompts_hit_cache_and_coalesce():
+    calls = []
+    llm = _client(_settings(), calls)
+    msgs = [{"role": "user", "content": "I open the door"}]
+
+    results = await asyncio.gather(*[llm.generate_response(msgs) for _ in range(5)])
+    assert results == ["answer 1"] * 5
+    assert len(calls) == 1
+    assert llm.cache_stats()["coalesced"] == 4
+
+    assert await llm.generate_response(msgs) == "answer 1"
+    assert llm.cache_stats()["hits"] == 1
+    other = [{"role": "user", "content": "something else"}]
+    assert await llm.generate_response(other) == "answer 2"
+    await llm.close()
+
+
+async def test_cancelled_leader_does_not_cancel_followers():
+    calls = []
+    llm = _client(_settings(), calls)
+    msgs = [{"role": "user", "content": "I open the door"}]
+
+    leader = asyncio.create_task(llm.generate_response(msgs))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(llm.generate_response(msgs)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await asyncio.gather(*followers) == ["answer 1"] * 3
+    assert len(calls) == 1
+    await llm.close()
+
+
+def _stream_client(settings, calls):
+    async def handler(request):
+        calls.append(orjson.loads(request.content))
+        await asyncio.sleep(0.05)
+        lines = [
+            orjson.dumps({"message": {"content": d}, "done": False})
+            for d in ("The door ", "creaks.")
+        ]
+        return httpx.Response(200, content=b"\n".join(lines) + b"\n")
+
+    c = LLMClient(settings)
+    c._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return c
+
+
+async def test_identical_streams_coalesce_and_survive_cancel():
+    calls = []
+    llm = _stream_client(_settings(llm_cache_ttl_seconds=0), calls)
+    msgs = [{"role": "user", "content": "I open the door"}]
+
+    async def read():
+        return [d async for d in llm.stream_response(msgs)]
+
+    leader = asyncio.create_task(read())
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(read()) for _ in range(4)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await asyncio.gather(*followers) == [["The door ", "creaks."]] * 4
+    assert len(calls) == 1
+    assert llm.cache_stats()["coalesced"] == 4
+    await llm.close()
+
+
+async def test_errors_are_not_cached():
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) == 1:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"message": {"content": "ok"}})
+
+    llm = LLMClient(_settings())
+    llm._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    assert "LLM response error" in await llm.generate_response([])
+    assert await llm.generate_response([]) == "ok"
+    await llm.close()
+
+
+async def test_disk_tier_survives_restart(tmp_path):
+    settings = _settings(llm_cache_path=str(tmp_path / "llm.sqlite3"))
+    calls = []
+    first = _client(settings, calls)
+    assert await first.generate_response([{"role": "user", "content": "hi"}]) == "answer 1"
+    await first.close()
+
+    second = _client(settings, calls)
+    assert await second.generate_response([{"role": "user", "content": "hi"}]) == "answer 1"
+    assert len(calls) == 1
+    await second.close()
@@ -0,0 +1,104 @@
+# tests/test_llm_stream.py
+from types import SimpleNamespace
+
+import httpx
+import orjson
+
+import Adventorator.app as appmod
+from Adventorator import metrics
+from Adventorator.llm import LLMClient
+
+
+def _settings():
+    return SimpleNamespace(
+        llm_api_url="http://llm.local/api/chat", llm_model_name="m",
+        llm_default_system_prompt="sys",
+        llm_cache_ttl_seconds=0, llm_cache_max_entries=0, llm_cache_path=None,
+    )
+
+
+def _ndjson(*deltas):
+    lines = [
+        orjson.dumps({"message": {"role": "assistant", "content": d}, "done": False})
+        for d in deltas
+    ]
+    lines.append(orjson.dumps({"message": {"role": "assistant", "content": ""}, "done": True}))
+    return b"\n".join(lines) + b"\n"
+
+
+async def test_stream_response_yields_deltas():
+    seen = {}
+
+    def handler(request):
+        seen["body"] = orjson.loads(request.content)
+        return httpx.Response(200, content=_ndjson("The door ", "creaks. ", "A rat squeaks."))
+
+    metrics.reset()
+    client = LLMClient(_settings())
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    out = [d async for d in client.stream_response([{"role": "user", "content": "open door"}])]
+    await client.close()
+
+    assert out == ["The door ", "creaks. ", "A rat squeaks."]
+    assert seen["body"]["stream"] is True
+    assert seen["body"]["messages"][0] == {"role": "system", "content": "sys"}
+    assert metrics.get_histogram("llm.ttft_ms").count == 1
+    assert metrics.get_histogram("llm.total_ms").count == 1
+
+
+async def test_stream_response_error_yields_fallback_once():
+    client = LLMClient(_settings())
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(500)))
+    out = [d async for d in client.stream_response([])]
+    await client.close()
+    assert len(out) == 1 and "LLM response error" in out[0]
+
+
+async def test_stream_to_followup_posts_first_sentence_then_edits(monkeypatch):
+    calls = []
+
+    async def _followup(app_id, token, content, ephemeral=False, wait=False):
+        calls.append(("post", content, wait))
+        return {"id": "m1"} if wait else None
+
+    async def _edit(app_id, token, message_id, content):
+        calls.append(("edit", content, message_id))
+
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    monkeypatch.setattr(appmod, "edit_followup_message", _edit)
+
+    async def chunks():
+        for d in ["The door", " creaks.", " A rat", " squeaks."]:
+            yield d
+
+    inter = SimpleNamespace(application_id="app", token="tok")
+    final = await appmod._stream_to_followup(inter, "> ", chunks(), interval=0)
+
+    assert final == "The door creaks. A rat squeaks."
+    # Nothing is posted before the first sentence.
+    assert calls[0] == ("post", "> The door creaks. …", True)
+    assert all(c[0] == "edit" and c[2] == "m1" for c in calls[1:])
+    assert calls[-1] == ("edit", "> The door creaks. A rat squeaks.", "m1")
+
+
+async def test_stream_to_followup_throttles_edits(monkeypatch):
+    calls = []
+
+    async def _followup(app_id, token, content, ephemeral=False, wait=False):
+        calls.append("post")
+        return {"id": "m1"}
+
+    async def _edit(app_id, token, message_id, content):
+        calls.append("edit")
+
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    monkeypatch.setattr(appmod, "edit_followup_message", _edit)
+
+    async def chunks():
+        yield "Hi."
+        for _ in range(50):
+            yield " more"
+
+    inter = SimpleNamespace(application_id="app", token="tok")
+    await appmod._stream_to_followup(inter, "", chunks(), interval=60)
+    assert calls == ["post", "edit"]  # only the final edit within the window
@@ -0,0 +1,204 @@
+# tests/test_locks.py
+import asyncio
+import time
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+import Adventorator.app as appmod
+from Adventorator import combat, locks, metrics, models, repos
+from Adventorator.db import session_scope
+from Adventorator.locks import LeaseLostError, LocalLocks, LockManager, LockTimeoutError, RedisLocks
+
+
+class FakeRedis:
+    """Just enough of the Redis protocol for RedisLocks: a local stand-in server."""
+
+    def __init__(self):
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.server = None
+        self.delay = 0.0  # seconds before each reply
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return f"redis://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/0"
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _get(self, k: bytes) -> bytes | None:
+        v = self.data.get(k)
+        if v is not None and v[1] is not None and v[1] <= time.monotonic():
+            del self.data[k]
+            return None
+        return None if v is None else v[0]
+
+    def _run(self, cmd: list[bytes]):
+        op, args = cmd[0].upper(), cmd[1:]
+        if op == b"PING":
+            return "+PONG"
+        if op == b"INCR":
+            n = int(self._get(args[0]) or 0) + 1
+            self.data[args[0]] = (str(n).encode(), None)
+            return n
+        if op == b"SET":  # SET k v NX PX ms
+            if self._get(args[0]) is not None:
+                return None
+            self.data[args[0]] = (args[1], time.monotonic() + int(args[4]) / 1000)
+            return "+OK"
+        if op == b"EVAL":
+            script, k, value = args[0].decode(), args[2], args[3]
+            if self._get(k) != value:
+                return 0
+            if script == locks.RELEASE_SCRIPT:
+                del self.data[k]
+            elif script == locks.RENEW_SCRIPT:
+                self.data[k] = (value, time.monotonic() + int(args[4]) / 1000)
+            else:
+                return "-ERR unknown script"
+            return 1
+        return f"-ERR unknown command {op.decode()}"
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                cmd = []
+                for _ in range(int(line[1:])):
+                    n = int((await reader.readline())[1:])
+                    cmd.append((await reader.readexactly(n + 2))[:-2])
+                reply = self._run(cmd)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if reply is None:
+                    writer.write(b"$-1\r\n")
+                elif isinstance(reply, int):
+                    writer.write(b":%d\r\n" % reply)
+                else:
+                    writer.write(reply.encode() + b"\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+@pytest.fixture(params=["local", "redis"])
+async def manager(request):
+    metrics.reset()
+    if request.param == "local":
+        yield LockManager(LocalLocks(shards=8), ttl=5.0, wait=2.0)
+        return
+    fake = FakeRedis()
+    mgr = LockManager(RedisLocks(await fake.start()), ttl=5.0, wait=2.0)
+    yield mgr
+    await mgr.close()
+    await fake.stop()
+
+
+async def test_mutual_exclusion_under_contention(manager):
+    state = {"n": 0, "inside": 0}
+
+    async def bump():
+        async with manager.lock("scene:1"):
+            state["inside"] += 1
+            assert state["inside"] == 1
+            n = state["n"]
+            await asyncio.sleep(0.001)  # read-modify-write across an await
+            state["n"] = n + 1
+            state["inside"] -= 1
+
+    await asyncio.gather(*[bump() for _ in range(20)])
+    assert state["n"] == 20
+    assert metrics.get_counter("locks.acquired") == 20
+    assert metrics.get_counter("locks.contended") >= 1
+    assert metrics.get_histogram("locks.wait_ms").count == 20
+    # Other keys don't wait on scene:1.
+    async with manager.lock("scene:1"):
+        async with manager.lock("scene:2", wait=0):
+            pass
+
+
+async def test_expiry_fences_out_stale_holder(manager):
+    stale = await manager.acquire("scene:1", ttl=0.05)
+    started = time.perf_counter()
+    fresh = await manager.acquire("scene:1")  # waits out the TTL, not `wait`
+    assert time.perf_counter() - started < 1.0
+    assert fresh.token > stale.token
+    assert await manager.release(stale) is False  # must not free fresh's lease
+    assert metrics.get_counter("locks.expired") == 1
+    with pytest.raises(LeaseLostError):
+        await manager.renew(stale)
+    fresh = await manager.renew(fresh, ttl=5.0)
+    with pytest.raises(LockTimeoutError):
+        await manager.acquire("scene:1", wait=0.05)
+    assert metrics.get_counter("locks.timeouts") == 1
+    assert await manager.release(fresh) is True
+    async with manager.lock("scene:1", wait=0) as lease:
+        assert lease.token > fresh.token
+
+
+async def test_cancelled_call_does_not_leave_its_reply_for_the_next():
+    fake = FakeRedis()
+    backend = RedisLocks(await fake.start())
+    try:
+        assert await backend._call("INCR", "n") == 1
+        fake.delay = 0.05
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(backend._call("INCR", "n"), 0.01)
+        await asyncio.sleep(0.1)  # the abandoned reply (2) lands
+        fake.delay = 0.0
+        assert await backend._call("INCR", "n") == 3
+    finally:
+        await backend.close()
+        await fake.stop()
+
+
+async def test_two_players_start_combat_at_once(app_db, monkeypatch):
+    sent: list[str] = []
+
+    async def _followup(app_id, token, content, ephemeral=False):
+        sent.append(content)
+
+    async def _noop(*a, **k):
+        return None
+
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        scene = await repos.ensure_scene(s, camp.id, 10)
+    ctx = appmod._Context(1, 10, 42, "Goose", camp.id, scene.id, camp.rng_seed)
+
+    async def _resolve(inter):
+        return replace(ctx, user_id=int(inter.token[1:]), username=inter.token)
+
+    engine = combat.CombatEngine(turn_timeout=0)
+    monkeypatch.setattr(combat, "engine", engine)
+    monkeypatch.setattr(locks, "_manager", LockManager(LocalLocks(), ttl=5.0, wait=5.0))
+    monkeypatch.setattr(appmod, "_resolve_context", _resolve)
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    monkeypatch.setattr(appmod.transcript_sink, "write", _noop)
+    monkeypatch.setattr(appmod.settings, "features_combat", True)
+
+    inters = [
+        SimpleNamespace(
+            application_id="app", token=f"u{uid}",
+            data=SimpleNamespace(name="combat", options=[
+                {"name": "start", "type": 1, "options": [
+                    {"name": "npcs", "type": 3, "value": "Goblin+2, Orc, Wolf-1, Bat+3"},
+                ]},
+            ]),
+        )
+        for uid in (42, 43)
+    ]
+    await asyncio.gather(*[appmod._dispatch_command(i) for i in inters])
+
+    assert sum(m.startswith("⚔️ **Combat!**") for m in sent) == 1, sent
+    assert sum("already running" in m for m in sent) == 1, sent
+    # The loser never touched the scene: stored initiative is the winner's.
+    async with session_scope() as s:
+        rows = (await s.execute(
+            select(models.Combatant.actor_ref, models.Combatant.initiative)
+            .where(models.Combatant.scene_id == scene.id)
+        )).all()
+    assert sorted(rows) == sorted((c.actor_ref, c.initiative) for c in engine.get(scene.id).order())
+    await engine.close()
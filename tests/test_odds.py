@@ -0,0 +1,88 @@
+# tests/test_odds.py
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from Adventorator.rules import odds
+from Adventorator.rules.batch import BatchRoller
+from Adventorator.rules.checks import CheckInput
+from Adventorator.rules.odds import check_odds, distribution
+
+
+def brute(n, s, keep=None, highest=True):
+    counts = {}
+    for dice in itertools.product(range(1, s + 1), repeat=n):
+        kept = sorted(dice, reverse=highest)[:keep] if keep else dice
+        counts[sum(kept)] = counts.get(sum(kept), 0) + 1
+    total = s ** n
+    return {v: c / total for v, c in counts.items()}
+
+
+@pytest.mark.parametrize("expr,n,s,keep,highest", [
+    ("3d6", 3, 6, None, True),
+    ("4d6kh3", 4, 6, 3, True),
+    ("4d6dl1", 4, 6, 3, True),
+    ("3d8kl2", 3, 8, 2, False),
+    ("5d4dh2", 5, 4, 3, False),
+])
+def test_matches_enumeration(expr, n, s, keep, highest):
+    d = distribution(expr)
+    want = brute(n, s, keep, highest)
+    assert set(range(d.min, d.max + 1)) >= set(want)
+    for v in range(d.min, d.max + 1):
+        assert d.prob(v) == pytest.approx(want.get(v, 0.0), abs=1e-12)
+
+
+def test_sums_shifts_and_advantage():
+    d = distribution("2d8 + 1d6 - 1d4 + 3")
+    assert d.p.sum() == pytest.approx(1.0)
+    assert (d.min, d.max) == (2 + 1 - 4 + 3, 16 + 6 - 1 + 3)
+    assert d.mean == pytest.approx(9 + 3.5 - 2.5 + 3)
+    adv = distribution("1d20", advantage=True)
+    assert adv.p == pytest.approx(distribution("2d20kh1").p)
+    assert distribution("1d20", disadvantage=True).p == pytest.approx(distribution("2d20kl1").p)
+    assert distribution(" 2D6 ") is distribution("2d6")
+
+
+def test_rerolls_and_explosions_match_simulation():
+    r = BatchRoller(seed=5)
+    for expr in ("2d6r<2", "1d6ro1", "2d6!", "1d4!+1d6r1"):
+        d = distribution(expr)
+        assert d.p.sum() == pytest.approx(1.0, abs=1e-9)
+        st = r.roll_n(expr, 200_000).stats()
+        assert d.mean == pytest.approx(st["mean"], abs=0.05)
+    assert distribution("1d6ro1").prob(1) == pytest.approx(1 / 36)
+    assert distribution("1d6r1").prob(1) == 0.0
+
+
+def test_check_odds():
+    base = dict(ability="DEX", score=16, proficiency_bonus=2)
+    assert check_odds(CheckInput(**base, dc=15)) == pytest.approx(0.45)   # needs 12+
+    assert check_odds(CheckInput(**base, proficient=True, dc=15)) == pytest.approx(0.55)
+    assert check_odds(CheckInput(**base, dc=15, advantage=True)) == pytest.approx(1 - 0.55 ** 2)
+    assert check_odds(CheckInput(**base, dc=15, disadvantage=True)) == pytest.approx(0.45 ** 2)
+    assert check_odds(CheckInput(**base, dc=2)) == 1.0
+    assert check_odds(CheckInput(**base, dc=30)) == 0.0
+    with pytest.raises(ValueError):
+        check_odds(CheckInput(**base))
+
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        distribution("4d6!kh3")
+    with pytest.raises(ValueError):
+        distribution("50d6kh3")
+
+
+def test_large_supports_are_bounded():
+    started = time.perf_counter()
+    assert distribution("100d1000+100d1000").mean == pytest.approx(100_100)  # FFT path
+    assert time.perf_counter() - started < 5
+    for expr in ("100d1000!", "+".join(["100d1000"] * 3), "40d1000kh20"):
+        with pytest.raises(ValueError):
+            distribution(expr)
+    # The FFT agrees with direct convolution.
+    p = distribution("100d20").p
+    assert np.abs(odds._convolve(p, p) - np.convolve(p, p)).max() < 1e-15
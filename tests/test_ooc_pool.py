@@ -0,0 +1,78 @@
+# tests/test_ooc_pool.py
+"""
+Load test: /ooc must not hold a pooled connection across the LLM call, so pool
+wait time stays flat as concurrent narrations grow past the pool size.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import Adventorator.app as appmod
+from Adventorator import db as dbmod
+from Adventorator import metrics, models, repos
+from Adventorator.transcripts import sink
+
+LLM_SECONDS = 0.3
+
+
+class _SlowLLM:
+    async def generate_response(self, messages):
+        await asyncio.sleep(LLM_SECONDS)
+        return "The torch gutters."
+
+
+@pytest.fixture
+async def small_pool(tmp_path, monkeypatch):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pool.sqlite3'}"
+    engine = create_async_engine(url, pool_size=2, max_overflow=0, pool_timeout=30)
+    async with engine.begin() as conn:
+        await conn.run_sync(dbmod.Base.metadata.create_all)
+    monkeypatch.setattr(dbmod, "_engine", engine)
+    monkeypatch.setattr(dbmod, "_sessionmaker", async_sessionmaker(engine, expire_on_commit=False))
+    yield engine
+    await engine.dispose()
+
+
+async def _run_round(n: int, ctx) -> float:
+    metrics.reset()
+    inters = [
+        SimpleNamespace(
+            application_id="app", token=f"t{i}",
+            data=SimpleNamespace(
+                name="ooc", options=[{"name": "message", "type": 3, "value": f"hello {i}"}]
+            ),
+        )
+        for i in range(n)
+    ]
+    await asyncio.gather(*[appmod._handle_command(inter, ctx) for inter in inters])
+    return metrics.get_histogram("db.pool_wait_ms").max
+
+
+async def test_pool_wait_stays_flat_as_narrations_grow(small_pool, monkeypatch):
+    async def _followup(*a, **k):
+        return None
+
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    monkeypatch.setattr(appmod, "llm_client", _SlowLLM())
+    monkeypatch.setattr(appmod.settings, "features_llm", True)
+    monkeypatch.setattr(appmod.settings, "llm_stream", False)
+
+    async with dbmod.session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        scene = await repos.ensure_scene(s, camp.id, 10)
+    ctx = appmod._Context(1, 10, 42, "Goose", camp.id, scene.id)
+
+    waits = {n: await _run_round(n, ctx) for n in (2, 8, 16)}
+
+    # With the session held across the LLM call, 16 narrations on 2 connections
+    # would queue for ~7 x LLM_SECONDS. Split phases only wait on short DB work.
+    for w in waits.values():
+        assert w < LLM_SECONDS * 1000 / 2, waits
+
+    await sink.flush()
+    async with dbmod.session_scope() as s:
+        count = (await s.execute(select(func.count()).select_from(models.Transcript))).scalar_one()
+    assert count == 2 * (2 + 8 + 16)  # player + bot row per narration
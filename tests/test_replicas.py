@@ -0,0 +1,92 @@
+# tests/test_replicas.py
+"""Replica routing, with SQLite files standing in for the primary and two replicas."""
+import pytest
+from sqlalchemy import text
+
+from Adventorator import db as dbmod
+from Adventorator import metrics, repos
+
+
+async def _whoami(s) -> str:
+    return (await s.execute(text("SELECT name FROM campaigns WHERE guild_id = 0"))).scalar_one()
+
+
+@pytest.fixture
+async def replicas(app_db, tmp_path, monkeypatch):
+    # Tag each database so a query reveals which one served it.
+    async with dbmod.session_scope() as s:
+        await repos.get_or_create_campaign(s, 0, name="primary")
+    reps = []
+    for name in ("r1", "r2"):
+        rep = dbmod.create_replica(f"sqlite:///{tmp_path / name}.sqlite3")
+        async with rep.engine.begin() as conn:
+            await conn.run_sync(dbmod.Base.metadata.create_all)
+            await conn.execute(text(
+                "INSERT INTO campaigns (guild_id, name, system, created_at) "
+                f"VALUES (0, '{name}', '5e-srd', '2025-01-01')"
+            ))
+        reps.append(rep)
+    monkeypatch.setattr(dbmod, "_replicas", reps)
+    monkeypatch.setattr(dbmod.settings, "replica_max_lag_seconds", 5.0)
+    monkeypatch.setattr(dbmod.settings, "replica_lag_check_seconds", 0.0)
+    try:
+        yield reps
+    finally:
+        for r in reps:
+            await r.engine.dispose()
+
+
+async def _served_by(readonly: bool) -> str:
+    async with dbmod.session_scope(readonly=readonly) as s:
+        return await _whoami(s)
+
+
+async def test_reads_round_robin_replicas(replicas):
+    seen = [await _served_by(readonly=True) for _ in range(4)]
+    assert sorted(seen) == ["r1", "r1", "r2", "r2"]
+    assert seen[0] != seen[1]
+    assert await _served_by(readonly=False) == "primary"
+    async with dbmod.session_scope(readonly=True, replica=False) as s:
+        assert await _whoami(s) == "primary"  # read-your-writes
+
+
+async def test_lagging_replica_is_skipped(replicas, monkeypatch):
+    async def lag(engine):
+        return 30.0 if engine is replicas[0].engine else 0.5
+    monkeypatch.setattr(dbmod, "replica_lag", lag)
+    assert {await _served_by(readonly=True) for _ in range(4)} == {"r2"}
+
+
+async def test_falls_back_to_primary(replicas, monkeypatch):
+    async def down(engine):
+        raise ConnectionError("replica down")
+    monkeypatch.setattr(dbmod, "replica_lag", down)
+    metrics.reset()
+    assert await _served_by(readonly=True) == "primary"
+    assert metrics.get_counter("db.replica_fallback") == 1
+
+
+async def test_lag_is_cached_between_checks(replicas, monkeypatch):
+    calls = []
+
+    async def lag(engine):
+        calls.append(engine)
+        return 0.0
+    monkeypatch.setattr(dbmod, "replica_lag", lag)
+    monkeypatch.setattr(dbmod.settings, "replica_lag_check_seconds", 60.0)
+    for r in replicas:
+        r.checked_at = float("-inf")
+    for _ in range(6):
+        await _served_by(readonly=True)
+    assert len(calls) == 2
+
+
+async def test_writes_refused_in_readonly_scope(replicas):
+    with pytest.raises(dbmod.ReadOnlySessionError):
+        async with dbmod.session_scope(readonly=True) as s:
+            await repos.get_or_create_campaign(s, 5)
+    with pytest.raises(dbmod.ReadOnlySessionError):
+        async with dbmod.session_scope(readonly=True) as s:
+            s.add(repos.models.Campaign(guild_id=6, name="x"))
+    assert repos.get_character.db_access == "read"
+    assert repos.upsert_character.db_access == "write"
@@ -1,9 +1,11 @@
 # tests/test_repos.py
 
 import pytest
+
 from Adventorator import repos
 from Adventorator.schemas import CharacterSheet
 
+
 @pytest.mark.asyncio
 async def test_character_upsert_and_get(db):
     camp = await repos.get_or_create_campaign(db, guild_id=123, name="Test")
@@ -19,3 +21,44 @@ async def test_character_upsert_and_get(db):
 
     got = await repos.get_character(db, camp.id, "Goose")
     assert got is not None and got.sheet["class"] == "Rogue"
+
+
+@pytest.mark.asyncio
+async def test_upsert_character_updates_in_place(db):
+    camp = await repos.get_or_create_campaign(db, guild_id=321)
+    base = {
+        "name":"Mav","class":"Fighter","level":1,
+        "abilities":{"STR":16,"DEX":12,"CON":14,"INT":10,"WIS":10,"CHA":10},
+        "proficiency_bonus":2,"ac":16,"speed":30,
+    }
+    first = await repos.upsert_character(db, camp.id, None, CharacterSheet.model_validate(base))
+    leveled = CharacterSheet.model_validate({**base, "level": 2})
+    second = await repos.upsert_character(db, camp.id, None, leveled)
+    assert second.id == first.id
+    assert second.sheet["level"] == 2
+    assert second.updated_at >= first.created_at
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_contact_creates_one_row_each(app_db):
+    import asyncio
+
+    from sqlalchemy import func, select
+
+    from Adventorator import models
+    from Adventorator.db import session_scope
+
+    async def first_contact(i):
+        async with session_scope() as s:
+            camp = await repos.get_or_create_campaign(s, 4242)
+            player = await repos.get_or_create_player(s, 77, f"Goose{i}")
+            scene = await repos.ensure_scene(s, camp.id, 8080)
+            return camp.id, player.id, scene.id
+
+    results = await asyncio.gather(*[first_contact(i) for i in range(12)])
+    assert len(set(results)) == 1
+
+    async with session_scope() as s:
+        for model in (models.Campaign, models.Player, models.Scene):
+            n = (await s.execute(select(func.count()).select_from(model))).scalar_one()
+            assert n == 1, model.__name__
@@ -0,0 +1,59 @@
+# tests/test_scene_rng.py
+import asyncio
+
+from sqlalchemy import update
+
+from Adventorator import models, repos
+from Adventorator.db import session_scope
+from Adventorator.rules.streams import SceneRNG
+
+
+def test_rolls_replay_by_index():
+    a = SceneRNG(seed=1234, scene_id=7)
+    rolls = [a.roll(i, "4d6kh3") for i in range(50)]
+    # any index regenerates on its own, in any order, from a fresh object
+    for i in (49, 0, 17):
+        assert SceneRNG(1234, 7).roll(i, "4d6kh3") == rolls[i]
+    assert len({tuple(r.rolls + r.dropped) for r in rolls}) > 30
+    other = SceneRNG(1234, 8)
+    assert other.roll(0, "4d6kh3") != rolls[0] or other.roll(1, "4d6kh3") != rolls[1]
+    assert SceneRNG(1235, 7).roll(3, "10d20").rolls != SceneRNG(1234, 7).roll(3, "10d20").rolls
+    adv = a.roll(5, "1d20", advantage=True)
+    assert adv.rolls[2] == max(adv.rolls[:2]) and adv == a.roll(5, "1d20", advantage=True)
+    assert (a.batch(9).roll_n("8d6", 100).totals == a.batch(9).roll_n("8d6", 100).totals).all()
+
+
+def test_pinned_values():
+    # Replays must not drift across NumPy or Python releases.
+    assert SceneRNG(42, 1).roll(0, "6d20").rolls == [15, 17, 16, 19, 15, 6]
+    assert SceneRNG(42, 1).draws(0, 20, 6).tolist() == [15, 17, 16, 19, 15, 6]
+    assert SceneRNG(42, 1).batch(0).roll_n("1d20", 6).totals.tolist() == [15, 17, 16, 19, 15, 6]
+    assert SceneRNG(42, 1).batch(3).roll_n("3d8", 4).totals.tolist() == [16, 15, 11, 15]
+    assert SceneRNG(42, 1).roll(2**70, "1d100").total == SceneRNG(42, 1).roll(2**70, "1d100").total
+
+
+async def test_indexes_are_unique_across_workers(app_db):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        scene = await repos.ensure_scene(s, camp.id, 10)
+    assert camp.rng_seed is not None
+
+    async def take(n):
+        async with session_scope() as s:
+            return await repos.next_roll_index(s, scene.id, n)
+
+    firsts = await asyncio.gather(*(take(1) for _ in range(10)), take(5))
+    got = sorted(firsts[:10]) + list(range(firsts[10], firsts[10] + 5))
+    assert sorted(got) == list(range(15))
+
+
+async def test_old_campaigns_get_a_seed(app_db):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        await s.execute(update(models.Campaign).values(rng_seed=None))
+    async with session_scope() as s:
+        again = await repos.get_or_create_campaign(s, 1)
+        seed = again.rng_seed
+    async with session_scope() as s:
+        assert seed is not None and (await repos.get_or_create_campaign(s, 1)).rng_seed == seed
+    assert again.id == camp.id
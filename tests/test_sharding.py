@@ -0,0 +1,163 @@
+# tests/test_sharding.py
+"""Shard routing and online guild moves, with SQLite files as the directory and two shards."""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from Adventorator import context_cache, models, repos, sharding, transcripts
+from Adventorator.db import Base, session_scope
+from Adventorator.schemas import CharacterSheet
+from Adventorator.transcripts import TranscriptSink
+
+SHEET = {
+    "name": "Aria", "class": "Rogue", "level": 3,
+    "abilities": {"STR": 8, "DEX": 16, "CON": 12, "INT": 13, "WIS": 10, "CHA": 14},
+    "proficiency_bonus": 2, "ac": 14, "hp": {"current": 18, "max": 18, "temp": 0}, "speed": 30,
+}
+
+
+def test_ring_is_stable_and_moves_few_guilds():
+    two = sharding.HashRing(["a", "b"], vnodes=64)
+    three = sharding.HashRing(["a", "b", "c"], vnodes=64)
+    guilds = range(10_000)
+    placed = [two.lookup(g) for g in guilds]
+    assert placed == [sharding.HashRing(["b", "a"], vnodes=64).lookup(g) for g in guilds]
+    assert 0.4 < placed.count("a") / len(placed) < 0.6
+    moved = sum(1 for g, p in zip(guilds, placed, strict=True) if three.lookup(g) != p)
+    # Only guilds claimed by the new shard move (~1/3), and all of them go to it.
+    assert 0.25 < moved / len(placed) < 0.42
+    assert all(
+        three.lookup(g) == "c" for g, p in zip(guilds, placed, strict=True) if three.lookup(g) != p
+    )
+
+
+@pytest.fixture
+async def shards(app_db, tmp_path, monkeypatch):
+    router = sharding.ShardRouter(
+        {"a": f"sqlite:///{tmp_path / 'a.sqlite3'}", "b": f"sqlite:///{tmp_path / 'b.sqlite3'}"},
+        vnodes=16, override_ttl=60,
+    )
+    for name in ("a", "b"):
+        router.sessionmaker(name)
+        async with router._engines[name].begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(sharding, "router", router)
+    try:
+        yield router
+    finally:
+        await router.dispose()
+
+
+def _guild_on(router, shard: str) -> int:
+    return next(g for g in range(1, 10_000) if router.ring.lookup(g) == shard)
+
+
+async def _count(shard: str, model) -> int:
+    async with session_scope(shard=shard) as s:
+        return (await s.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+async def test_session_scope_routes_by_guild(shards):
+    ga, gb = _guild_on(shards, "a"), _guild_on(shards, "b")
+    for g in (ga, gb):
+        async with session_scope(guild_id=g) as s:
+            assert s.info["shard"] == shards.ring.lookup(g)
+            await repos.resolve_campaign(s, g)
+    assert await _count("a", models.Campaign) == 1
+    assert await _count("b", models.Campaign) == 1
+    # The directory (primary) holds no campaign data.
+    async with session_scope() as s:
+        stmt = select(func.count()).select_from(models.Campaign)
+        assert (await s.execute(stmt)).scalar_one() == 0
+
+    await shards.set_override(ga, "b")
+    async with session_scope(guild_id=ga) as s:
+        assert s.info["shard"] == "b"
+
+
+async def test_overrides_are_read_from_the_directory(shards):
+    g = _guild_on(shards, "a")
+    assert await shards.shard_for(g) == "a"
+    async with session_scope() as s:
+        s.add(models.GuildShard(guild_id=g, shard="b"))
+    assert await shards.shard_for(g) == "a"  # cached until override_ttl passes
+    shards._overrides_at = float("-inf")
+    assert await shards.shard_for(g) == "b"
+
+
+async def test_move_guild_online(shards, monkeypatch):
+    g = _guild_on(shards, "a")
+    async with session_scope(guild_id=g) as s:
+        camp = await repos.resolve_campaign(s, g)
+        scene = await repos.resolve_scene(s, camp.id, 4242)
+        player = await repos.resolve_player(s, 77, "Aria's player")
+        await repos.upsert_character(s, camp.id, player.id, CharacterSheet.model_validate(SHEET))
+        for i in range(25):
+            await repos.write_transcript(s, camp.id, scene.id, 4242, "player", f"line {i}", "77")
+    # Something else already on the target, so ids can't line up by accident.
+    async with session_scope(shard="b") as s:
+        other = await repos.get_or_create_campaign(s, _guild_on(shards, "b"))
+        await repos.ensure_scene(s, other.id, 1)
+
+    # Buffered with source ids: another worker's sink, and this process's (flushed by the move).
+    other_worker = TranscriptSink(max_rows=100, flush_interval=60)
+    await other_worker.write(camp.id, scene.id, 4242, "player", "buffered", "77", guild_id=g)
+    await transcripts.sink.write(camp.id, scene.id, 4242, "player", "ours", "77", guild_id=g)
+
+    real_sleep = asyncio.sleep
+
+    async def straggler(seconds):
+        if seconds != shards.override_ttl + 1:
+            return await real_sleep(seconds)  # the sinks' flush timers
+        # The other worker flushes after the flip; its rows still go to the source...
+        await other_worker.flush()
+        # ...as do the writes of a worker that hasn't seen the override yet...
+        async with session_scope(shard="a") as s:
+            await repos.write_transcript(s, camp.id, scene.id, 4242, "bot", "late line", "77")
+        # ...while one that has starts combat on the target.
+        async with session_scope(shard="b") as s:
+            await repos.set_scene_mode(s, 4242, "combat")
+        await real_sleep(0)
+
+    monkeypatch.setattr(sharding.asyncio, "sleep", straggler)
+    rep = await sharding.move_guild(g, "b", batch_rows=10)
+    assert (rep.source, rep.target) == ("a", "b")
+    assert rep.transcripts == 28
+
+    assert await shards.shard_for(g) == "b"
+    for model in (models.Campaign, models.Scene, models.Character, models.Transcript):
+        assert await _count("a", model) == 0
+    context_cache.clear()
+    async with session_scope(readonly=True, guild_id=g) as s:
+        stmt = select(models.Campaign).where(models.Campaign.guild_id == g)
+        new_camp = (await s.execute(stmt)).scalar_one()
+        ch = await repos.get_character(s, new_camp.id, "Aria")
+        assert ch is not None and ch.sheet["class"] == "Rogue"
+        stmt = select(models.Scene).where(models.Scene.channel_id == 4242)
+        new_scene = (await s.execute(stmt)).scalar_one()
+        history = await repos.get_transcript_page(s, new_scene.id, limit=100)
+    assert new_camp.id != camp.id
+    assert new_scene.mode == "combat"  # the catch-up pass didn't roll it back
+    expected = [f"line {i}" for i in range(25)] + ["buffered", "ours", "late line"]
+    assert [t.content for t in history] == expected
+    await other_worker.close()
+
+
+async def test_pin_placements_keeps_guilds_when_a_shard_is_added(shards, tmp_path):
+    guilds = [_guild_on(shards, "a"), _guild_on(shards, "b")]
+    for g in guilds:
+        async with session_scope(guild_id=g) as s:
+            await repos.resolve_campaign(s, g)
+    await shards.set_override(guilds[1], "a")  # existing overrides are left alone
+
+    pins = await sharding.pin_placements()
+    assert pins == {guilds[0]: "a"}
+    assert await sharding.pin_placements() == {}
+
+    grown = sharding.ShardRouter(
+        {**shards.shards, "c": f"sqlite:///{tmp_path / 'c.sqlite3'}"}, vnodes=16
+    )
+    grown.ring.lookup = lambda g: "c"  # as if the new shard claimed every guild
+    assert [await grown.shard_for(g) for g in guilds] == ["a", "a"]
+    assert await grown.shard_for(99_999) == "c"  # new guilds still follow the ring
@@ -0,0 +1,148 @@
+# tests/test_sheet_patch.py
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+
+import Adventorator.app as appmod
+from Adventorator import models, repos
+from Adventorator.db import session_scope
+from Adventorator.schemas import CharacterSheet
+from Adventorator.sheet_patch import PatchError, apply_patch, setters_to_patch
+
+SHEET = CharacterSheet.model_validate({
+    "name": "Aria", "class": "Rogue", "level": 3,
+    "abilities": {"STR": 8, "DEX": 16, "CON": 12, "INT": 13, "WIS": 10, "CHA": 14},
+    "proficiency_bonus": 2, "ac": 14, "hp": {"current": 18, "max": 18, "temp": 0}, "speed": 30,
+    "conditions": ["prone"],
+}).model_dump(by_alias=True)
+
+
+def test_rfc6902_ops():
+    res = apply_patch(SHEET, [
+        {"op": "test", "path": "/hp/current", "value": 18},
+        {"op": "replace", "path": "/hp/current", "value": 9},
+        {"op": "add", "path": "/conditions/-", "value": "poisoned"},
+        {"op": "remove", "path": "/conditions/0"},
+        {"op": "copy", "from": "/class", "path": "/notes"},
+    ])
+    assert res.doc["hp"] == {"current": 9, "max": 18, "temp": 0}
+    assert res.doc["conditions"] == ["poisoned"] and res.doc["notes"] == "Rogue"
+    assert res.fields == ["hp", "conditions", "notes"]
+    assert res.sets["hp"] == [(("hp", "current"), 9)] and res.sets["conditions"] is None
+    # the stored document isn't touched
+    assert SHEET["hp"]["current"] == 18 and SHEET["conditions"] == ["prone"]
+
+
+def test_setters_and_field_validation():
+    res = apply_patch(SHEET, setters_to_patch({"hp.current": 4, "level": "5"}))
+    assert res.doc["hp"]["current"] == 4
+    assert res.doc["level"] == 5 and res.sets["level"] is None  # coerced, written whole
+    for bad in (
+        [{"op": "replace", "path": "/level", "value": 30}],
+        [{"op": "remove", "path": "/abilities/STR"}],
+        [{"op": "add", "path": "/luck", "value": 1}],
+        [{"op": "replace", "path": "/name", "value": "Bob"}],
+        [{"op": "remove", "path": "/ac"}],
+        [{"op": "test", "path": "/ac", "value": 99}],
+        [{"op": "replace", "path": "/hp/nope", "value": 1}],
+        [{"op": "jump", "path": "/ac"}],
+        {"op": "replace"},
+    ):
+        with pytest.raises(PatchError):
+            apply_patch(SHEET, bad)
+
+
+def test_postgres_writes_only_touched_paths():
+    ops = setters_to_patch({"hp.current": 7}) + [{"op": "remove", "path": "/notes"}]
+    res = apply_patch(SHEET, ops)
+    char = models.Character
+    stmt = update(char).where(char.id == 1).values(sheet=repos._sheet_value("postgresql", res))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert sql.count("jsonb_set(") == 1 and "#-" in sql
+    assert "abilities" not in sql.lower()
+
+
+async def test_patch_character_concurrent_updates_dont_clobber(app_db):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        sheet = CharacterSheet.model_validate(SHEET)
+        before = await repos.upsert_character(s, camp.id, None, sheet)
+        stamp = before.updated_at
+
+    async def hit(n):
+        async with session_scope() as s:
+            return await repos.patch_character(s, camp.id, "Aria", [
+                {"op": "add", "path": "/conditions/-", "value": f"hit{n}"},
+            ])
+
+    await asyncio.gather(*(hit(n) for n in range(5)))
+    async with session_scope() as s:
+        ch = await repos.get_character(s, camp.id, "Aria")
+        assert sorted(ch.sheet["conditions"]) == ["hit0", "hit1", "hit2", "hit3", "hit4", "prone"]
+        assert ch.updated_at != stamp
+        with pytest.raises(repos.StaleSheetError):
+            await repos.patch_character(
+                s, camp.id, "Aria", setters_to_patch({"hp.current": 1}), expected_updated_at=stamp
+            )
+        assert await repos.patch_character(s, camp.id, "Nobody", []) is None
+
+
+async def test_lost_race_is_retried(app_db, monkeypatch):
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        await repos.upsert_character(s, camp.id, None, CharacterSheet.model_validate(SHEET))
+
+    # Someone else's write lands between our read and our conditional UPDATE, once.
+    real_apply = repos.apply_patch
+    calls = []
+
+    def racing_apply(doc, ops):
+        calls.append(doc["hp"]["current"])
+        return real_apply(doc, ops)
+
+    monkeypatch.setattr(repos, "apply_patch", racing_apply)
+    async with session_scope() as s:
+        orig_scalars = s.scalars
+
+        async def scalars(stmt, *a, **kw):
+            if not calls[1:]:
+                await s.execute(update(models.Character).values(
+                    sheet={**SHEET, "hp": {"current": 3, "max": 18, "temp": 0}},
+                    updated_at=datetime(2030, 1, 1),
+                ))
+            return await orig_scalars(stmt, *a, **kw)
+
+        monkeypatch.setattr(s, "scalars", scalars)
+        ops = [{"op": "replace", "path": "/ac", "value": 15}]
+        ch = await repos.patch_character(s, camp.id, "Aria", ops)
+    assert calls == [18, 3]
+    assert ch.sheet["ac"] == 15 and ch.sheet["hp"]["current"] == 3
+
+
+@pytest.mark.parametrize("patch", ["5", "null", '"hp"', "true"])
+async def test_update_rejects_json_that_isnt_a_patch(app_db, monkeypatch, patch):
+    sent = []
+
+    async def _followup(app_id, token, content, ephemeral=False):
+        sent.append((content, ephemeral))
+
+    monkeypatch.setattr(appmod, "followup_message", _followup)
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        await repos.upsert_character(s, camp.id, None, CharacterSheet.model_validate(SHEET))
+    ctx = appmod._Context(1, 10, 42, "Goose", camp.id, None, camp.rng_seed)
+    inter = SimpleNamespace(application_id="app", token="t", data=SimpleNamespace(
+        name="sheet", options=[{"name": "update", "type": 1, "options": [
+            {"name": "name", "type": 3, "value": "Aria"},
+            {"name": "patch", "type": 3, "value": patch},
+            {"name": "hp", "type": 4, "value": 1},
+        ]}],
+    ))
+    await appmod._handle_command(inter, ctx)
+    assert len(sent) == 1 and sent[0][0].startswith("❌ Invalid JSON") and sent[0][1]
+    async with session_scope() as s:
+        assert (await repos.get_character(s, camp.id, "Aria")).sheet["hp"]["current"] == 18
@@ -0,0 +1,73 @@
+# tests/test_sqlite_profile.py
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from Adventorator import db as dbmod
+from Adventorator import models, repos
+
+
+@pytest.fixture
+async def prod_db(tmp_path, monkeypatch):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'prod.sqlite3'}"
+    writer, reader = dbmod.create_sqlite_engines(url, readers=2)
+    async with writer.begin() as conn:
+        await conn.run_sync(dbmod.Base.metadata.create_all)
+    monkeypatch.setattr(dbmod, "_engine", writer)
+    monkeypatch.setattr(dbmod, "_sessionmaker", async_sessionmaker(writer, expire_on_commit=False))
+    monkeypatch.setattr(dbmod, "_read_engine", reader)
+    monkeypatch.setattr(
+        dbmod, "_read_sessionmaker", async_sessionmaker(reader, expire_on_commit=False)
+    )
+    monkeypatch.setattr(dbmod, "_write_lock", None)
+    try:
+        yield writer, reader
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+
+async def test_pragmas_applied(prod_db):
+    async with dbmod.session_scope() as s:
+        assert (await s.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await s.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+        busy_timeout = (await s.execute(text("PRAGMA busy_timeout"))).scalar()
+        assert busy_timeout == dbmod.settings.sqlite_busy_timeout_ms
+        assert (await s.execute(text("PRAGMA query_only"))).scalar() == 0
+    async with dbmod.session_scope(readonly=True) as s:
+        assert (await s.execute(text("PRAGMA query_only"))).scalar() == 1
+
+
+async def test_reader_pool_rejects_writes(prod_db):
+    # Raw SQL slips past the session-level guard; query_only still stops it.
+    with pytest.raises(OperationalError):
+        async with dbmod.session_scope(readonly=True) as s:
+            await s.execute(text(
+                "INSERT INTO campaigns (guild_id, name, system, created_at) "
+                "VALUES (1, 'nope', '5e-srd', '2025-01-01')"
+            ))
+
+
+async def test_concurrent_writes_queue_instead_of_locking(prod_db):
+    async with dbmod.session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1, name="Busy")
+        scene = await repos.ensure_scene(s, camp.id, 5)
+
+    async def write(i: int):
+        async with dbmod.session_scope() as s:
+            await repos.write_transcript(s, camp.id, scene.id, 5, "player", f"msg {i}", str(i))
+            await asyncio.sleep(0)  # hold the writer across a suspension point
+
+    async def read():
+        async with dbmod.session_scope(readonly=True) as s:
+            return await repos.get_recent_transcripts(s, scene.id, limit=5)
+
+    results = await asyncio.gather(*(write(i) for i in range(40)), *(read() for _ in range(20)))
+    assert all(isinstance(r, list) for r in results[40:])
+
+    async with dbmod.session_scope(readonly=True) as s:
+        n = (await s.execute(select(func.count()).select_from(models.Transcript))).scalar_one()
+    assert n == 40
@@ -13,3 +13,26 @@ async def test_transcript_write(db):
     )
     result = await db.execute(text("SELECT COUNT(*) FROM transcripts"))
     assert result.scalar_one() == 1
+
+
+@pytest.mark.asyncio
+async def test_keyset_pagination(db):
+    camp = await repos.get_or_create_campaign(db, 123)
+    scene = await repos.ensure_scene(db, camp.id, channel_id=999)
+    for i in range(7):
+        author = "42" if i % 2 == 0 else "7"
+        await repos.write_transcript(db, camp.id, scene.id, 999, "player", f"m{i}", author)
+
+    latest = await repos.get_transcript_page(db, scene.id, limit=3)
+    assert [r.content for r in latest] == ["m4", "m5", "m6"]
+
+    older = await repos.get_transcript_page(db, scene.id, limit=3, before=latest[0].cursor)
+    assert [r.content for r in older] == ["m1", "m2", "m3"]
+    oldest = await repos.get_transcript_page(db, scene.id, limit=3, before=older[0].cursor)
+    assert [r.content for r in oldest] == ["m0"]
+
+    forward = await repos.get_transcript_page(db, scene.id, limit=2, after=oldest[-1].cursor)
+    assert [r.content for r in forward] == ["m1", "m2"]
+
+    mine = await repos.get_recent_transcripts(db, scene.id, limit=15, user_id="42")
+    assert [r.content for r in mine] == ["m0", "m2", "m4", "m6"]
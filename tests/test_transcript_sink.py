@@ -0,0 +1,109 @@
+# tests/test_transcript_sink.py
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from Adventorator import metrics, models, repos, transcripts
+from Adventorator.db import session_scope
+from Adventorator.transcripts import TranscriptSink
+
+
+async def _count() -> int:
+    async with session_scope() as s:
+        return (await s.execute(select(func.count()).select_from(models.Transcript))).scalar_one()
+
+
+async def _scene():
+    async with session_scope() as s:
+        camp = await repos.get_or_create_campaign(s, 1)
+        scene = await repos.ensure_scene(s, camp.id, 10)
+    return camp.id, scene.id
+
+
+async def test_buffers_until_size_threshold(app_db):
+    camp_id, scene_id = await _scene()
+    sink = TranscriptSink(max_rows=3, flush_interval=60)
+    await sink.write(camp_id, scene_id, 10, "player", "one", "42")
+    await sink.write(camp_id, scene_id, 10, "bot", "two", "42")
+    assert await _count() == 0
+    await sink.write(camp_id, scene_id, 10, "player", "three", "42")
+    assert await _count() == 3
+    await sink.close()
+
+
+async def test_time_threshold_and_durable(app_db):
+    camp_id, scene_id = await _scene()
+    sink = TranscriptSink(max_rows=100, flush_interval=0.05)
+    await sink.write(camp_id, scene_id, 10, "player", "eventually", "42")
+    assert await _count() == 0
+    await asyncio.sleep(0.15)
+    assert await _count() == 1
+
+    await sink.write(camp_id, scene_id, 10, "system", "now", "42", durable=True)
+    assert await _count() == 2
+    await sink.close()
+
+
+async def test_recent_sees_buffered_rows_in_order(app_db):
+    camp_id, scene_id = await _scene()
+    sink = TranscriptSink(max_rows=100, flush_interval=60)
+    await sink.write(camp_id, scene_id, 10, "player", "a", "42", durable=True)
+    await sink.write(camp_id, scene_id, 10, "bot", "b", "42")
+    await sink.write(camp_id, scene_id, 10, "player", "other user", "7")
+    await sink.write(camp_id, scene_id, 10, "player", "c", "42")
+
+    async with session_scope() as s:
+        rows = await sink.recent(s, scene_id, limit=15, user_id="42")
+        assert [r.content for r in rows] == ["a", "b", "c"]
+        rows = await sink.recent(s, scene_id, limit=2, user_id="42")
+        assert [r.content for r in rows] == ["b", "c"]
+
+    await sink.close()  # shutdown flushes everything
+    assert await _count() == 4
+
+
+async def test_bad_row_is_dead_lettered_without_blocking_its_guild(app_db, monkeypatch):
+    metrics.reset()
+    camp_id, scene_id = await _scene()
+    real = transcripts._bulk_insert
+
+    async def picky(s, rows):
+        if any(r["content"] == "bad" for r in rows):
+            raise ValueError("rejected")
+        await real(s, rows)
+
+    monkeypatch.setattr(transcripts, "_bulk_insert", picky)
+    sink = TranscriptSink(max_rows=3, flush_interval=60, max_attempts=2)
+    for content in ("a", "bad", "b"):
+        await sink.write(camp_id, scene_id, 10, "player", content, "42")  # never raises
+    assert await _count() == 0 and len(sink.pending(scene_id)) == 3
+    with pytest.raises(RuntimeError):
+        await sink.flush()  # second failure: out of attempts, each row goes alone
+    assert await _count() == 2 and sink.pending(scene_id) == []
+    assert metrics.get_counter("transcripts.dead_letter") == 1
+    await sink.close()
+
+
+async def test_outage_drops_oldest_and_only_durable_raises(app_db, monkeypatch):
+    metrics.reset()
+    camp_id, scene_id = await _scene()
+    real = transcripts._bulk_insert
+    up = False
+
+    async def flaky(s, rows):
+        if not up:
+            raise ConnectionError("database unreachable")
+        await real(s, rows)
+
+    monkeypatch.setattr(transcripts, "_bulk_insert", flaky)
+    sink = TranscriptSink(max_rows=2, flush_interval=60, max_buffered=5)
+    for i in range(8):
+        await sink.write(camp_id, scene_id, 10, "player", str(i), "42")
+    assert [r.content for r in sink.pending(scene_id)] == ["3", "4", "5", "6", "7"]
+    assert metrics.get_counter("transcripts.dropped") == 3
+    with pytest.raises(RuntimeError):
+        await sink.write(camp_id, scene_id, 10, "system", "must land", "42", durable=True)
+    up = True
+    await sink.close()
+    assert await _count() == 5